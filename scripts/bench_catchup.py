@@ -0,0 +1,81 @@
+# scripts/bench_catchup.py
+import argparse
+import asyncio
+import logging
+import shutil
+import tempfile
+
+# Assuming 'src' is in PYTHONPATH or running from root
+from distributed_fs.generated import raft_pb2
+from distributed_fs.raft.log_store import encode_entry
+from distributed_fs.raft.node import NodeState, RaftNode
+from distributed_fs.raft.replicator import MAX_ENTRIES_PER_BATCH
+
+def build_node(node_id: int, data_dir: str, terms) -> RaftNode:
+    """Creates a RaftNode whose in-memory log holds one entry per term in `terms`."""
+    node = RaftNode(node_id, {1: "localhost:1", 2: "localhost:2"}, data_dir)
+    for term in terms:
+        node.log.append(term, encode_entry(term, b'NOOP'))
+    return node
+
+async def count_round_trips(leader_terms, follower_terms, use_hints: bool, data_root: str) -> int:
+    """
+    Drives AppendEntries from a leader to a follower (in-process, no network) until
+    the follower accepts, and returns how many rejected round trips that took.
+    """
+    leader = build_node(1, f"{data_root}/leader_{use_hints}", leader_terms)
+    follower = build_node(2, f"{data_root}/follower_{use_hints}", follower_terms)
+    leader.state = NodeState.LEADER
+    leader.current_term = follower.current_term = max(leader_terms)
+    leader.next_index[2] = leader.log.last_index + 1
+    rejections = 0
+    try:
+        while True:
+            next_idx = leader.next_index[2]
+            prev_log_index = next_idx - 1
+            args = raft_pb2.AppendEntriesArgs(
+                term=leader.current_term,
+                leader_id=1,
+                prev_log_index=prev_log_index,
+                prev_log_term=leader.log.term_at(prev_log_index),
+                entries=leader.log.records_from(next_idx, MAX_ENTRIES_PER_BATCH),
+                leader_commit=0,
+                entry_terms=leader.log.terms_from(next_idx, MAX_ENTRIES_PER_BATCH)
+            )
+            reply = await follower.handle_append_entries(args)
+            follower._cancel_election_timer() # No real cluster behind these nodes
+            if reply.success:
+                return rejections
+            rejections += 1
+            if not use_hints:
+                reply = raft_pb2.AppendEntriesReply(term=reply.term, success=False)
+            leader.next_index[2] = leader._next_index_after_reject(2, args, reply)
+    finally:
+        await leader.stop()
+        await follower.stop()
+
+async def main(args):
+    data_root = tempfile.mkdtemp(prefix="bench_catchup_")
+    n = args.entries
+    scenarios = {
+        # Follower missed the last n entries of the leader's log
+        "lagging": ([1] * 10 + [2] * n, [1] * 10),
+        # Follower holds n uncommitted entries from a deposed leader's term
+        "divergent": ([1] * 10 + [3] * n, [1] * 10 + [2] * n),
+        # Follower has a long stale suffix spread across many old terms
+        "many-terms": ([1] * 10 + [50] * n, [1] * 10 + [t for t in range(2, 50) for _ in range(n // 48 + 1)]),
+    }
+    try:
+        print(f"{'scenario':>12} {'with_hints':>12} {'step_by_one':>12}")
+        for name, (leader_terms, follower_terms) in scenarios.items():
+            with_hints = await count_round_trips(leader_terms, follower_terms, True, data_root)
+            step_by_one = await count_round_trips(leader_terms, follower_terms, False, data_root)
+            print(f"{name:>12} {with_hints:>12} {step_by_one:>12}")
+    finally:
+        shutil.rmtree(data_root, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Count AppendEntries round trips a leader needs to find a follower's match point.")
+    parser.add_argument("--entries", type=int, default=10000, help="How far the follower's log diverges from the leader's")
+    logging.basicConfig(level=logging.ERROR)
+    asyncio.run(main(parser.parse_args()))
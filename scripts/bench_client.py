@@ -0,0 +1,126 @@
+# scripts/bench_client.py
+import argparse
+import asyncio
+import logging
+import os
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Awaitable, Callable, List
+
+# Assuming 'src' is in PYTHONPATH or running from root
+from distributed_fs.client import Client
+from distributed_fs.commands import encode_command
+from run_client import run_command # scripts/ is on sys.path when run as a script
+
+RUN_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "run_server.py")
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+async def timed(operations: int, operation: Callable[[int], Awaitable[None]]):
+    """Runs `operation(i)` for i in range(operations) one after another; returns (ops/s, p50 ms, p99 ms)."""
+    latencies = []
+    start = time.perf_counter()
+    for i in range(operations):
+        op_start = time.perf_counter()
+        await operation(i)
+        latencies.append((time.perf_counter() - op_start) * 1000.0)
+    elapsed = time.perf_counter() - start
+    return operations / elapsed, percentile(latencies, 50), percentile(latencies, 99)
+
+async def producers(client: Client, num_producers: int, puts_each: int, prefix: str):
+    """`num_producers` coroutines each awaiting `puts_each` PUTs in turn; returns (puts/s, p50 ms, p99 ms)."""
+    latencies: List[float] = []
+
+    async def producer(producer_id: int):
+        for i in range(puts_each):
+            op_start = time.perf_counter()
+            await client.put(f"{prefix}{producer_id}_{i}", b"v" * 100)
+            latencies.append((time.perf_counter() - op_start) * 1000.0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(producer(p) for p in range(num_producers)))
+    elapsed = time.perf_counter() - start
+    return num_producers * puts_each / elapsed, percentile(latencies, 50), percentile(latencies, 99)
+
+async def run(args, addresses: List[str]):
+    print(f"{'client':>26} {'op':>4} {'ops/s':>8} {'p50_ms':>7} {'p99_ms':>7}")
+    def report(name: str, op: str, result):
+        print(f"{name:>26} {op:>4} {result[0]:>8.0f} {result[1]:>7.2f} {result[2]:>7.2f}")
+
+    async def cli_put(i: int):
+        # Like one run_client.py invocation: a fresh channel to some member, then redirects
+        reply = await run_command(random.choice(addresses), encode_command("PUT", f"cli{i}", b"v"), f"bench_{i}")
+        assert reply is not None and reply.success, reply
+
+    async def cli_get(i: int):
+        reply = await run_command(random.choice(addresses), encode_command("GET", f"cli{i}"), f"bench_{i}")
+        assert reply is not None and reply.success, reply
+    report("new channel per command", "put", await timed(args.operations, cli_put))
+    report("new channel per command", "get", await timed(args.operations, cli_get))
+
+    async with Client(addresses, num_groups=args.groups) as client:
+        async def put(i: int):
+            await client.put(f"lib{i}", b"v")
+
+        async def get(i: int):
+            assert await client.get(f"lib{i}") == b"v"
+        report("distributed_fs.client", "put", await timed(args.operations, put))
+        report("distributed_fs.client", "get", await timed(args.operations, get))
+
+        batches = max(1, args.operations // args.batch)
+        async def put_many(i: int):
+            await client.put_many({f"many{i}_{j}": b"v" for j in range(args.batch)})
+        result = await timed(batches, put_many)
+        report(f"client.put_many x{args.batch}", "put", (result[0] * args.batch, result[1], result[2]))
+
+        # Many coroutines issuing small PUTs at once: pipelined as separate calls on one channel...
+        puts_each = max(1, args.operations * 4 // args.producers)
+        report(f"{args.producers} producers, pipelined", "put", await producers(client, args.producers, puts_each, "pipe"))
+
+    # ...and coalesced into batches per group
+    async with Client(addresses, num_groups=args.groups, write_batch_window_ms=args.window_ms) as client:
+        report(f"{args.producers} producers, coalesced", "put", await producers(client, args.producers, puts_each, "coal"))
+
+def main(args):
+    data_root = tempfile.mkdtemp(prefix="bench_client_")
+    addresses = [f"localhost:{args.base_port + i}" for i in range(1, args.nodes + 1)]
+    peers = ",".join(f"{i}@{address}" for i, address in enumerate(addresses, start=1))
+    processes: List[subprocess.Popen] = []
+    try:
+        for node_id in range(1, args.nodes + 1):
+            processes.append(subprocess.Popen(
+                [sys.executable, RUN_SERVER, "--id", str(node_id), "--port", str(args.base_port + node_id),
+                 "--peers", peers, "--data-dir", os.path.join(data_root, f"node_{node_id}"), "--groups", str(args.groups)],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        time.sleep(args.settle) # Elections
+        asyncio.run(run(args, addresses))
+    finally:
+        for process in processes:
+            process.send_signal(signal.SIGTERM)
+        for process in processes:
+            process.wait()
+        shutil.rmtree(data_root, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Operation latency and throughput: one channel per command vs. the pooled, leader-caching client, pipelined or with coalesced writes.")
+    parser.add_argument("--nodes", type=int, default=3, help="Cluster size (one server process per node)")
+    parser.add_argument("--groups", type=int, default=1, help="Raft groups (--groups of run_server.py)")
+    parser.add_argument("--base-port", type=int, default=9750, help="Node i listens on base_port + i")
+    parser.add_argument("--operations", type=int, default=300, help="Operations per measurement")
+    parser.add_argument("--batch", type=int, default=100, help="Keys per put_many")
+    parser.add_argument("--producers", type=int, default=64, help="Concurrent coroutines issuing PUTs")
+    parser.add_argument("--window-ms", type=float, default=2.0, help="Write coalescing window of the coalesced client")
+    parser.add_argument("--settle", type=float, default=6.0, help="Seconds allowed for elections before measuring")
+    args = parser.parse_args()
+    logging.getLogger("client").setLevel(logging.WARNING) # run_client logs every attempt
+    main(args)
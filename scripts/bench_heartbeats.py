@@ -0,0 +1,61 @@
+# scripts/bench_heartbeats.py
+import argparse
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+RUN_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "run_server.py")
+
+def cpu_seconds(pid: int) -> float:
+    """User + system CPU time of a process so far (Linux /proc)."""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+def measure(num_nodes: int, base_port: int, groups: int, coalesce: bool, settle: float, duration: float) -> float:
+    """Starts an idle cluster of `num_nodes` server processes and returns its CPU use in % of one core."""
+    data_root = tempfile.mkdtemp(prefix="bench_heartbeats_")
+    peers = ",".join(f"{i}@localhost:{base_port + i}" for i in range(1, num_nodes + 1))
+    processes: List[subprocess.Popen] = []
+    try:
+        for node_id in range(1, num_nodes + 1):
+            cmd = [sys.executable, RUN_SERVER, "--id", str(node_id), "--port", str(base_port + node_id),
+                   "--peers", peers, "--data-dir", os.path.join(data_root, f"node_{node_id}"), "--groups", str(groups)]
+            if not coalesce:
+                cmd.append("--no-heartbeat-coalescing")
+            processes.append(subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        time.sleep(settle) # Elections
+        start_cpu = sum(cpu_seconds(p.pid) for p in processes)
+        start = time.monotonic()
+        time.sleep(duration)
+        used = sum(cpu_seconds(p.pid) for p in processes) - start_cpu
+        return 100.0 * used / (time.monotonic() - start)
+    finally:
+        for process in processes:
+            process.send_signal(signal.SIGTERM)
+        for process in processes:
+            process.wait()
+        shutil.rmtree(data_root, ignore_errors=True)
+
+def main(args):
+    print(f"{'groups':>7} {'coalesced':>10} {'cpu_%':>7}")
+    for groups in args.groups:
+        for coalesce in (True, False):
+            if groups == 1 and not coalesce:
+                continue # A single group has nothing to coalesce
+            cpu = measure(args.nodes, args.base_port, groups, coalesce, args.settle, args.duration)
+            print(f"{groups:>7} {'yes' if coalesce else 'no':>10} {cpu:>7.0f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Idle-cluster CPU by number of Raft groups, with and without coalesced heartbeats (Linux).")
+    parser.add_argument("--nodes", type=int, default=3, help="Cluster size (one server process per node)")
+    parser.add_argument("--base-port", type=int, default=9600, help="Node i listens on base_port + i")
+    parser.add_argument("--groups", type=int, nargs='+', default=[1, 3, 12, 24], help="Raft group counts to test")
+    parser.add_argument("--settle", type=float, default=10.0, help="Seconds allowed for elections before measuring")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per measurement")
+    main(parser.parse_args())
@@ -0,0 +1,130 @@
+# scripts/bench_reads.py
+import argparse
+import asyncio
+import logging
+import shutil
+import tempfile
+import time
+from typing import Dict, List
+
+import grpc
+
+# Assuming 'src' is in PYTHONPATH or running from root
+from distributed_fs.generated import raft_pb2, raft_pb2_grpc
+from distributed_fs.raft.node import NodeState, RaftNode
+from run_server import RaftServicer # scripts/ is on sys.path when run as a script
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+async def start_cluster(num_nodes: int, base_port: int, data_root: str):
+    """Starts `num_nodes` RaftNodes with gRPC servers in this process and returns (nodes, servers, tasks)."""
+    addresses = {i: f"localhost:{base_port + i}" for i in range(1, num_nodes + 1)}
+    nodes: Dict[int, RaftNode] = {}
+    servers = []
+    tasks = []
+    for node_id in addresses:
+        node = RaftNode(node_id, dict(addresses), f"{data_root}/node_{node_id}")
+        server = grpc.aio.server()
+        raft_pb2_grpc.add_RaftServiceServicer_to_server(RaftServicer(node), server)
+        server.add_insecure_port(addresses[node_id])
+        await server.start()
+        nodes[node_id] = node
+        servers.append(server)
+        tasks.append(asyncio.create_task(node.run()))
+    return nodes, servers, tasks
+
+async def wait_for_leader(nodes: Dict[int, RaftNode], timeout: float = 15.0) -> RaftNode:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        for node in nodes.values():
+            if node.state == NodeState.LEADER and node.commit_index >= node._term_start_index > 0:
+                return node
+        await asyncio.sleep(0.05)
+    raise RuntimeError("no leader elected")
+
+async def run_reads(stubs, num_keys: int, readers: int, duration: float, **read_options):
+    """
+    Runs `readers` concurrent GET loops for `duration` seconds, reader i talking to
+    stubs[i % len(stubs)], and returns (reads/s, p50 ms, p99 ms, errors).
+    """
+    latencies: List[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def reader(reader_id: int):
+        nonlocal errors
+        stub = stubs[reader_id % len(stubs)]
+        i = reader_id
+        while time.perf_counter() < deadline:
+            command = f"GET\nkey{i % num_keys}".encode('utf-8')
+            start = time.perf_counter()
+            reply = await stub.ExecuteCommand(raft_pb2.ClientCommandRequest(command=command, **read_options))
+            latencies.append(time.perf_counter() - start)
+            if not reply.success:
+                errors += 1
+            i += readers
+
+    start = time.perf_counter()
+    await asyncio.gather(*(reader(r) for r in range(readers)))
+    elapsed = time.perf_counter() - start
+    return len(latencies) / elapsed, percentile(latencies, 50) * 1000.0, percentile(latencies, 99) * 1000.0, errors
+
+async def main(args):
+    data_root = tempfile.mkdtemp(prefix="bench_reads_")
+    nodes, servers, tasks = await start_cluster(args.nodes, args.base_port, data_root)
+    try:
+        leader = await wait_for_leader(nodes)
+        channels = {node_id: grpc.aio.insecure_channel(node.peers_addresses[node_id]) for node_id, node in nodes.items()}
+        try:
+            stubs = {node_id: raft_pb2_grpc.RaftServiceStub(channel) for node_id, channel in channels.items()}
+            leader_stub = stubs[leader.node_id]
+            load = raft_pb2.ClientBatchRequest(commands=[
+                raft_pb2.ClientCommandRequest(command=f"PUT\nkey{i}\nvalue{i}".encode('utf-8')) for i in range(args.keys)
+            ])
+            await leader_stub.ExecuteBatch(load)
+
+            # (name, linearizable_reads, lease_reads, read from every node, request fields)
+            modes = (
+                ("read_index", True, False, False, {}),
+                ("lease", True, True, False, {}),
+                ("local", False, False, False, {}),
+                ("bounded", True, False, True, {"consistency": raft_pb2.BOUNDED_STALENESS,
+                                                 "max_staleness_ms": args.max_staleness_ms}),
+                ("any", True, False, True, {"consistency": raft_pb2.ANY}),
+            )
+            print(f"{'mode':>12} {'readers':>8} {'reads/s':>10} {'p50_ms':>8} {'p99_ms':>8} {'errors':>7}")
+            for readers in args.readers:
+                for mode, linearizable, lease, all_nodes, read_options in modes:
+                    for node in nodes.values():
+                        node.linearizable_reads = linearizable
+                        node.lease_reads = lease
+                    targets = list(stubs.values()) if all_nodes else [leader_stub]
+                    rate, p50, p99, errors = await run_reads(targets, args.keys, readers, args.duration, **read_options)
+                    print(f"{mode:>12} {readers:>8} {rate:>10.0f} {p50:>8.2f} {p99:>8.2f} {errors:>7}")
+        finally:
+            for channel in channels.values():
+                await channel.close()
+    finally:
+        for node in nodes.values():
+            await node.stop()
+        for task in tasks:
+            task.cancel()
+        for server in servers:
+            await server.stop(0)
+        shutil.rmtree(data_root, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare GET throughput of leader reads (ReadIndex, lease, unchecked) and follower reads.")
+    parser.add_argument("--nodes", type=int, default=3, help="Cluster size (all nodes run in this process)")
+    parser.add_argument("--base-port", type=int, default=9500, help="Node i listens on base_port + i")
+    parser.add_argument("--keys", type=int, default=1000, help="Keys loaded before reading")
+    parser.add_argument("--readers", type=int, nargs='+', default=[1, 16, 64], help="Concurrent reader counts to test")
+    parser.add_argument("--duration", type=float, default=3.0, help="Seconds per measurement")
+    parser.add_argument("--max-staleness-ms", type=int, default=200, help="Bound used by the 'bounded' follower-read mode")
+    logging.getLogger().setLevel(logging.ERROR) # run_server configures INFO logging on import
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,74 @@
+# scripts/bench_startup.py
+import argparse
+import json
+import logging
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# Assuming 'src' is in PYTHONPATH or running from root
+from distributed_fs.commands import encode_command
+from distributed_fs.raft.log_store import encode_entry
+from distributed_fs.raft.node import RaftNode
+from distributed_fs.raft.segments import SegmentedLog
+
+WRITE_BATCH = 10000 # Records per SegmentedLog.append() while generating a log
+
+def write_log(data_dir: str, entries: int, value_bytes: int):
+    """Writes a segmented log of `entries` PUT commands into data_dir/log, as a node would."""
+    segments = SegmentedLog(0, os.path.join(data_dir, "log"))
+    segments.reset(1)
+    value = b'v' * value_bytes
+    for start in range(0, entries, WRITE_BATCH):
+        records = [encode_entry(1 + i // 100000, encode_command("PUT", f"key{i}", value))
+                   for i in range(start, min(entries, start + WRITE_BATCH))]
+        segments.append(records)
+    segments.sync()
+    segments.close()
+
+def open_node(data_dir: str):
+    """Child process: constructs a RaftNode on data_dir and prints time-to-ready and peak RSS growth as JSON."""
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    node = RaftNode(1, {1: "localhost:1"}, data_dir)
+    elapsed = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss # KiB on Linux
+    print(json.dumps({"entries": len(node.log), "seconds": elapsed, "rss_kib": rss_after - rss_before}))
+
+def main(args):
+    data_root = tempfile.mkdtemp(prefix="bench_startup_")
+    try:
+        print(f"{'entries':>10} {'log_MiB':>8} {'ready_ms':>9} {'rss_MiB':>8}")
+        for entries in args.entries:
+            data_dir = os.path.join(data_root, f"node_{entries}")
+            write_log(data_dir, entries, args.value_bytes)
+            log_bytes = sum(e.stat().st_size for e in os.scandir(os.path.join(data_dir, "log")))
+            samples = []
+            for _ in range(args.runs):
+                # A fresh interpreter per run, so peak RSS only reflects this startup
+                output = subprocess.run([sys.executable, __file__, "--open", data_dir],
+                                        check=True, capture_output=True, text=True).stdout
+                samples.append(json.loads(output.strip().splitlines()[-1]))
+            best = min(samples, key=lambda s: s["seconds"])
+            if best["entries"] != entries:
+                raise RuntimeError(f"node loaded {best['entries']} entries, expected {entries}")
+            print(f"{entries:>10} {log_bytes / 2**20:>8.1f} {best['seconds'] * 1000:>9.1f} {best['rss_kib'] / 1024:>8.1f}")
+    finally:
+        shutil.rmtree(data_root, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure how long a node takes to load its log on startup, by log size.")
+    parser.add_argument("--entries", type=int, nargs='+', default=[10000, 100000, 1000000], help="Log sizes to test")
+    parser.add_argument("--value-bytes", type=int, default=100, help="Value size of each PUT command")
+    parser.add_argument("--runs", type=int, default=3, help="Startups per size (the fastest is reported)")
+    parser.add_argument("--open", metavar="DATA_DIR", help=argparse.SUPPRESS) # Internal: measure one startup
+    cli_args = parser.parse_args()
+    logging.getLogger().setLevel(logging.ERROR)
+    if cli_args.open:
+        open_node(cli_args.open)
+    else:
+        main(cli_args)
@@ -0,0 +1,80 @@
+# scripts/bench_wal.py
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+from typing import List
+
+# Assuming 'src' is in PYTHONPATH or running from root
+from distributed_fs.raft.log_store import encode_entry
+from distributed_fs.raft.segments import SegmentedLog
+from distributed_fs.raft.wal import GroupCommitWAL
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+async def run_once(data_dir: str, window_ms: float, max_batch_bytes: int,
+                   num_writers: int, entries_per_writer: int, value_size: int):
+    """
+    Runs `num_writers` concurrent producers against one WAL and returns (entries/s, p50 ms,
+    p99 ms, longest event loop stall in ms). The stall is how late a 1 ms ticker wakes up at
+    worst, i.e. how long heartbeats and other RPCs would have been kept waiting.
+    """
+    log_dir = os.path.join(data_dir, f"bench_{window_ms}")
+    wal = GroupCommitWAL(0, SegmentedLog(0, log_dir), batch_window_ms=window_ms, max_batch_bytes=max_batch_bytes)
+    command = b'PUT\nbench\n' + os.urandom(value_size)
+    latencies: List[float] = []
+    max_stall = 0.0
+    running = True
+
+    async def ticker():
+        nonlocal max_stall
+        while running:
+            before = time.perf_counter()
+            await asyncio.sleep(0.001)
+            max_stall = max(max_stall, time.perf_counter() - before - 0.001)
+
+    async def writer():
+        for _ in range(entries_per_writer):
+            record = encode_entry(1, command)
+            start = time.perf_counter()
+            await wal.append([record])
+            latencies.append(time.perf_counter() - start)
+
+    ticks = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    await asyncio.gather(*(writer() for _ in range(num_writers)))
+    elapsed = time.perf_counter() - start
+    running = False
+    await ticks
+    await wal.close()
+
+    total = num_writers * entries_per_writer
+    return total / elapsed, percentile(latencies, 50) * 1000.0, percentile(latencies, 99) * 1000.0, max_stall * 1000.0
+
+async def main(args):
+    data_dir = tempfile.mkdtemp(prefix="bench_wal_", dir=args.dir)
+    try:
+        print(f"{'window_ms':>10} {'entries/s':>12} {'p50_ms':>10} {'p99_ms':>10} {'stall_ms':>10}")
+        for window_ms in args.windows:
+            rate, p50, p99, stall = await run_once(data_dir, window_ms, args.max_batch_bytes,
+                                                   args.writers, args.entries, args.value_size)
+            print(f"{window_ms:>10.2f} {rate:>12.0f} {p50:>10.3f} {p99:>10.3f} {stall:>10.3f}")
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the group-commit WAL for different batch windows.")
+    parser.add_argument("--windows", type=float, nargs='+', default=[0.0, 0.5, 1.0, 2.0, 5.0], help="Batch windows to test (ms)")
+    parser.add_argument("--writers", type=int, default=64, help="Number of concurrent appenders")
+    parser.add_argument("--entries", type=int, default=200, help="Entries appended by each writer")
+    parser.add_argument("--value-size", type=int, default=128, help="Payload size of each entry (bytes)")
+    parser.add_argument("--max-batch-bytes", type=int, default=1024 * 1024, help="Byte budget that forces a flush")
+    parser.add_argument("--dir", type=str, default=None, help="Directory for the temporary log segments (defaults to system temp)")
+    asyncio.run(main(parser.parse_args()))
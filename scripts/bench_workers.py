@@ -0,0 +1,180 @@
+# scripts/bench_workers.py
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import grpc
+
+# Assuming 'src' is in PYTHONPATH or running from root
+from distributed_fs.commands import encode_command
+from distributed_fs.generated import raft_pb2, raft_pb2_grpc
+from distributed_fs.raft.multi_raft import worker_address, worker_for_group
+from distributed_fs.sharding import group_for_key
+
+RUN_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "run_server.py")
+
+def process_tree(pid: int) -> List[int]:
+    """`pid` and all its descendants (Linux /proc)."""
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            children = [int(child) for child in f.read().split()]
+    except FileNotFoundError:
+        return []
+    return [pid] + [descendant for child in children for descendant in process_tree(child)]
+
+def cpu_seconds(pid: int) -> float:
+    """User + system CPU time of a process so far (Linux /proc)."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except FileNotFoundError:
+        return 0.0
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+def put_batch(batch: int, keys: Optional[List[str]] = None) -> raft_pb2.ClientBatchRequest:
+    """A batch of `batch` PUTs of random keys (drawn from `keys` if given)."""
+    return raft_pb2.ClientBatchRequest(commands=[
+        raft_pb2.ClientCommandRequest(command=encode_command(
+            "PUT", random.choice(keys) if keys else f"key{random.randrange(1_000_000)}", b"x" * 100))
+        for _ in range(batch)])
+
+def keys_by_group(num_groups: int, per_group: int = 1000) -> Dict[int, List[str]]:
+    """`per_group` keys owned by each group."""
+    keys: Dict[int, List[str]] = {group_id: [] for group_id in range(1, num_groups + 1)}
+    i = 0
+    while any(len(group_keys) < per_group for group_keys in keys.values()):
+        key = f"key{i}"
+        group_keys = keys[group_for_key(key, num_groups)]
+        if len(group_keys) < per_group:
+            group_keys.append(key)
+        i += 1
+    return keys
+
+async def wait_until_serving(address: str, timeout: float):
+    """Waits until a batch touching (almost certainly) every group commits through `address`."""
+    deadline = time.monotonic() + timeout
+    async with grpc.aio.insecure_channel(address) as channel:
+        stub = raft_pb2_grpc.RaftServiceStub(channel)
+        while time.monotonic() < deadline:
+            try:
+                reply = await stub.ExecuteBatch(put_batch(64), timeout=5)
+                if reply.success and all(result.success for result in reply.results):
+                    return
+            except grpc.aio.AioRpcError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError(f"cluster not serving through {address} after {timeout}s")
+
+async def client_load(addresses: List[str], concurrency: int, batch: int, duration: float,
+                      groups: int, workers: int, direct: bool) -> int:
+    """
+    Runs `concurrency` PUT batch loops spread over `addresses` for `duration` seconds and
+    returns the commands committed. A batch holds random keys of all groups, or with
+    `direct` the keys of one group, sent to the own port of the worker serving it.
+    """
+    channels: Dict[str, grpc.aio.Channel] = {}
+    stubs: Dict[str, raft_pb2_grpc.RaftServiceStub] = {}
+    def stub(address: str) -> raft_pb2_grpc.RaftServiceStub:
+        if address not in stubs:
+            channels[address] = grpc.aio.insecure_channel(address)
+            stubs[address] = raft_pb2_grpc.RaftServiceStub(channels[address])
+        return stubs[address]
+
+    keys = keys_by_group(groups) if direct else {}
+    committed = 0
+    deadline = time.monotonic() + duration
+
+    async def loop(loop_id: int):
+        nonlocal committed
+        address = addresses[loop_id % len(addresses)]
+        while time.monotonic() < deadline:
+            if direct:
+                group_id = random.randint(1, groups)
+                target = worker_address(address, worker_for_group(group_id, workers)) if workers > 1 else address
+                request = put_batch(batch, keys[group_id])
+            else:
+                target, request = address, put_batch(batch)
+            try:
+                reply = await stub(target).ExecuteBatch(request, timeout=10)
+            except grpc.aio.AioRpcError:
+                continue
+            committed += sum(1 for result in reply.results if result.success)
+
+    await asyncio.gather(*(loop(i) for i in range(concurrency)))
+    for channel in channels.values():
+        await channel.close()
+    return committed
+
+def run_client_process(*args) -> int:
+    return asyncio.run(client_load(*args))
+
+def measure(args, workers: int):
+    """Starts a cluster whose nodes run `workers` worker processes, loads it, and returns (commands/s, server CPU %)."""
+    data_root = tempfile.mkdtemp(prefix="bench_workers_")
+    addresses = [f"localhost:{args.base_port + i}" for i in range(1, args.nodes + 1)]
+    peers = ",".join(f"{i}@{address}" for i, address in enumerate(addresses, start=1))
+    processes: List[subprocess.Popen] = []
+    try:
+        for node_id in range(1, args.nodes + 1):
+            cmd = [sys.executable, RUN_SERVER, "--id", str(node_id), "--port", str(args.base_port + node_id),
+                   "--peers", peers, "--data-dir", os.path.join(data_root, f"node_{node_id}"),
+                   "--groups", str(args.groups), "--workers", str(workers)]
+            processes.append(subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        asyncio.run(wait_until_serving(addresses[0], args.settle))
+
+        server_pids = [pid for process in processes for pid in process_tree(process.pid)]
+        start_cpu = sum(cpu_seconds(pid) for pid in server_pids)
+        start = time.monotonic()
+        with ProcessPoolExecutor(max_workers=args.client_procs) as pool:
+            results = [pool.submit(run_client_process, addresses, args.concurrency, args.batch, args.duration,
+                                   args.groups, workers, args.direct)
+                       for _ in range(args.client_procs)]
+            committed = sum(result.result() for result in results)
+        elapsed = time.monotonic() - start
+        cpu = 100.0 * (sum(cpu_seconds(pid) for pid in server_pids) - start_cpu) / elapsed
+        return committed / elapsed, cpu
+    finally:
+        for process in processes:
+            process.send_signal(signal.SIGTERM)
+        for process in processes:
+            process.wait()
+        shutil.rmtree(data_root, ignore_errors=True)
+
+def main(args):
+    print(f"{os.cpu_count()} CPUs, {args.nodes} node(s), {args.groups} Raft groups, "
+          f"{args.client_procs} client processes x {args.concurrency} loops x {args.batch} PUTs per batch"
+          f"{' (one group per batch, sent to its worker)' if args.direct else ''}")
+    print(f"{'workers':>8} {'cmds/s':>10} {'speedup':>8} {'cpu_%':>7}")
+    baseline = None
+    for workers in args.workers:
+        throughput, cpu = measure(args, workers)
+        baseline = baseline or throughput
+        print(f"{workers:>8} {throughput:>10.0f} {throughput / baseline:>7.2f}x {cpu:>7.0f}")
+
+if __name__ == "__main__":
+    default_workers = [1]
+    while default_workers[-1] * 2 <= (os.cpu_count() or 1):
+        default_workers.append(default_workers[-1] * 2)
+    parser = argparse.ArgumentParser(description="Write throughput of a cluster by worker processes per node (Linux).")
+    parser.add_argument("--workers", type=int, nargs='+', default=default_workers,
+                        help="Worker process counts to test (default: powers of two up to the CPU count)")
+    parser.add_argument("--nodes", type=int, default=1, help="Cluster size; 1 measures a host without replication traffic")
+    parser.add_argument("--groups", type=int, default=16, help="Raft groups (at least the largest worker count)")
+    parser.add_argument("--base-port", type=int, default=9700, help="Node i listens on base_port + i")
+    parser.add_argument("--client-procs", type=int, default=2, help="Load generator processes")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent batch loops per load generator process")
+    parser.add_argument("--batch", type=int, default=32, help="PUTs per ExecuteBatch")
+    parser.add_argument("--direct", action="store_true",
+                        help="Send each batch to the worker serving its keys instead of splitting batches of all groups")
+    parser.add_argument("--settle", type=float, default=60.0, help="Seconds allowed for elections and the first commit")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load per measurement")
+    main(parser.parse_args())
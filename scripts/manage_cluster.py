@@ -10,6 +10,14 @@ import time
 from pathlib import Path
 
 CONFIG_FILE = "cluster_config.json" # Default config file name
+WORKER_PORT_STRIDE = 1000 # Default of run_server.py --worker-port-stride
+STOP_WAIT_S = 5.0 # How long stop waits for a node's processes to exit
+
+def worker_ports(config, port):
+    """Own ports of the worker processes of the node listening on `port` (none unless it runs several)."""
+    stride = config.get("worker_port_stride", WORKER_PORT_STRIDE)
+    return [port + stride * (worker + 1) for worker in range(config.get("workers_per_node", 1))] \
+        if config.get("workers_per_node", 1) > 1 else []
 
 def load_config(config_path):
     try:
@@ -61,6 +69,13 @@ def start_node(config, node_id):
         "--peers", peers_str,
         "--data-dir", str(data_dir)
     ]
+    if config.get("raft_groups", 1) > 1:
+        cmd_args.extend(["--groups", str(config["raft_groups"])]) # Shard the keyspace over this many Raft groups
+    if config.get("workers_per_node", 1) > 1:
+        # A supervisor process plus this many workers, sharing the node's port and splitting its groups
+        cmd_args.extend(["--workers", str(config["workers_per_node"])])
+        if "worker_port_stride" in config:
+            cmd_args.extend(["--worker-port-stride", str(config["worker_port_stride"])])
     if config.get("debug_logging", False):
         cmd_args.append("--debug")
 
@@ -68,6 +83,8 @@ def start_node(config, node_id):
     print(f"  Log file: {log_file}")
     print(f"  Data dir: {data_dir}")
     print(f"  PID file: {pid_file}")
+    if worker_ports(config, port):
+        print(f"  Workers: {len(worker_ports(config, port))} on port {port}, own ports {', '.join(map(str, worker_ports(config, port)))}")
 
     with open(log_file, 'ab') as lf: # Append binary for direct Popen output
         # Use shlex.split if any arguments might contain spaces, though not strictly needed here
@@ -103,11 +120,17 @@ def stop_node(config, node_id, sig=signal.SIGTERM):
 
     print(f"Stopping Node {node_id} (PID {pid}) with signal {sig.name}...")
     try:
-        os.kill(pid, sig)
-        # Wait a bit for the process to terminate
+        # The node was started in its own session, so this reaches a supervisor's workers too (even with KILL)
+        os.killpg(pid, sig)
+        # Wait a bit for the process to terminate (a supervisor first waits for its workers)
+        deadline = time.monotonic() + STOP_WAIT_S
         time.sleep(1) # Give it a moment
         try:
-            os.kill(pid, 0) # Check if still alive
+            while True:
+                os.killpg(pid, 0) # Check if anything of the node is still alive
+                if time.monotonic() >= deadline:
+                    break
+                time.sleep(0.2)
             print(f"Node {node_id} (PID {pid}) did not terminate gracefully with {sig.name}. Consider 'kill -9 {pid}' manually or using SIGKILL option.")
         except OSError: # Process is dead
             print(f"Node {node_id} (PID {pid}) stopped.")
@@ -146,6 +169,8 @@ def cluster_status(config):
                     pid = int(f.read().strip())
                 os.kill(pid, 0) # Check if process exists
                 status = f"Running (PID: {pid})"
+                if config.get("workers_per_node", 1) > 1:
+                    status = f"Running (supervisor PID: {pid}, {config['workers_per_node']} workers)"
                 pid_val = pid
                 running_nodes +=1
             except (OSError, ValueError):
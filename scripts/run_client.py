@@ -5,9 +5,11 @@ import logging
 import sys
 import os
 import time
+from typing import List, Optional
 import grpc
 
 # Assuming 'src' is in PYTHONPATH or running from root
+from distributed_fs.commands import encode_command
 from distributed_fs.generated import raft_pb2, raft_pb2_grpc
 
 # --- Logging ---
@@ -15,21 +17,20 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - CLIENT - %(levelna
 logger = logging.getLogger("client")
 
 # --- Command Formatting ---
-# Let's use a simple format: OPERATION\nKEY\nVALUE (value is empty for GET/DEL)
-# Using newline to avoid issues with spaces in keys/values.
-# Alternative: JSON {"op": "PUT", "key": "my key", "value": "base64_encoded_value"} - more robust but more overhead.
-COMMAND_SEPARATOR = b'\n'
+# Commands use the binary format of distributed_fs.commands (opcode, key length, value
+# length, key, value). Servers still accept the older OPERATION\nKEY\nVALUE text format.
+
+# --consistency choices for GETs
+CONSISTENCY_LEVELS = {
+    "linearizable": raft_pb2.LINEARIZABLE,
+    "bounded": raft_pb2.BOUNDED_STALENESS,
+    "any": raft_pb2.ANY,
+}
 
 def format_command(operation: str, key: str, value: bytes = b'') -> bytes:
-    op = operation.upper().encode('utf-8')
-    k = key.encode('utf-8')
-    # Ensure no newlines in key
-    if COMMAND_SEPARATOR in k:
-        raise ValueError("Key cannot contain newline characters")
-    if operation.upper() == "PUT":
-        return op + COMMAND_SEPARATOR + k + COMMAND_SEPARATOR + value
-    else: # GET or DELETE
-        return op + COMMAND_SEPARATOR + k
+    if operation.upper() != "PUT":
+        value = b'' # GET or DELETE
+    return encode_command(operation, key, value)
 
 def parse_reply(reply: raft_pb2.ClientCommandReply):
     """Parses and prints the reply, including value for GET."""
@@ -50,8 +51,14 @@ def parse_reply(reply: raft_pb2.ClientCommandReply):
             logger.info(f"Leader hint: {reply.leader_hint}")
 
 
-async def run_command(initial_target: str, command_bytes: bytes, command_id: str):
-    """Sends command, handles redirection, returns final reply."""
+async def run_command(initial_target: str, command_bytes: bytes, command_id: str,
+                      consistency: int = raft_pb2.LINEARIZABLE,
+                      max_lag_entries: Optional[int] = None, max_staleness_ms: Optional[int] = None):
+    """
+    Sends command, handles redirection, returns final reply. `consistency` and the
+    staleness bounds only apply to GETs; anything but LINEARIZABLE can be answered
+    by the node we connect to without a redirect to the leader.
+    """
     target_address = initial_target
     max_redirects = 5 # Prevent infinite loops
 
@@ -63,8 +70,13 @@ async def run_command(initial_target: str, command_bytes: bytes, command_id: str
                 stub = raft_pb2_grpc.RaftServiceStub(channel)
                 request = raft_pb2.ClientCommandRequest(
                     command=command_bytes,
-                    command_id=command_id # Useful for deduplication (not implemented server-side yet)
+                    command_id=command_id, # Useful for deduplication (not implemented server-side yet)
+                    consistency=consistency
                 )
+                if max_lag_entries is not None:
+                    request.max_lag_entries = max_lag_entries
+                if max_staleness_ms is not None:
+                    request.max_staleness_ms = max_staleness_ms
 
                 # Add a reasonable timeout for the client call
                 client_rpc_timeout = 15.0 # Seconds
@@ -92,15 +104,111 @@ async def run_command(initial_target: str, command_bytes: bytes, command_id: str
     logger.error(f"Failed to execute command after {max_redirects} attempts.")
     return None
 
+def parse_batch_line(line: str) -> bytes:
+    """Turns one line of a batch file (`put KEY VALUE`, `get KEY` or `delete KEY`) into command bytes."""
+    parts = line.split(None, 2)
+    operation = parts[0].upper() if parts else ""
+    if operation == "PUT" and len(parts) == 3:
+        return format_command(operation, parts[1], parts[2].encode('utf-8'))
+    if operation in ("GET", "DELETE") and len(parts) == 2:
+        return format_command(operation, parts[1])
+    raise ValueError(f"Invalid batch line: {line!r}")
+
+async def run_batch(initial_target: str, commands: List[bytes], batch_size: int = 1000) -> Optional[List[raft_pb2.ClientCommandReply]]:
+    """
+    Sends commands with ExecuteBatch, `batch_size` commands per RPC over a single
+    channel, following leader redirects. Returns one reply per command (in order),
+    or None if the cluster could not be reached.
+    """
+    target_address = initial_target
+    max_redirects = 5 # Prevent infinite loops
+    results: List[raft_pb2.ClientCommandReply] = []
+    channel = grpc.aio.insecure_channel(target_address)
+    try:
+        stub = raft_pb2_grpc.RaftServiceStub(channel)
+        redirects = 0
+        while len(results) < len(commands):
+            chunk = commands[len(results):len(results) + batch_size]
+            request = raft_pb2.ClientBatchRequest(commands=[
+                raft_pb2.ClientCommandRequest(command=command, command_id=f"client_{os.getpid()}_{time.time_ns()}_{i}")
+                for i, command in enumerate(chunk)
+            ])
+            try:
+                client_rpc_timeout = 30.0 # Seconds
+                reply = await stub.ExecuteBatch(request, timeout=client_rpc_timeout)
+            except grpc.aio.AioRpcError as e:
+                logger.error(f"RPC error sending batch to {target_address}: {e.code()} - {e.details()}")
+                return None
+
+            if reply.success:
+                results.extend(reply.results)
+                logger.info(f"Batch of {len(chunk)} commands executed by {target_address} ({len(results)}/{len(commands)})")
+                continue
+            if not reply.leader_hint or redirects >= max_redirects:
+                logger.error(f"Batch failed: {reply.message}")
+                return None
+            # Failure with a redirect hint: reconnect to the leader and resend this chunk
+            redirects += 1
+            target_address = reply.leader_hint
+            logger.info(f"Redirected to leader: {target_address}. Retrying...")
+            await channel.close()
+            channel = grpc.aio.insecure_channel(target_address)
+            stub = raft_pb2_grpc.RaftServiceStub(channel)
+            await asyncio.sleep(0.1)
+    finally:
+        await channel.close()
+    return results
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Client for the Distributed FS.")
     parser.add_argument("server_address", help="Address (host:port) of any server in the cluster.")
-    parser.add_argument("command", choices=["put", "get", "delete"], help="Command to execute.")
-    parser.add_argument("key", help="The key for the operation.")
+    parser.add_argument("command", choices=["put", "get", "delete", "batch"], help="Command to execute.")
+    parser.add_argument("key", help="The key for the operation (for 'batch': file with one command per line, '-' for stdin).")
     parser.add_argument("value", nargs='?', default="", help="The value for 'put' command (read from stdin if '-')")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Commands per ExecuteBatch RPC for 'batch'")
+    parser.add_argument("--consistency", choices=sorted(CONSISTENCY_LEVELS), default="linearizable",
+                        help="Read consistency for 'get' (bounded/any may be served by a follower)")
+    parser.add_argument("--max-lag-entries", type=int, default=None, help="'bounded' reads: committed entries the node may lag by")
+    parser.add_argument("--max-staleness-ms", type=int, default=None, help="'bounded' reads: how long ago the node may have been caught up")
 
     args = parser.parse_args()
 
+    if args.command == "batch":
+        # Each line is `put KEY VALUE`, `get KEY` or `delete KEY`; blank lines and '#' comments are skipped
+        source = sys.stdin if args.key == "-" else open(args.key)
+        try:
+            lines = [line.rstrip('\n') for line in source if line.strip() and not line.startswith('#')]
+        finally:
+            if source is not sys.stdin:
+                source.close()
+        try:
+            batch_commands = [parse_batch_line(line) for line in lines]
+        except ValueError as e:
+            parser.error(str(e))
+
+        async def batch_main():
+            start = time.monotonic()
+            replies = await run_batch(args.server_address, batch_commands, args.batch_size)
+            if replies is None:
+                logger.error("Batch execution failed (no reply or error).")
+                sys.exit(1)
+            failed = 0
+            for line, reply in zip(lines, replies):
+                if reply.value:
+                    print(f"{line.split()[1]}: {reply.value.decode('utf-8', errors='replace')}")
+                if not reply.success:
+                    failed += 1
+                    logger.error(f"Failed: {line!r}: {reply.message}")
+            logger.info(f"Executed {len(replies)} commands in {time.monotonic() - start:.2f}s ({failed} failed)")
+            if failed:
+                sys.exit(1)
+
+        try:
+            asyncio.run(batch_main())
+        except KeyboardInterrupt:
+            logger.info("Client interrupted.")
+        sys.exit(0)
+
     # --- Prepare command ---
     operation = args.command.upper()
     key = args.key
@@ -126,7 +234,8 @@ if __name__ == "__main__":
 
     # --- Run Command ---
     async def main():
-        reply = await run_command(args.server_address, command_bytes, command_id)
+        reply = await run_command(args.server_address, command_bytes, command_id,
+                                  CONSISTENCY_LEVELS[args.consistency], args.max_lag_entries, args.max_staleness_ms)
         if reply:
             parse_reply(reply)
             # Exit code based on success?
@@ -2,9 +2,13 @@
 import argparse
 import asyncio
 import logging
+import os
 import signal
+import subprocess
+import sys
+import time
 from concurrent import futures
-from typing import List, Tuple
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
 import grpc
 
@@ -13,7 +17,10 @@ import grpc
 from distributed_fs.generated import raft_pb2, raft_pb2_grpc
 
 # Import the RaftNode class (we'll create this next)
+from distributed_fs.raft.multi_raft import (WORKER_PORT_STRIDE, MultiRaft, open_groups, prepare_data_dir,
+                                            worker_port)
 from distributed_fs.raft.node import RaftNode
+from distributed_fs.raft.state_machine import MemoryStateMachine, SqliteStateMachine
 
 # --- Basic Logging Setup ---
 logging.basicConfig(
@@ -22,65 +29,190 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# --- Constants ---
+WORKER_RESTART_DELAY_S = 1.0 # A worker that exits on its own is restarted after this pause
+SUPERVISOR_POLL_S = 0.5 # How often the supervisor checks on its workers
+
 # --- gRPC Service Implementation ---
+class PrependedFrames:
+    """
+    Async iterator over `first` followed by the rest of `frames`. Not an async
+    generator, so it can be dropped in the middle of a read when the stream is
+    cancelled (closing a generator that is awaiting raises RuntimeError).
+    """
+    def __init__(self, first, frames):
+        self._first = first
+        self._frames = frames
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._first is not None:
+            first, self._first = self._first, None
+            return first
+        return await self._frames.__anext__()
+
 class RaftServicer(raft_pb2_grpc.RaftServiceServicer):
     """
-    The gRPC service implementation. It delegates the actual Raft logic
-    to the RaftNode instance.
+    The gRPC service implementation. It delegates the actual Raft logic to
+    the RaftNode of the group each RPC is for (client commands: the group
+    owning their key).
     """
-    def __init__(self, raft_node: RaftNode):
-        self.raft_node = raft_node
-        logger.info("RaftServicer initialized.")
+    def __init__(self, raft_node: Union[RaftNode, MultiRaft]):
+        # A lone RaftNode is served as the only group
+        self.multi_raft = raft_node if isinstance(raft_node, MultiRaft) else MultiRaft({raft_node.group_id: raft_node})
+        logger.info(f"RaftServicer initialized ({len(self.multi_raft.groups)} Raft groups).")
+
+    async def _group(self, group_id: int, context) -> RaftNode:
+        node = self.multi_raft.group(group_id)
+        if node is None:
+            await context.abort(grpc.StatusCode.NOT_FOUND, f"Raft group {group_id} is not served here")
+        return node
 
     async def RequestVote(self, request: raft_pb2.RequestVoteArgs, context) -> raft_pb2.RequestVoteReply:
-        logger.debug(f"Received RequestVote call from {request.candidate_id} for term {request.term}")
+        logger.debug(f"Received RequestVote call from {request.candidate_id} for term {request.term} (group {request.group_id})")
         # Delegate the call to the RaftNode's handler method
-        return await self.raft_node.handle_request_vote(request)
+        return await (await self._group(request.group_id, context)).handle_request_vote(request)
 
     async def AppendEntries(self, request: raft_pb2.AppendEntriesArgs, context) -> raft_pb2.AppendEntriesReply:
-        logger.debug(f"Received AppendEntries call from {request.leader_id} for term {request.term}")
+        logger.debug(f"Received AppendEntries call from {request.leader_id} for term {request.term} (group {request.group_id})")
         # Delegate the call to the RaftNode's handler method
-        return await self.raft_node.handle_append_entries(request)
+        return await (await self._group(request.group_id, context)).handle_append_entries(request)
+
+    async def AppendEntriesStream(self, request_iterator, context):
+        logger.debug(f"Received AppendEntriesStream")
+        # A stream carries one group's log; its first frame says which
+        frames = request_iterator.__aiter__()
+        try:
+            first_frame = await frames.__anext__()
+        except StopAsyncIteration:
+            return
+        raft_node = await self._group(first_frame.group_id, context)
+        # Replies go back in frame order; the leader matches them to its requests by position
+        async for reply in raft_node.handle_append_entries_stream(PrependedFrames(first_frame, frames)):
+            yield reply
+
+    async def InstallSnapshot(self, request_iterator, context):
+        logger.debug(f"Received InstallSnapshot stream")
+        # Acknowledge every chunk on the reply stream so the leader can pace and resume the transfer
+        async for chunk in request_iterator:
+            yield await (await self._group(chunk.group_id, context)).handle_install_snapshot_chunk(chunk)
+
+    async def CoalescedHeartbeat(self, request: raft_pb2.CoalescedHeartbeatArgs, context) -> raft_pb2.CoalescedHeartbeatReply:
+        logger.debug(f"Received CoalescedHeartbeat call ({len(request.heartbeats)} groups)")
+        # Each group's heartbeat goes to that group's RaftNode
+        return await self.multi_raft.handle_coalesced_heartbeat(request)
 
     async def ExecuteCommand(self, request: raft_pb2.ClientCommandRequest, context) -> raft_pb2.ClientCommandReply:
         logger.debug(f"Received ExecuteCommand call")
-        # Delegate the call to the RaftNode's handler method
-        return await self.raft_node.handle_client_command(request)
+        # Delegate the call to the RaftNode of the group owning the key
+        return await self.multi_raft.handle_client_command(request)
+
+    async def ExecuteBatch(self, request: raft_pb2.ClientBatchRequest, context) -> raft_pb2.ClientBatchReply:
+        logger.debug(f"Received ExecuteBatch call ({len(request.commands)} commands)")
+        # Split by group and delegate each part to its group's RaftNode
+        return await self.multi_raft.handle_client_batch(request)
 
 # --- Server Startup and Shutdown ---
-async def serve(raft_node: RaftNode, port: int):
-    """Starts the asynchronous gRPC server."""
-    server = grpc.aio.server(futures.ThreadPoolExecutor(max_workers=10))
+async def serve(multi_raft: MultiRaft, port: int, own_port: Optional[int] = None):
+    """
+    Starts the asynchronous gRPC server. A worker process also listens on
+    `own_port`, where peers send the Raft traffic of the groups it serves,
+    and stops when its supervisor is gone.
+    """
+    # SO_REUSEPORT lets all worker processes of a node listen on its port; the kernel spreads connections
+    # over them. Anything else must fail to bind a port in use rather than share it with a stale server.
+    is_worker = own_port is not None
+    server = grpc.aio.server(futures.ThreadPoolExecutor(max_workers=10), options=[('grpc.so_reuseport', int(is_worker))])
     raft_pb2_grpc.add_RaftServiceServicer_to_server(
-        RaftServicer(raft_node), server
+        RaftServicer(multi_raft), server
     )
     listen_addr = f'[::]:{port}' # Listen on all interfaces (IPv6 compatible)
     server.add_insecure_port(listen_addr)
+    if own_port is not None:
+        server.add_insecure_port(f'[::]:{own_port}')
+        listen_addr += f" and [::]:{own_port}"
 
     logger.info(f"Starting server on {listen_addr}")
     await server.start()
 
-    # Start the Raft node's background tasks (like timers)
-    # We use create_task to run it concurrently with the server
-    raft_task = asyncio.create_task(raft_node.run())
+    # Start the Raft nodes' background tasks (like timers)
+    # We use create_task to run them concurrently with the server
+    raft_task = asyncio.create_task(multi_raft.run())
 
     # Graceful shutdown logic
     loop = asyncio.get_running_loop()
     stop = loop.create_future()
-    loop.add_signal_handler(signal.SIGTERM, stop.set_result, None)
-    loop.add_signal_handler(signal.SIGINT, stop.set_result, None)
+    def request_stop():
+        if not stop.done(): # A worker may get the signal from the terminal and from its supervisor
+            stop.set_result(None)
+    loop.add_signal_handler(signal.SIGTERM, request_stop)
+    loop.add_signal_handler(signal.SIGINT, request_stop)
+    if is_worker:
+        watch_task = asyncio.create_task(watch_supervisor(os.getppid(), request_stop))
 
     await stop # Wait for shutdown signal
 
-    logger.info("Shutdown signal received. Stopping server and Raft node...")
-    # Stop the Raft node first
-    await raft_node.stop()
+    logger.info("Shutdown signal received. Stopping server and Raft nodes...")
+    if is_worker:
+        watch_task.cancel()
+    # Stop the Raft nodes first
+    await multi_raft.stop()
     raft_task.cancel() # Ensure the task finishes if stop() didn't
 
     # Then stop the gRPC server
     await server.stop(grace=1) # Allow 1 second for ongoing calls
     logger.info("Server stopped.")
 
+# --- Multi-process Mode ---
+async def watch_supervisor(supervisor_pid: int, request_stop: Callable[[], None]):
+    """Calls request_stop once this worker's parent is no longer `supervisor_pid` (it died, even by SIGKILL)."""
+    while os.getppid() == supervisor_pid:
+        await asyncio.sleep(SUPERVISOR_POLL_S)
+    logger.warning(f"Supervisor (PID {supervisor_pid}) is gone, stopping")
+    request_stop()
+
+def supervise(num_workers: int, argv: List[str]):
+    """
+    Runs this script as workers 0..num_workers-1 of the node described by `argv`
+    and restarts any worker that exits, until SIGTERM or SIGINT, which it passes
+    on to the workers before waiting for them to stop.
+    """
+    stopping = False
+    def request_stop(_signum, _frame):
+        nonlocal stopping
+        stopping = True
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    def start_worker(worker: int) -> subprocess.Popen:
+        process = subprocess.Popen([sys.executable, os.path.abspath(__file__), *argv, "--worker", str(worker)])
+        logger.info(f"Supervisor: Started worker {worker} (PID {process.pid})")
+        return process
+
+    workers: Dict[int, subprocess.Popen] = {worker: start_worker(worker) for worker in range(num_workers)}
+    restart_at: Dict[int, float] = {} # {worker: monotonic time it is due to be restarted}
+    while not stopping:
+        time.sleep(SUPERVISOR_POLL_S)
+        now = time.monotonic()
+        for worker, process in workers.items():
+            if worker not in restart_at and process.poll() is not None:
+                logger.warning(f"Supervisor: Worker {worker} (PID {process.pid}) exited with code {process.returncode}, restarting it")
+                restart_at[worker] = now + WORKER_RESTART_DELAY_S
+        for worker, due in list(restart_at.items()):
+            if now >= due and not stopping:
+                del restart_at[worker]
+                workers[worker] = start_worker(worker)
+
+    logger.info("Supervisor: Shutdown signal received. Stopping workers...")
+    for process in workers.values():
+        if process.poll() is None:
+            process.send_signal(signal.SIGTERM)
+    for process in workers.values():
+        process.wait()
+    logger.info("Supervisor: Workers stopped.")
+
 # --- Argument Parsing and Main Execution ---
 def parse_peers(peer_list_str: str) -> List[Tuple[int, str]]:
     """Parses comma-separated peer list like '1@host1:port1,2@host2:port2'"""
@@ -103,11 +235,28 @@ if __name__ == '__main__':
     parser.add_argument("--peers", type=str, required=True, help="Comma-separated list of all peer nodes in the format 'id@host:port'")
     parser.add_argument("--data-dir", type=str, required=True, help="Directory to store Raft log and state")
     parser.add_argument("--debug", action="store_true", help="Enable debug logging")
+    parser.add_argument("--lease-reads", action="store_true", help="Serve GETs under a leader lease (assumes bounded clock drift)")
+    parser.add_argument("--lease-drift-ms", type=float, default=None, help="How far node clocks may drift apart during one lease (rate drift x lease), subtracted from it (default: node setting)")
+    parser.add_argument("--adaptive-heartbeat", action="store_true", help="Send heartbeats about once per measured RTT to each peer instead of every 50 ms")
+    parser.add_argument("--groups", type=int, default=1,
+                        help="Raft groups the keyspace is sharded into (by key hash); all nodes must use the same number")
+    parser.add_argument("--no-heartbeat-coalescing", action="store_true",
+                        help="With --groups, heartbeat each group separately instead of one RPC per peer for all groups")
+    parser.add_argument("--state-machine", choices=["memory", "sqlite"], default="memory",
+                        help="Where applied keys live: in memory (rebuilt on start) or in an SQLite file in the data dir")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes sharing --port, each serving every N-th Raft group (needs --groups >= N); all nodes must use the same number")
+    parser.add_argument("--worker-port-stride", type=int, default=WORKER_PORT_STRIDE,
+                        help="Worker w also listens on --port + stride * (w + 1) for its groups' Raft traffic; all nodes must use the same stride")
+    parser.add_argument("--worker", type=int, default=None, help=argparse.SUPPRESS) # Set by the supervisor
 
     args = parser.parse_args()
 
     if args.debug:
         logging.getLogger().setLevel(logging.DEBUG)
+    if args.worker is not None:
+        for handler in logging.getLogger().handlers:
+            handler.setFormatter(logging.Formatter(f'%(asctime)s - %(levelname)s - worker {args.worker} - %(name)s - %(message)s'))
 
     # Parse the peer list string into a usable format
     try:
@@ -132,15 +281,55 @@ if __name__ == '__main__':
     if my_addr is None:
         parser.error(f"Own ID {args.id} not found in the peers list: {args.peers}")
 
-    # Create the RaftNode instance
-    raft_node = RaftNode(
-        node_id=args.id,
-        peers_addresses=peer_addresses, # Pass the dict: {peer_id: "host:port", ...}
-        data_dir=args.data_dir
-    )
+    if args.groups < 1:
+        parser.error("--groups must be at least 1")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.workers > 1 and args.groups < args.workers:
+        parser.error(f"--workers {args.workers} needs at least as many --groups")
+    if args.worker is not None and not 0 <= args.worker < args.workers:
+        parser.error(f"--worker must be between 0 and {args.workers - 1}")
+
+    if args.workers > 1 and args.worker is None:
+        # Created up front, so the workers don't race each other laying out the groups
+        try:
+            prepare_data_dir(args.data_dir, args.groups)
+        except ValueError as e:
+            parser.error(str(e))
+        supervise(args.workers, sys.argv[1:])
+        sys.exit(0)
+
+    def make_state_machine(group_dir: str):
+        if args.state_machine == "sqlite":
+            return SqliteStateMachine(os.path.join(group_dir, "state_machine.sqlite"))
+        return MemoryStateMachine()
+
+    # Create this node's RaftNode instance for each group
+    try:
+        multi_raft = open_groups(
+            node_id=args.id,
+            peers_addresses=peer_addresses, # Pass the dict: {peer_id: "host:port", ...}
+            data_dir=args.data_dir,
+            num_groups=args.groups,
+            make_state_machine=make_state_machine,
+            coalesce_heartbeats=not args.no_heartbeat_coalescing,
+            num_workers=args.workers,
+            worker=args.worker or 0,
+            worker_port_stride=args.worker_port_stride
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    for raft_node in multi_raft.groups.values():
+        if args.adaptive_heartbeat:
+            raft_node.adaptive_heartbeat = True
+        if args.lease_reads:
+            raft_node.lease_reads = True
+            if args.lease_drift_ms is not None:
+                raft_node.lease_drift_bound_ms = args.lease_drift_ms
 
     # Run the server using asyncio
     try:
-        asyncio.run(serve(raft_node, args.port))
+        own_port = worker_port(args.port, args.worker, args.worker_port_stride) if args.workers > 1 else None
+        asyncio.run(serve(multi_raft, args.port, own_port))
     except KeyboardInterrupt:
         logger.info("Process interrupted by user.")
\ No newline at end of file
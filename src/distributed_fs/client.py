@@ -0,0 +1,383 @@
+# src/distributed_fs/client.py
+import asyncio
+import logging
+import random
+from typing import Awaitable, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple, Union
+
+import grpc
+
+from distributed_fs.commands import decode_command, encode_command
+from distributed_fs.generated import raft_pb2, raft_pb2_grpc
+from distributed_fs.sharding import UNSHARDED_GROUP_ID, group_for_key
+
+# --- Constants ---
+CLIENT_RPC_TIMEOUT_S = 15.0 # Deadline of one ExecuteCommand (a little above the server's commit wait)
+CLIENT_BATCH_TIMEOUT_S = 30.0 # Deadline of one ExecuteBatch
+MAX_ATTEMPTS = 10 # Failed tries (unreachable node, no leader known) per operation before giving up
+# Redirects don't count as failed tries, but after this many in a row the client backs off as if one had
+# failed, e.g. while followers still point at a leader that has just died
+MAX_CONSECUTIVE_REDIRECTS = 3
+RETRY_BACKOFF_INITIAL_S = 0.05 # Pause before the first retry after UNAVAILABLE or a leaderless reply
+RETRY_BACKOFF_MAX_S = 1.0 # The pause doubles per retry up to this
+MAX_IN_FLIGHT = 256 # RPCs a client has outstanding at once; more callers wait for a slot
+WRITE_BATCH_MAX_COMMANDS = 1000 # A coalesced write batch is sent at once when it reaches this size
+# Server reply messages the client acts on (replies carry no status code)
+NOT_LEADER = "Not the leader"
+TOO_STALE = "Node too stale for the requested bound"
+KEY_NOT_FOUND = "Key not found"
+
+logger = logging.getLogger(__name__)
+
+class ClientError(Exception):
+    """An operation failed: the cluster refused it, or couldn't be reached within MAX_ATTEMPTS."""
+    def __init__(self, message: str, reply: Optional[raft_pb2.ClientCommandReply] = None):
+        super().__init__(message)
+        self.reply = reply # The server's reply, if it sent one
+
+class WriteQueue:
+    """
+    Client-side queue that coalesces writes issued concurrently by many coroutines.
+
+    Writes for the same group submitted within `batch_window_ms` of the first
+    one (or until `max_batch_commands` are queued) are handed to `send_batch` as
+    one list, which runs them as one ExecuteBatch on the group's leader. Batches
+    are sent without waiting for earlier ones, so several can be in flight.
+    submit() returns a future that resolves to that write's reply once its
+    batch has been executed (for a successful write: committed).
+    """
+    def __init__(self, send_batch: Callable[[int, List[bytes]], Awaitable[List[raft_pb2.ClientCommandReply]]],
+                 batch_window_ms: float, max_batch_commands: int = WRITE_BATCH_MAX_COMMANDS):
+        self.send_batch = send_batch # (group_id, commands) -> one reply per command
+        self.batch_window_ms = batch_window_ms
+        self.max_batch_commands = max_batch_commands
+
+        self._commands: Dict[int, List[bytes]] = {} # {group_id: queued commands}
+        self._waiters: Dict[int, List[asyncio.Future]] = {} # {group_id: one future per queued command, same order}
+        self._flush_handles: Dict[int, asyncio.Handle] = {}
+        self._sending: Set[asyncio.Task] = set()
+
+    def submit(self, group_id: int, command: bytes) -> asyncio.Future:
+        """Queues a write for `group_id`. Returns a future for its reply."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._commands.setdefault(group_id, []).append(command)
+        self._waiters.setdefault(group_id, []).append(future)
+
+        if len(self._commands[group_id]) >= self.max_batch_commands:
+            self.flush(group_id)
+        elif group_id not in self._flush_handles:
+            if self.batch_window_ms > 0:
+                self._flush_handles[group_id] = loop.call_later(self.batch_window_ms / 1000.0, self.flush, group_id)
+            else:
+                # Still coalesces everything submitted during this loop iteration
+                self._flush_handles[group_id] = loop.call_soon(self.flush, group_id)
+        return future
+
+    def flush(self, group_id: int):
+        """Sends the queued writes of `group_id` as one batch."""
+        handle = self._flush_handles.pop(group_id, None)
+        if handle is not None:
+            handle.cancel()
+        commands = self._commands.pop(group_id, [])
+        waiters = self._waiters.pop(group_id, [])
+        if commands:
+            task = asyncio.create_task(self._send(group_id, commands, waiters))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def drain(self):
+        """Sends everything queued and waits until all batches have been answered."""
+        for group_id in list(self._commands):
+            self.flush(group_id)
+        while self._sending:
+            await asyncio.gather(*self._sending, return_exceptions=True)
+
+    async def _send(self, group_id: int, commands: List[bytes], waiters: List[asyncio.Future]):
+        try:
+            replies = await self.send_batch(group_id, commands)
+        except Exception as e:
+            logger.debug(f"Client: Batch of {len(commands)} coalesced writes for group {group_id} failed: {e}")
+            for future in waiters:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future, reply in zip(waiters, replies):
+            if not future.done():
+                future.set_result(reply)
+
+class Client:
+    """
+    Async client for a cluster, meant to live as long as the application.
+
+    Keeps one persistent channel per cluster member (and per address it is
+    redirected to), and caches the leader of each Raft group from the
+    leader_hint of redirects, so once warmed up an operation costs one round
+    trip to the node that executes it. Tell it the cluster's `num_groups` to
+    route each key to its own group's leader; otherwise a sharded cluster
+    forwards or redirects for it. UNAVAILABLE members and leaderless replies
+    (elections) are retried on the next member with exponential backoff.
+
+    Calls from concurrent coroutines are pipelined: each is its own stream on
+    the shared HTTP/2 connection, up to `max_in_flight` at once. With
+    `write_batch_window_ms` set, put() and delete() calls issued within that
+    window are also coalesced per group into one ExecuteBatch (WriteQueue);
+    each call still returns once its own write has committed.
+
+        async with Client(["localhost:8001", "localhost:8002"]) as client:
+            await client.put("a", b"1")
+            value = await client.get("a")
+    """
+    def __init__(self, addresses: Iterable[str], num_groups: int = 1,
+                 timeout: float = CLIENT_RPC_TIMEOUT_S, max_attempts: int = MAX_ATTEMPTS,
+                 max_in_flight: int = MAX_IN_FLIGHT, write_batch_window_ms: Optional[float] = None,
+                 max_batch_commands: int = WRITE_BATCH_MAX_COMMANDS):
+        self.members = list(addresses) # Seed addresses ("host:port"), tried in turn while no leader is known
+        if not self.members:
+            raise ValueError("Client needs the address of at least one cluster member")
+        self.num_groups = num_groups
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.max_in_flight = max_in_flight
+        self._channels: Dict[str, grpc.aio.Channel] = {} # {address: channel}, kept open until close()
+        self._stubs: Dict[str, raft_pb2_grpc.RaftServiceStub] = {}
+        self._leaders: Dict[int, str] = {} # {group_id: address of its last known leader}
+        self._next_member = random.randrange(len(self.members)) # Spreads clients over the members
+        # Created on first use: before Python 3.10 a semaphore binds to the loop current at
+        # construction, and a Client may be built before asyncio.run() starts the real one
+        self._in_flight: Optional[asyncio.Semaphore] = None
+        # Coalesces concurrent writes when a window is set (None: every write is its own ExecuteCommand)
+        self._writes = None if write_batch_window_ms is None else \
+            WriteQueue(self._execute_group, write_batch_window_ms, max_batch_commands)
+
+    async def __aenter__(self) -> "Client":
+        self.connect()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def connect(self):
+        """Opens channels to all members now instead of at their first use."""
+        for address in self.members:
+            self._channel(address).get_state(try_to_connect=True)
+
+    async def close(self):
+        if self._writes is not None:
+            await self._writes.drain() # Queued writes still go out
+        for channel in self._channels.values():
+            await channel.close()
+        self._channels.clear()
+        self._stubs.clear()
+
+    # --- Key-value operations ---
+
+    async def put(self, key: str, value: bytes):
+        self._checked(await self._write(encode_command("PUT", key, value)))
+
+    async def get(self, key: str, consistency: int = raft_pb2.LINEARIZABLE,
+                  max_lag_entries: Optional[int] = None, max_staleness_ms: Optional[int] = None) -> Optional[bytes]:
+        """
+        Value of `key`, or None if it has none. Reads other than LINEARIZABLE may be
+        answered by any member within the given staleness bounds.
+        """
+        reply = await self.execute(encode_command("GET", key), consistency, max_lag_entries, max_staleness_ms)
+        if not reply.success and reply.message == KEY_NOT_FOUND:
+            return None
+        return self._checked(reply).value
+
+    async def delete(self, key: str):
+        self._checked(await self._write(encode_command("DELETE", key)))
+
+    async def put_many(self, items: Union[Mapping[str, bytes], Iterable[Tuple[str, bytes]]]):
+        """Writes all items in as few ExecuteBatch calls as there are groups involved."""
+        pairs = list(items.items()) if isinstance(items, Mapping) else list(items)
+        for reply in await self.execute_batch([encode_command("PUT", key, value) for key, value in pairs]):
+            self._checked(reply)
+
+    async def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        """Linearizable values of `keys` (None where a key has none), read in batches."""
+        values: List[Optional[bytes]] = []
+        for reply in await self.execute_batch([encode_command("GET", key) for key in keys]):
+            if not reply.success and reply.message == KEY_NOT_FOUND:
+                values.append(None)
+            else:
+                values.append(self._checked(reply).value)
+        return values
+
+    async def delete_many(self, keys: Sequence[str]):
+        for reply in await self.execute_batch([encode_command("DELETE", key) for key in keys]):
+            self._checked(reply)
+
+    @staticmethod
+    def _checked(reply: raft_pb2.ClientCommandReply) -> raft_pb2.ClientCommandReply:
+        if not reply.success:
+            raise ClientError(reply.message, reply)
+        return reply
+
+    # --- Commands ---
+
+    async def _write(self, command: bytes) -> raft_pb2.ClientCommandReply:
+        if self._writes is None:
+            return await self.execute(command)
+        return await self._writes.submit(self._group_for(command), command)
+
+    async def execute(self, command: bytes, consistency: int = raft_pb2.LINEARIZABLE,
+                      max_lag_entries: Optional[int] = None, max_staleness_ms: Optional[int] = None) -> raft_pb2.ClientCommandReply:
+        """
+        Runs one encoded command on its group's leader (a read that tolerates staleness:
+        on the next member) and returns the final reply, following redirects.
+        Raises ClientError if no member could run it within max_attempts.
+        """
+        request = raft_pb2.ClientCommandRequest(command=command, consistency=consistency)
+        if max_lag_entries is not None:
+            request.max_lag_entries = max_lag_entries
+        if max_staleness_ms is not None:
+            request.max_staleness_ms = max_staleness_ms
+        group_id = self._group_for(command)
+        follower_read = consistency != raft_pb2.LINEARIZABLE
+        address = self._member() if follower_read else self._address_for(group_id)
+        attempt = 1
+        redirects = 0
+        while attempt <= self.max_attempts:
+            try:
+                async with self._rpc_slot():
+                    reply = await self._stub(address).ExecuteCommand(request, timeout=self.timeout)
+            except grpc.aio.AioRpcError as e:
+                if e.code() != grpc.StatusCode.UNAVAILABLE:
+                    raise ClientError(f"{address}: {e.code()} - {e.details()}") from e
+                logger.debug(f"Client: {address} unavailable (attempt {attempt}), trying the next member")
+                address = self._retry_elsewhere(group_id, address)
+                await self._backoff(attempt)
+                attempt, redirects = attempt + 1, 0
+                continue
+            if reply.success or reply.message not in (NOT_LEADER, TOO_STALE):
+                if not follower_read:
+                    self._leaders[group_id] = address
+                return reply
+            if reply.leader_hint and reply.leader_hint != address and redirects < MAX_CONSECUTIVE_REDIRECTS:
+                logger.debug(f"Client: {address} redirected group {group_id} to {reply.leader_hint}")
+                self._leaders[group_id] = address = reply.leader_hint
+                redirects += 1
+            else:
+                # No leader known (an election is under way): give it time, then ask someone else
+                address = self._retry_elsewhere(group_id, address)
+                await self._backoff(attempt)
+                attempt, redirects = attempt + 1, 0
+        raise ClientError(f"Command not executed after {self.max_attempts} attempts")
+
+    async def execute_batch(self, commands: Sequence[bytes]) -> List[raft_pb2.ClientCommandReply]:
+        """
+        Runs encoded commands with ExecuteBatch, one call per group (all groups at once,
+        each to its cached leader), and returns one reply per command in order. Commands
+        a node couldn't run because their group is led elsewhere are resent there.
+        """
+        results: List[Optional[raft_pb2.ClientCommandReply]] = [None] * len(commands)
+        positions: Dict[int, List[int]] = {} # {group_id: positions of its commands}
+        for position, command in enumerate(commands):
+            positions.setdefault(self._group_for(command), []).append(position)
+        await asyncio.gather(*(self._execute_part(group_id, group_positions, commands, results)
+                               for group_id, group_positions in positions.items()))
+        return results
+
+    async def _execute_group(self, group_id: int, commands: List[bytes]) -> List[raft_pb2.ClientCommandReply]:
+        """Runs commands of one group as one batch (WriteQueue's sender)."""
+        results: List[Optional[raft_pb2.ClientCommandReply]] = [None] * len(commands)
+        await self._execute_part(group_id, list(range(len(commands))), commands, results)
+        return results
+
+    async def _execute_part(self, group_id: int, positions: List[int], commands: Sequence[bytes],
+                            results: List[Optional[raft_pb2.ClientCommandReply]],
+                            address: Optional[str] = None, attempt: int = 1):
+        """Runs the commands at `positions` (of one group, as far as we know) and fills in their results."""
+        cache_leader = address is None # A redirect target for a few commands says nothing about the group
+        address = address or self._address_for(group_id)
+        request = raft_pb2.ClientBatchRequest(commands=[
+            raft_pb2.ClientCommandRequest(command=commands[position]) for position in positions])
+        redirects = 0
+        while attempt <= self.max_attempts:
+            try:
+                async with self._rpc_slot():
+                    reply = await self._stub(address).ExecuteBatch(request, timeout=CLIENT_BATCH_TIMEOUT_S)
+            except grpc.aio.AioRpcError as e:
+                if e.code() != grpc.StatusCode.UNAVAILABLE:
+                    raise ClientError(f"{address}: {e.code()} - {e.details()}") from e
+                address = self._retry_elsewhere(group_id, address)
+                await self._backoff(attempt)
+                attempt, redirects = attempt + 1, 0
+                continue
+            if reply.success:
+                break
+            if reply.leader_hint and reply.leader_hint != address and redirects < MAX_CONSECUTIVE_REDIRECTS:
+                address = reply.leader_hint
+                if cache_leader:
+                    self._leaders[group_id] = address
+                redirects += 1
+            else:
+                address = self._retry_elsewhere(group_id, address)
+                await self._backoff(attempt)
+                attempt, redirects = attempt + 1, 0
+        else:
+            for position in positions:
+                results[position] = raft_pb2.ClientCommandReply(success=False, message=f"Batch not executed after {self.max_attempts} attempts")
+            return
+
+        if cache_leader:
+            self._leaders[group_id] = address
+        redirected: Dict[str, List[int]] = {} # {leader_hint: positions} of commands led elsewhere
+        for position, result in zip(positions, reply.results):
+            if not result.success and result.message == NOT_LEADER and result.leader_hint and attempt < self.max_attempts:
+                redirected.setdefault(result.leader_hint, []).append(position)
+            else:
+                results[position] = result
+        await asyncio.gather(*(self._execute_part(group_id, hint_positions, commands, results, hint, attempt + 1)
+                               for hint, hint_positions in redirected.items()))
+
+    # --- Routing ---
+
+    def _group_for(self, command: bytes) -> int:
+        """Group of the key `command` operates on, as far as the client knows the sharding."""
+        if self.num_groups <= 1:
+            return UNSHARDED_GROUP_ID
+        try:
+            _operation, key, _value = decode_command(command)
+        except ValueError:
+            return UNSHARDED_GROUP_ID # The server rejects it
+        return group_for_key(key, self.num_groups)
+
+    def _address_for(self, group_id: int) -> str:
+        return self._leaders.get(group_id) or self._member()
+
+    def _member(self) -> str:
+        """The next member in turn."""
+        address = self.members[self._next_member % len(self.members)]
+        self._next_member += 1
+        return address
+
+    def _retry_elsewhere(self, group_id: int, address: str) -> str:
+        """Forgets `address` as the group's leader and picks another member to try."""
+        if self._leaders.get(group_id) == address:
+            del self._leaders[group_id]
+        candidate = self._member()
+        if candidate == address and len(self.members) > 1:
+            candidate = self._member()
+        return candidate
+
+    async def _backoff(self, attempt: int):
+        delay = min(RETRY_BACKOFF_INITIAL_S * 2 ** (attempt - 1), RETRY_BACKOFF_MAX_S)
+        await asyncio.sleep(delay * random.uniform(0.5, 1.0)) # Jitter, so clients don't retry in lockstep
+
+    def _rpc_slot(self) -> asyncio.Semaphore:
+        """The semaphore capping outstanding RPCs at max_in_flight (see __init__)."""
+        if self._in_flight is None:
+            self._in_flight = asyncio.Semaphore(self.max_in_flight)
+        return self._in_flight
+
+    def _channel(self, address: str) -> grpc.aio.Channel:
+        if address not in self._channels:
+            self._channels[address] = grpc.aio.insecure_channel(address)
+            self._stubs[address] = raft_pb2_grpc.RaftServiceStub(self._channels[address])
+        return self._channels[address]
+
+    def _stub(self, address: str) -> raft_pb2_grpc.RaftServiceStub:
+        self._channel(address)
+        return self._stubs[address]
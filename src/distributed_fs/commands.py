@@ -0,0 +1,59 @@
+# src/distributed_fs/commands.py
+import struct
+from typing import Tuple
+
+# --- Constants ---
+# Binary command: magic, opcode, key length, value length, then the UTF-8 key and the raw value.
+# The magic byte isn't printable ASCII, so it never starts a legacy text command.
+COMMAND_MAGIC = 0xB1
+COMMAND_HEADER = struct.Struct("!BBHI")
+MAX_KEY_BYTES = 0xFFFF
+MAX_VALUE_BYTES = 0xFFFFFFFF
+OPCODES = {"PUT": 1, "GET": 2, "DELETE": 3}
+OPERATIONS = {opcode: operation for operation, opcode in OPCODES.items()}
+# Legacy text format: OPERATION\nKEY\nVALUE (value is empty for GET/DELETE)
+TEXT_SEPARATOR = b'\n'
+
+def encode_command(operation: str, key: str, value: bytes = b'') -> bytes:
+    """Encodes a client command in the binary format. Raises ValueError if it can't be represented."""
+    opcode = OPCODES.get(operation.upper())
+    if opcode is None:
+        raise ValueError(f"Unknown operation {operation!r}")
+    key_bytes = key.encode('utf-8')
+    if len(key_bytes) > MAX_KEY_BYTES:
+        raise ValueError(f"Key is {len(key_bytes)} bytes, at most {MAX_KEY_BYTES} are allowed")
+    if len(value) > MAX_VALUE_BYTES:
+        raise ValueError(f"Value is {len(value)} bytes, at most {MAX_VALUE_BYTES} are allowed")
+    return COMMAND_HEADER.pack(COMMAND_MAGIC, opcode, len(key_bytes), len(value)) + key_bytes + value
+
+def decode_command(command: bytes) -> Tuple[str, str, bytes]:
+    """
+    Decodes a binary or legacy text command into (operation, key, value); value is
+    b'' for GET/DELETE. Raises ValueError if the command is malformed.
+
+    The header is unpacked in place and key and value are sliced straight out of
+    `command`, one copy each. Going through a memoryview doesn't save anything here:
+    the value has to end up as bytes anyway (protobuf and the state machines need
+    bytes), and for typical key sizes creating the view costs more than the copy.
+    """
+    if not command or command[0] != COMMAND_MAGIC:
+        return _decode_text_command(command)
+    if len(command) < COMMAND_HEADER.size:
+        raise ValueError(f"Command too short ({len(command)} bytes)")
+    _magic, opcode, key_len, value_len = COMMAND_HEADER.unpack_from(command)
+    key_end = COMMAND_HEADER.size + key_len
+    if key_end + value_len != len(command):
+        raise ValueError(f"Command length {len(command)} doesn't match its header (key {key_len}, value {value_len} bytes)")
+    operation = OPERATIONS.get(opcode)
+    if operation is None:
+        raise ValueError(f"Unknown opcode {opcode}")
+    return operation, command[COMMAND_HEADER.size:key_end].decode('utf-8'), command[key_end:]
+
+def _decode_text_command(command: bytes) -> Tuple[str, str, bytes]:
+    parts = command.split(TEXT_SEPARATOR, 2)
+    operation = parts[0].decode('utf-8').upper()
+    if operation == "PUT" and len(parts) == 3:
+        return operation, parts[1].decode('utf-8'), parts[2]
+    if (operation == "GET" or operation == "DELETE") and len(parts) >= 2:
+        return operation, parts[1].decode('utf-8'), b''
+    raise ValueError(f"incorrect parts for op '{operation}': {len(parts)} parts found")
@@ -24,27 +24,41 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\nraft.proto\x12\x04raft\"d\n\x0fRequestVoteArgs\x12\x0c\n\x04term\x18\x01 \x01(\x03\x12\x14\n\x0c\x63\x61ndidate_id\x18\x02 \x01(\x05\x12\x16\n\x0elast_log_index\x18\x03 \x01(\x03\x12\x15\n\rlast_log_term\x18\x04 \x01(\x03\"6\n\x10RequestVoteReply\x12\x0c\n\x04term\x18\x01 \x01(\x03\x12\x14\n\x0cvote_granted\x18\x02 \x01(\x08\")\n\x08LogEntry\x12\x0c\n\x04term\x18\x01 \x01(\x03\x12\x0f\n\x07\x63ommand\x18\x02 \x01(\x0c\"\x9b\x01\n\x11\x41ppendEntriesArgs\x12\x0c\n\x04term\x18\x01 \x01(\x03\x12\x11\n\tleader_id\x18\x02 \x01(\x05\x12\x16\n\x0eprev_log_index\x18\x03 \x01(\x03\x12\x15\n\rprev_log_term\x18\x04 \x01(\x03\x12\x1f\n\x07\x65ntries\x18\x05 \x03(\x0b\x32\x0e.raft.LogEntry\x12\x15\n\rleader_commit\x18\x06 \x01(\x03\"3\n\x12\x41ppendEntriesReply\x12\x0c\n\x04term\x18\x01 \x01(\x03\x12\x0f\n\x07success\x18\x02 \x01(\x08\";\n\x14\x43lientCommandRequest\x12\x0f\n\x07\x63ommand\x18\x01 \x01(\x0c\x12\x12\n\ncommand_id\x18\x02 \x01(\t\"Z\n\x12\x43lientCommandReply\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x13\n\x0bleader_hint\x18\x02 \x01(\t\x12\x0f\n\x07message\x18\x03 \x01(\t\x12\r\n\x05value\x18\x04 \x01(\x0c\x32\xdd\x01\n\x0bRaftService\x12>\n\x0bRequestVote\x12\x15.raft.RequestVoteArgs\x1a\x16.raft.RequestVoteReply\"\x00\x12\x44\n\rAppendEntries\x12\x17.raft.AppendEntriesArgs\x1a\x18.raft.AppendEntriesReply\"\x00\x12H\n\x0e\x45xecuteCommand\x12\x1a.raft.ClientCommandRequest\x1a\x18.raft.ClientCommandReply\"\x00\x62\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\nraft.proto\x12\x04raft\"v\n\x0fRequestVoteArgs\x12\x0c\n\x04term\x18\x01 \x01(\x03\x12\x14\n\x0c\x63\x61ndidate_id\x18\x02 \x01(\x05\x12\x16\n\x0elast_log_index\x18\x03 \x01(\x03\x12\x15\n\rlast_log_term\x18\x04 \x01(\x03\x12\x10\n\x08group_id\x18\x05 \x01(\x05\"6\n\x10RequestVoteReply\x12\x0c\n\x04term\x18\x01 \x01(\x03\x12\x14\n\x0cvote_granted\x18\x02 \x01(\x08\")\n\x08LogEntry\x12\x0c\n\x04term\x18\x01 \x01(\x03\x12\x0f\n\x07\x63ommand\x18\x02 \x01(\x0c\"\xb2\x01\n\x11\x41ppendEntriesArgs\x12\x0c\n\x04term\x18\x01 \x01(\x03\x12\x11\n\tleader_id\x18\x02 \x01(\x05\x12\x16\n\x0eprev_log_index\x18\x03 \x01(\x03\x12\x15\n\rprev_log_term\x18\x04 \x01(\x03\x12\x0f\n\x07\x65ntries\x18\x05 \x03(\x0c\x12\x15\n\rleader_commit\x18\x06 \x01(\x03\x12\x13\n\x0b\x65ntry_terms\x18\x07 \x03(\x03\x12\x10\n\x08group_id\x18\x08 \x01(\x05\"z\n\x12\x41ppendEntriesReply\x12\x0c\n\x04term\x18\x01 \x01(\x03\x12\x0f\n\x07success\x18\x02 \x01(\x08\x12\x15\n\rconflict_term\x18\x03 \x01(\x03\x12\x16\n\x0e\x63onflict_index\x18\x04 \x01(\x03\x12\x16\n\x0elast_log_index\x18\x05 \x01(\x03\"E\n\x16\x43oalescedHeartbeatArgs\x12+\n\nheartbeats\x18\x01 \x03(\x0b\x32\x17.raft.AppendEntriesArgs\"D\n\x17\x43oalescedHeartbeatReply\x12)\n\x07replies\x18\x01 \x03(\x0b\x32\x18.raft.AppendEntriesReply\"\xae\x01\n\x14InstallSnapshotChunk\x12\x0c\n\x04term\x18\x01 \x01(\x03\x12\x11\n\tleader_id\x18\x02 \x01(\x05\x12\x1b\n\x13last_included_index\x18\x03 \x01(\x03\x12\x1a\n\x12last_included_term\x18\x04 \x01(\x03\x12\x0e\n\x06offset\x18\x05 \x01(\x03\x12\x0c\n\x04\x64\x61ta\x18\x06 \x01(\x0c\x12\x0c\n\x04\x64one\x18\x07 \x01(\x08\x12\x10\n\x08group_id\x18\x08 \x01(\x05\"H\n\x14InstallSnapshotReply\x12\x0c\n\x04term\x18\x01 \x01(\x03\x12\x14\n\x0c\x62ytes_stored\x18\x02 \x01(\x03\x12\x0c\n\x04\x64one\x18\x03 \x01(\x08\"\xcd\x01\n\x14\x43lientCommandRequest\x12\x0f\n\x07\x63ommand\x18\x01 \x01(\x0c\x12\x12\n\ncommand_id\x18\x02 \x01(\t\x12*\n\x0b\x63onsistency\x18\x03 \x01(\x0e\x32\x15.raft.ReadConsistency\x12\x1c\n\x0fmax_lag_entries\x18\x04 \x01(\x04H\x00\x88\x01\x01\x12\x1d\n\x10max_staleness_ms\x18\x05 \x01(\rH\x01\x88\x01\x01\x42\x12\n\x10_max_lag_entriesB\x13\n\x11_max_staleness_ms\"Z\n\x12\x43lientCommandReply\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x13\n\x0bleader_hint\x18\x02 \x01(\t\x12\x0f\n\x07message\x18\x03 \x01(\t\x12\r\n\x05value\x18\x04 \x01(\x0c\"B\n\x12\x43lientBatchRequest\x12,\n\x08\x63ommands\x18\x01 \x03(\x0b\x32\x1a.raft.ClientCommandRequest\"t\n\x10\x43lientBatchReply\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x13\n\x0bleader_hint\x18\x02 \x01(\t\x12\x0f\n\x07message\x18\x03 \x01(\t\x12)\n\x07results\x18\x04 \x03(\x0b\x32\x18.raft.ClientCommandReply*C\n\x0fReadConsistency\x12\x10\n\x0cLINEARIZABLE\x10\x00\x12\x15\n\x11\x42OUNDED_STALENESS\x10\x01\x12\x07\n\x03\x41NY\x10\x02\x32\x97\x04\n\x0bRaftService\x12>\n\x0bRequestVote\x12\x15.raft.RequestVoteArgs\x1a\x16.raft.RequestVoteReply\"\x00\x12\x44\n\rAppendEntries\x12\x17.raft.AppendEntriesArgs\x1a\x18.raft.AppendEntriesReply\"\x00\x12N\n\x13\x41ppendEntriesStream\x12\x17.raft.AppendEntriesArgs\x1a\x18.raft.AppendEntriesReply\"\x00(\x01\x30\x01\x12O\n\x0fInstallSnapshot\x12\x1a.raft.InstallSnapshotChunk\x1a\x1a.raft.InstallSnapshotReply\"\x00(\x01\x30\x01\x12H\n\x0e\x45xecuteCommand\x12\x1a.raft.ClientCommandRequest\x1a\x18.raft.ClientCommandReply\"\x00\x12S\n\x12\x43oalescedHeartbeat\x12\x1c.raft.CoalescedHeartbeatArgs\x1a\x1d.raft.CoalescedHeartbeatReply\"\x00\x12\x42\n\x0c\x45xecuteBatch\x12\x18.raft.ClientBatchRequest\x1a\x16.raft.ClientBatchReply\"\x00\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'raft_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
+  _globals['_READCONSISTENCY']._serialized_start=1422
+  _globals['_READCONSISTENCY']._serialized_end=1489
   _globals['_REQUESTVOTEARGS']._serialized_start=20
-  _globals['_REQUESTVOTEARGS']._serialized_end=120
-  _globals['_REQUESTVOTEREPLY']._serialized_start=122
-  _globals['_REQUESTVOTEREPLY']._serialized_end=176
-  _globals['_LOGENTRY']._serialized_start=178
-  _globals['_LOGENTRY']._serialized_end=219
-  _globals['_APPENDENTRIESARGS']._serialized_start=222
-  _globals['_APPENDENTRIESARGS']._serialized_end=377
-  _globals['_APPENDENTRIESREPLY']._serialized_start=379
-  _globals['_APPENDENTRIESREPLY']._serialized_end=430
-  _globals['_CLIENTCOMMANDREQUEST']._serialized_start=432
-  _globals['_CLIENTCOMMANDREQUEST']._serialized_end=491
-  _globals['_CLIENTCOMMANDREPLY']._serialized_start=493
-  _globals['_CLIENTCOMMANDREPLY']._serialized_end=583
-  _globals['_RAFTSERVICE']._serialized_start=586
-  _globals['_RAFTSERVICE']._serialized_end=807
+  _globals['_REQUESTVOTEARGS']._serialized_end=138
+  _globals['_REQUESTVOTEREPLY']._serialized_start=140
+  _globals['_REQUESTVOTEREPLY']._serialized_end=194
+  _globals['_LOGENTRY']._serialized_start=196
+  _globals['_LOGENTRY']._serialized_end=237
+  _globals['_APPENDENTRIESARGS']._serialized_start=240
+  _globals['_APPENDENTRIESARGS']._serialized_end=418
+  _globals['_APPENDENTRIESREPLY']._serialized_start=420
+  _globals['_APPENDENTRIESREPLY']._serialized_end=542
+  _globals['_COALESCEDHEARTBEATARGS']._serialized_start=544
+  _globals['_COALESCEDHEARTBEATARGS']._serialized_end=613
+  _globals['_COALESCEDHEARTBEATREPLY']._serialized_start=615
+  _globals['_COALESCEDHEARTBEATREPLY']._serialized_end=683
+  _globals['_INSTALLSNAPSHOTCHUNK']._serialized_start=686
+  _globals['_INSTALLSNAPSHOTCHUNK']._serialized_end=860
+  _globals['_INSTALLSNAPSHOTREPLY']._serialized_start=862
+  _globals['_INSTALLSNAPSHOTREPLY']._serialized_end=934
+  _globals['_CLIENTCOMMANDREQUEST']._serialized_start=937
+  _globals['_CLIENTCOMMANDREQUEST']._serialized_end=1142
+  _globals['_CLIENTCOMMANDREPLY']._serialized_start=1144
+  _globals['_CLIENTCOMMANDREPLY']._serialized_end=1234
+  _globals['_CLIENTBATCHREQUEST']._serialized_start=1236
+  _globals['_CLIENTBATCHREQUEST']._serialized_end=1302
+  _globals['_CLIENTBATCHREPLY']._serialized_start=1304
+  _globals['_CLIENTBATCHREPLY']._serialized_end=1420
+  _globals['_RAFTSERVICE']._serialized_start=1492
+  _globals['_RAFTSERVICE']._serialized_end=2027
 # @@protoc_insertion_point(module_scope)
@@ -1,21 +1,33 @@
 from google.protobuf.internal import containers as _containers
+from google.protobuf.internal import enum_type_wrapper as _enum_type_wrapper
 from google.protobuf import descriptor as _descriptor
 from google.protobuf import message as _message
 from typing import ClassVar as _ClassVar, Iterable as _Iterable, Mapping as _Mapping, Optional as _Optional, Union as _Union
 
 DESCRIPTOR: _descriptor.FileDescriptor
 
+class ReadConsistency(int, metaclass=_enum_type_wrapper.EnumTypeWrapper):
+    __slots__ = ()
+    LINEARIZABLE: _ClassVar[ReadConsistency]
+    BOUNDED_STALENESS: _ClassVar[ReadConsistency]
+    ANY: _ClassVar[ReadConsistency]
+LINEARIZABLE: ReadConsistency
+BOUNDED_STALENESS: ReadConsistency
+ANY: ReadConsistency
+
 class RequestVoteArgs(_message.Message):
-    __slots__ = ("term", "candidate_id", "last_log_index", "last_log_term")
+    __slots__ = ("term", "candidate_id", "last_log_index", "last_log_term", "group_id")
     TERM_FIELD_NUMBER: _ClassVar[int]
     CANDIDATE_ID_FIELD_NUMBER: _ClassVar[int]
     LAST_LOG_INDEX_FIELD_NUMBER: _ClassVar[int]
     LAST_LOG_TERM_FIELD_NUMBER: _ClassVar[int]
+    GROUP_ID_FIELD_NUMBER: _ClassVar[int]
     term: int
     candidate_id: int
     last_log_index: int
     last_log_term: int
-    def __init__(self, term: _Optional[int] = ..., candidate_id: _Optional[int] = ..., last_log_index: _Optional[int] = ..., last_log_term: _Optional[int] = ...) -> None: ...
+    group_id: int
+    def __init__(self, term: _Optional[int] = ..., candidate_id: _Optional[int] = ..., last_log_index: _Optional[int] = ..., last_log_term: _Optional[int] = ..., group_id: _Optional[int] = ...) -> None: ...
 
 class RequestVoteReply(_message.Message):
     __slots__ = ("term", "vote_granted")
@@ -34,36 +46,94 @@ class LogEntry(_message.Message):
     def __init__(self, term: _Optional[int] = ..., command: _Optional[bytes] = ...) -> None: ...
 
 class AppendEntriesArgs(_message.Message):
-    __slots__ = ("term", "leader_id", "prev_log_index", "prev_log_term", "entries", "leader_commit")
+    __slots__ = ("term", "leader_id", "prev_log_index", "prev_log_term", "entries", "leader_commit", "entry_terms", "group_id")
     TERM_FIELD_NUMBER: _ClassVar[int]
     LEADER_ID_FIELD_NUMBER: _ClassVar[int]
     PREV_LOG_INDEX_FIELD_NUMBER: _ClassVar[int]
     PREV_LOG_TERM_FIELD_NUMBER: _ClassVar[int]
     ENTRIES_FIELD_NUMBER: _ClassVar[int]
     LEADER_COMMIT_FIELD_NUMBER: _ClassVar[int]
+    ENTRY_TERMS_FIELD_NUMBER: _ClassVar[int]
+    GROUP_ID_FIELD_NUMBER: _ClassVar[int]
     term: int
     leader_id: int
     prev_log_index: int
     prev_log_term: int
-    entries: _containers.RepeatedCompositeFieldContainer[LogEntry]
+    entries: _containers.RepeatedScalarFieldContainer[bytes]
     leader_commit: int
-    def __init__(self, term: _Optional[int] = ..., leader_id: _Optional[int] = ..., prev_log_index: _Optional[int] = ..., prev_log_term: _Optional[int] = ..., entries: _Optional[_Iterable[_Union[LogEntry, _Mapping]]] = ..., leader_commit: _Optional[int] = ...) -> None: ...
+    entry_terms: _containers.RepeatedScalarFieldContainer[int]
+    group_id: int
+    def __init__(self, term: _Optional[int] = ..., leader_id: _Optional[int] = ..., prev_log_index: _Optional[int] = ..., prev_log_term: _Optional[int] = ..., entries: _Optional[_Iterable[bytes]] = ..., leader_commit: _Optional[int] = ..., entry_terms: _Optional[_Iterable[int]] = ..., group_id: _Optional[int] = ...) -> None: ...
 
 class AppendEntriesReply(_message.Message):
-    __slots__ = ("term", "success")
+    __slots__ = ("term", "success", "conflict_term", "conflict_index", "last_log_index")
     TERM_FIELD_NUMBER: _ClassVar[int]
     SUCCESS_FIELD_NUMBER: _ClassVar[int]
+    CONFLICT_TERM_FIELD_NUMBER: _ClassVar[int]
+    CONFLICT_INDEX_FIELD_NUMBER: _ClassVar[int]
+    LAST_LOG_INDEX_FIELD_NUMBER: _ClassVar[int]
     term: int
     success: bool
-    def __init__(self, term: _Optional[int] = ..., success: bool = ...) -> None: ...
+    conflict_term: int
+    conflict_index: int
+    last_log_index: int
+    def __init__(self, term: _Optional[int] = ..., success: bool = ..., conflict_term: _Optional[int] = ..., conflict_index: _Optional[int] = ..., last_log_index: _Optional[int] = ...) -> None: ...
+
+class CoalescedHeartbeatArgs(_message.Message):
+    __slots__ = ("heartbeats",)
+    HEARTBEATS_FIELD_NUMBER: _ClassVar[int]
+    heartbeats: _containers.RepeatedCompositeFieldContainer[AppendEntriesArgs]
+    def __init__(self, heartbeats: _Optional[_Iterable[_Union[AppendEntriesArgs, _Mapping]]] = ...) -> None: ...
+
+class CoalescedHeartbeatReply(_message.Message):
+    __slots__ = ("replies",)
+    REPLIES_FIELD_NUMBER: _ClassVar[int]
+    replies: _containers.RepeatedCompositeFieldContainer[AppendEntriesReply]
+    def __init__(self, replies: _Optional[_Iterable[_Union[AppendEntriesReply, _Mapping]]] = ...) -> None: ...
+
+class InstallSnapshotChunk(_message.Message):
+    __slots__ = ("term", "leader_id", "last_included_index", "last_included_term", "offset", "data", "done", "group_id")
+    TERM_FIELD_NUMBER: _ClassVar[int]
+    LEADER_ID_FIELD_NUMBER: _ClassVar[int]
+    LAST_INCLUDED_INDEX_FIELD_NUMBER: _ClassVar[int]
+    LAST_INCLUDED_TERM_FIELD_NUMBER: _ClassVar[int]
+    OFFSET_FIELD_NUMBER: _ClassVar[int]
+    DATA_FIELD_NUMBER: _ClassVar[int]
+    DONE_FIELD_NUMBER: _ClassVar[int]
+    GROUP_ID_FIELD_NUMBER: _ClassVar[int]
+    term: int
+    leader_id: int
+    last_included_index: int
+    last_included_term: int
+    offset: int
+    data: bytes
+    done: bool
+    group_id: int
+    def __init__(self, term: _Optional[int] = ..., leader_id: _Optional[int] = ..., last_included_index: _Optional[int] = ..., last_included_term: _Optional[int] = ..., offset: _Optional[int] = ..., data: _Optional[bytes] = ..., done: bool = ..., group_id: _Optional[int] = ...) -> None: ...
+
+class InstallSnapshotReply(_message.Message):
+    __slots__ = ("term", "bytes_stored", "done")
+    TERM_FIELD_NUMBER: _ClassVar[int]
+    BYTES_STORED_FIELD_NUMBER: _ClassVar[int]
+    DONE_FIELD_NUMBER: _ClassVar[int]
+    term: int
+    bytes_stored: int
+    done: bool
+    def __init__(self, term: _Optional[int] = ..., bytes_stored: _Optional[int] = ..., done: bool = ...) -> None: ...
 
 class ClientCommandRequest(_message.Message):
-    __slots__ = ("command", "command_id")
+    __slots__ = ("command", "command_id", "consistency", "max_lag_entries", "max_staleness_ms")
     COMMAND_FIELD_NUMBER: _ClassVar[int]
     COMMAND_ID_FIELD_NUMBER: _ClassVar[int]
+    CONSISTENCY_FIELD_NUMBER: _ClassVar[int]
+    MAX_LAG_ENTRIES_FIELD_NUMBER: _ClassVar[int]
+    MAX_STALENESS_MS_FIELD_NUMBER: _ClassVar[int]
     command: bytes
     command_id: str
-    def __init__(self, command: _Optional[bytes] = ..., command_id: _Optional[str] = ...) -> None: ...
+    consistency: ReadConsistency
+    max_lag_entries: int
+    max_staleness_ms: int
+    def __init__(self, command: _Optional[bytes] = ..., command_id: _Optional[str] = ..., consistency: _Optional[_Union[ReadConsistency, str]] = ..., max_lag_entries: _Optional[int] = ..., max_staleness_ms: _Optional[int] = ...) -> None: ...
 
 class ClientCommandReply(_message.Message):
     __slots__ = ("success", "leader_hint", "message", "value")
@@ -76,3 +146,21 @@ class ClientCommandReply(_message.Message):
     message: str
     value: bytes
     def __init__(self, success: bool = ..., leader_hint: _Optional[str] = ..., message: _Optional[str] = ..., value: _Optional[bytes] = ...) -> None: ...
+
+class ClientBatchRequest(_message.Message):
+    __slots__ = ("commands",)
+    COMMANDS_FIELD_NUMBER: _ClassVar[int]
+    commands: _containers.RepeatedCompositeFieldContainer[ClientCommandRequest]
+    def __init__(self, commands: _Optional[_Iterable[_Union[ClientCommandRequest, _Mapping]]] = ...) -> None: ...
+
+class ClientBatchReply(_message.Message):
+    __slots__ = ("success", "leader_hint", "message", "results")
+    SUCCESS_FIELD_NUMBER: _ClassVar[int]
+    LEADER_HINT_FIELD_NUMBER: _ClassVar[int]
+    MESSAGE_FIELD_NUMBER: _ClassVar[int]
+    RESULTS_FIELD_NUMBER: _ClassVar[int]
+    success: bool
+    leader_hint: str
+    message: str
+    results: _containers.RepeatedCompositeFieldContainer[ClientCommandReply]
+    def __init__(self, success: bool = ..., leader_hint: _Optional[str] = ..., message: _Optional[str] = ..., results: _Optional[_Iterable[_Union[ClientCommandReply, _Mapping]]] = ...) -> None: ...
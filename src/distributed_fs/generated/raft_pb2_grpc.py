@@ -45,11 +45,31 @@ class RaftServiceStub(object):
                 request_serializer=raft__pb2.AppendEntriesArgs.SerializeToString,
                 response_deserializer=raft__pb2.AppendEntriesReply.FromString,
                 _registered_method=True)
+        self.AppendEntriesStream = channel.stream_stream(
+                '/raft.RaftService/AppendEntriesStream',
+                request_serializer=raft__pb2.AppendEntriesArgs.SerializeToString,
+                response_deserializer=raft__pb2.AppendEntriesReply.FromString,
+                _registered_method=True)
+        self.InstallSnapshot = channel.stream_stream(
+                '/raft.RaftService/InstallSnapshot',
+                request_serializer=raft__pb2.InstallSnapshotChunk.SerializeToString,
+                response_deserializer=raft__pb2.InstallSnapshotReply.FromString,
+                _registered_method=True)
         self.ExecuteCommand = channel.unary_unary(
                 '/raft.RaftService/ExecuteCommand',
                 request_serializer=raft__pb2.ClientCommandRequest.SerializeToString,
                 response_deserializer=raft__pb2.ClientCommandReply.FromString,
                 _registered_method=True)
+        self.CoalescedHeartbeat = channel.unary_unary(
+                '/raft.RaftService/CoalescedHeartbeat',
+                request_serializer=raft__pb2.CoalescedHeartbeatArgs.SerializeToString,
+                response_deserializer=raft__pb2.CoalescedHeartbeatReply.FromString,
+                _registered_method=True)
+        self.ExecuteBatch = channel.unary_unary(
+                '/raft.RaftService/ExecuteBatch',
+                request_serializer=raft__pb2.ClientBatchRequest.SerializeToString,
+                response_deserializer=raft__pb2.ClientBatchReply.FromString,
+                _registered_method=True)
 
 
 class RaftServiceServicer(object):
@@ -70,6 +90,26 @@ class RaftServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def AppendEntriesStream(self, request_iterator, context):
+        """Long-lived replication stream from the leader to one follower. Each
+        AppendEntriesArgs frame is answered by exactly one AppendEntriesReply, in
+        the order the frames were sent. Peers that don't implement it are served
+        through AppendEntries instead.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def InstallSnapshot(self, request_iterator, context):
+        """Invoked by leader to send a snapshot to a follower whose next log entry
+        has been compacted away. Chunks flow leader -> follower and each one is
+        acknowledged on the reverse stream, which the leader uses for flow control
+        and to resume an interrupted transfer.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def ExecuteCommand(self, request, context):
         """Placeholder for client interaction (we'll refine this later)
         Maybe move to a separate storage.proto later
@@ -78,6 +118,24 @@ class RaftServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def CoalescedHeartbeat(self, request, context):
+        """Heartbeats of every Raft group the caller leads, for one follower, in a single
+        call. Each heartbeat is an AppendEntriesArgs without entries (its group_id says
+        which group) and is answered by the AppendEntriesReply at the same position.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ExecuteBatch(self, request, context):
+        """Executes many client commands with a single round trip. The writes are
+        appended as one contiguous run of log entries and acknowledged after a
+        single commit wait; results come back in request order.
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_RaftServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -91,11 +149,31 @@ def add_RaftServiceServicer_to_server(servicer, server):
                     request_deserializer=raft__pb2.AppendEntriesArgs.FromString,
                     response_serializer=raft__pb2.AppendEntriesReply.SerializeToString,
             ),
+            'AppendEntriesStream': grpc.stream_stream_rpc_method_handler(
+                    servicer.AppendEntriesStream,
+                    request_deserializer=raft__pb2.AppendEntriesArgs.FromString,
+                    response_serializer=raft__pb2.AppendEntriesReply.SerializeToString,
+            ),
+            'InstallSnapshot': grpc.stream_stream_rpc_method_handler(
+                    servicer.InstallSnapshot,
+                    request_deserializer=raft__pb2.InstallSnapshotChunk.FromString,
+                    response_serializer=raft__pb2.InstallSnapshotReply.SerializeToString,
+            ),
             'ExecuteCommand': grpc.unary_unary_rpc_method_handler(
                     servicer.ExecuteCommand,
                     request_deserializer=raft__pb2.ClientCommandRequest.FromString,
                     response_serializer=raft__pb2.ClientCommandReply.SerializeToString,
             ),
+            'CoalescedHeartbeat': grpc.unary_unary_rpc_method_handler(
+                    servicer.CoalescedHeartbeat,
+                    request_deserializer=raft__pb2.CoalescedHeartbeatArgs.FromString,
+                    response_serializer=raft__pb2.CoalescedHeartbeatReply.SerializeToString,
+            ),
+            'ExecuteBatch': grpc.unary_unary_rpc_method_handler(
+                    servicer.ExecuteBatch,
+                    request_deserializer=raft__pb2.ClientBatchRequest.FromString,
+                    response_serializer=raft__pb2.ClientBatchReply.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'raft.RaftService', rpc_method_handlers)
@@ -162,6 +240,60 @@ class RaftService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def AppendEntriesStream(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(
+            request_iterator,
+            target,
+            '/raft.RaftService/AppendEntriesStream',
+            raft__pb2.AppendEntriesArgs.SerializeToString,
+            raft__pb2.AppendEntriesReply.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def InstallSnapshot(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(
+            request_iterator,
+            target,
+            '/raft.RaftService/InstallSnapshot',
+            raft__pb2.InstallSnapshotChunk.SerializeToString,
+            raft__pb2.InstallSnapshotReply.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def ExecuteCommand(request,
             target,
@@ -188,3 +320,57 @@ class RaftService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def CoalescedHeartbeat(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/raft.RaftService/CoalescedHeartbeat',
+            raft__pb2.CoalescedHeartbeatArgs.SerializeToString,
+            raft__pb2.CoalescedHeartbeatReply.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ExecuteBatch(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/raft.RaftService/ExecuteBatch',
+            raft__pb2.ClientBatchRequest.SerializeToString,
+            raft__pb2.ClientBatchReply.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
@@ -0,0 +1,15 @@
+# src/distributed_fs/raft/fsutil.py
+import os
+
+def fsync_dir(path: str):
+    """fsyncs the directory `path` so file creations/deletions/renames in it are durable."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return # Directories can't be opened on every platform (e.g. Windows)
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass # Not supported on every platform/filesystem
+    finally:
+        os.close(fd)
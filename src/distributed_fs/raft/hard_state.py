@@ -0,0 +1,86 @@
+# src/distributed_fs/raft/hard_state.py
+import logging
+import os
+import struct
+import zlib
+from typing import Optional, Tuple
+
+from distributed_fs.raft.fsutil import fsync_dir
+
+# --- Constants ---
+HARD_STATE_MAGIC = b'RHST'
+HARD_STATE_VERSION = 1
+# magic, version, sequence number, current_term, voted_for (-1 = none)
+RECORD = struct.Struct("!4sHQqq")
+CHECKSUM = struct.Struct("!I") # CRC32 of RECORD
+SLOT_BYTES = 512 # One slot per disk sector, so a torn write can only damage the slot being written
+NO_VOTE = -1
+
+logger = logging.getLogger(__name__)
+
+# fdatasync skips the inode metadata flush; the file never changes size, so nothing is lost
+_datasync = getattr(os, 'fdatasync', os.fsync)
+
+class HardStateFile:
+    """
+    current_term and voted_for in a preallocated two-slot file.
+
+    Each save() overwrites the older of the two fixed-size slots with a
+    checksummed record carrying the next sequence number, using a single
+    pwrite() + fdatasync(). If it is torn by a crash, its checksum fails and
+    load() falls back to the other slot, which still holds the previous state.
+    The file is never renamed or resized after it has been created.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._sequence: int = 0 # Sequence number of the newest valid slot
+        created = not os.path.exists(path)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        if created or os.fstat(self._fd).st_size < 2 * SLOT_BYTES:
+            os.ftruncate(self._fd, 2 * SLOT_BYTES) # Zeroed slots fail their checksum: "no state yet"
+            os.fsync(self._fd)
+            fsync_dir(os.path.dirname(path) or '.') # Make the file's creation durable
+
+    def load(self) -> Optional[Tuple[int, Optional[int]]]:
+        """Returns (current_term, voted_for) from the newest valid slot, or None if neither is valid."""
+        newest = None
+        for slot in range(2):
+            state = self._read_slot(slot)
+            if state is not None and (newest is None or state[0] > newest[0]):
+                newest = state
+        if newest is None:
+            return None
+        self._sequence, current_term, voted_for = newest
+        return current_term, voted_for
+
+    def blank(self) -> bool:
+        """True if neither slot was ever written (load() returning None then means a fresh node)."""
+        return not any(os.pread(self._fd, 2 * SLOT_BYTES, 0))
+
+    def save(self, current_term: int, voted_for: Optional[int]):
+        """Durably replaces the state (one pwrite + fdatasync into the older slot)."""
+        sequence = self._sequence + 1
+        record = RECORD.pack(HARD_STATE_MAGIC, HARD_STATE_VERSION, sequence, current_term,
+                             NO_VOTE if voted_for is None else voted_for)
+        data = record + CHECKSUM.pack(zlib.crc32(record))
+        os.pwrite(self._fd, data, (sequence % 2) * SLOT_BYTES)
+        _datasync(self._fd)
+        self._sequence = sequence
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _read_slot(self, slot: int) -> Optional[Tuple[int, int, Optional[int]]]:
+        data = os.pread(self._fd, RECORD.size + CHECKSUM.size, slot * SLOT_BYTES)
+        if len(data) < RECORD.size + CHECKSUM.size:
+            return None
+        (checksum,) = CHECKSUM.unpack_from(data, RECORD.size)
+        if zlib.crc32(data[:RECORD.size]) != checksum:
+            return None # Never written, or torn mid-write
+        magic, version, sequence, current_term, voted_for = RECORD.unpack_from(data)
+        if magic != HARD_STATE_MAGIC or version != HARD_STATE_VERSION:
+            logger.warning(f"Ignoring hard state slot {slot} of {self.path} with unknown format ({magic!r}, version {version})")
+            return None
+        return sequence, current_term, None if voted_for == NO_VOTE else voted_for
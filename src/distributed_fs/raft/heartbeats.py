@@ -0,0 +1,143 @@
+# src/distributed_fs/raft/heartbeats.py
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+import grpc
+
+# Import generated gRPC types
+from distributed_fs.generated import raft_pb2
+
+if TYPE_CHECKING:
+    from distributed_fs.raft.replicator import PeerReplicator
+
+# --- Constants ---
+MAX_TICK_S = 0.1 # Re-check at least this often, so newly registered replicators are picked up
+# Fewer replicators for a peer heartbeat on their own: one group's heartbeats ride its
+# AppendEntries stream, which costs less than a unary CoalescedHeartbeat call
+MIN_COALESCED_GROUPS = 2
+
+logger = logging.getLogger(__name__)
+
+class HeartbeatCoalescer:
+    """
+    Sends the periodic heartbeats of all Raft groups a process leads as one
+    CoalescedHeartbeat RPC per peer per heartbeat interval.
+
+    Replicators register for the peer they replicate to. Every interval (the
+    shortest heartbeat interval of that peer's replicators) the coalescer asks
+    each of them for a heartbeat (PeerReplicator.coalesced_heartbeat; busy
+    replicators have nothing to add), sends them together and hands each
+    group's reply, or None if the call failed, back to its replicator. Idle
+    RPC count and CPU therefore grow with the number of peers, not with
+    groups x peers. Peers with fewer than MIN_COALESCED_GROUPS replicators, or
+    that don't implement CoalescedHeartbeat, are left to the replicators' own
+    heartbeats.
+    """
+    def __init__(self, node_id: int):
+        self.node_id = node_id
+        self._replicators: Dict[int, Set["PeerReplicator"]] = {} # {peer_id: replicators sending to it}
+        self._last_sent: Dict[int, float] = {} # {peer_id: loop time of the last coalesced heartbeat}
+        self._unsupported: Set[int] = set() # Peers that don't implement CoalescedHeartbeat
+        self._inflight: Dict[int, asyncio.Task] = {} # {peer_id: its coalesced heartbeat in flight}
+        self._task: Optional[asyncio.Task] = None
+
+    def covers(self, peer_id: int) -> bool:
+        """True if the coalescer sends the periodic heartbeats to peer_id."""
+        return peer_id not in self._unsupported and len(self._replicators.get(peer_id, ())) >= MIN_COALESCED_GROUPS
+
+    def register(self, replicator: "PeerReplicator"):
+        self._replicators.setdefault(replicator.peer_id, set()).add(replicator)
+
+    def unregister(self, replicator: "PeerReplicator"):
+        replicators = self._replicators.get(replicator.peer_id, set())
+        if replicator not in replicators:
+            return
+        replicators.discard(replicator)
+        if len(replicators) == MIN_COALESCED_GROUPS - 1:
+            for remaining in replicators:
+                remaining.notify() # Back to heartbeating on its own
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+        for task in self._inflight.values():
+            task.cancel()
+        self._inflight.clear()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                now = loop.time()
+                wait = MAX_TICK_S
+                for peer_id, replicators in self._replicators.items():
+                    if not self.covers(peer_id) or peer_id in self._inflight:
+                        continue # A peer slow to answer isn't sent more on top
+                    interval = min(replicator.heartbeat_interval for replicator in replicators)
+                    due = self._last_sent.get(peer_id, 0.0) + interval
+                    if now >= due:
+                        self._last_sent[peer_id] = now
+                        self._send(peer_id, list(replicators))
+                        due = now + interval
+                    wait = min(wait, due - now)
+                await asyncio.sleep(wait)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Node {self.node_id}: Heartbeat coalescer failed: {e}", exc_info=True)
+
+    def _send(self, peer_id: int, replicators: List["PeerReplicator"]):
+        heartbeats = []
+        handlers = []
+        for replicator in replicators:
+            try:
+                heartbeat = replicator.coalesced_heartbeat()
+            except Exception as e:
+                # One broken group must not stop the heartbeats of the others
+                logger.error(f"Node {replicator.node.name}: Building heartbeat for {peer_id} failed: {e}", exc_info=True)
+                continue
+            if heartbeat is not None:
+                heartbeats.append((replicator, heartbeat[0]))
+                handlers.append(heartbeat[1])
+        if not heartbeats:
+            return
+        self._inflight[peer_id] = asyncio.create_task(self._heartbeat(peer_id, heartbeats, handlers))
+        self._inflight[peer_id].add_done_callback(lambda _task: self._inflight.pop(peer_id, None))
+
+    async def _heartbeat(self, peer_id: int, heartbeats: List[Tuple["PeerReplicator", raft_pb2.AppendEntriesArgs]],
+                         handlers: List[Callable[[Optional[raft_pb2.AppendEntriesReply]], Awaitable[None]]]):
+        """Sends one CoalescedHeartbeat to peer_id and fans the replies out to the groups."""
+        # Imported here to avoid a circular import at module load
+        from distributed_fs.raft.node import ELECTION_TIMEOUT_MIN_MS
+        first_replicator = heartbeats[0][0]
+        node = first_replicator.node # All groups share the channel to the peer
+        replies: List[Optional[raft_pb2.AppendEntriesReply]] = [None] * len(heartbeats)
+        loop = asyncio.get_running_loop()
+        sent_at = loop.time()
+        try:
+            stub = await node._get_peer_stub(peer_id, first_replicator.peer_addr)
+            if stub is not None:
+                request = raft_pb2.CoalescedHeartbeatArgs(heartbeats=[args for _, args in heartbeats])
+                # Not an RTT-based deadline: a late heartbeat still holds off the follower's
+                # elections, but the server drops it once the deadline has passed
+                reply = await stub.CoalescedHeartbeat(request, timeout=ELECTION_TIMEOUT_MIN_MS / 2 / 1000.0)
+                rtt = loop.time() - sent_at
+                if len(reply.replies) == len(heartbeats):
+                    replies = list(reply.replies)
+                    for replicator, args in heartbeats:
+                        replicator.link.on_reply(args.ByteSize(), rtt)
+                else:
+                    logger.warning(f"Node {self.node_id}: Peer {peer_id} answered {len(reply.replies)} of {len(heartbeats)} coalesced heartbeats")
+        except grpc.aio.AioRpcError as e:
+            if e.code() == grpc.StatusCode.UNIMPLEMENTED:
+                logger.info(f"Node {self.node_id}: Peer {peer_id} doesn't support CoalescedHeartbeat, heartbeating each group separately")
+                self._unsupported.add(peer_id)
+                for replicator, _ in heartbeats:
+                    replicator.notify()
+            else:
+                logger.warning(f"Node {self.node_id}: Coalesced heartbeat to {peer_id} ({len(heartbeats)} groups) failed: {e.code()} - {e.details()}")
+        await asyncio.gather(*(handler(reply) for handler, reply in zip(handlers, replies)))
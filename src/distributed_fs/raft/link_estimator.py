@@ -0,0 +1,71 @@
+# src/distributed_fs/raft/link_estimator.py
+from typing import Optional
+
+# --- Constants ---
+RTT_GAIN = 1 / 8 # Weight of a new sample in the smoothed RTT (RFC 6298 alpha)
+RTT_VAR_GAIN = 1 / 4 # Weight of a new sample in the RTT mean deviation (RFC 6298 beta)
+RTT_VAR_MULTIPLE = 4 # A deadline allows this many mean deviations above the smoothed RTT (RFC 6298 K)
+BANDWIDTH_GAIN = 1 / 4 # Weight of a new sample in the smoothed throughput
+BANDWIDTH_MIN_SAMPLE_BYTES = 16 * 1024 # Smaller requests are all latency and say nothing about throughput
+MIN_TRANSFER_S = 0.0001 # Floor for a request's transfer time, so a sample can't divide by ~0
+TIMEOUT_BACKOFF_MAX = 8 # Deadlines double after each timeout, up to this factor
+BATCH_MIN_BYTES = 64 * 1024
+BATCH_MAX_BYTES = 2 * 1024 * 1024 # Well below gRPC's default 4 MiB message limit
+BATCH_DEFAULT_BYTES = 256 * 1024 # Until the link has been measured
+
+class LinkEstimator:
+    """
+    Round-trip time and throughput of the link to one peer, as seen by the
+    leader's AppendEntries requests (so follower fsyncs are included).
+
+    The RTT is tracked like TCP does: a smoothed RTT and its mean deviation,
+    updated from every reply. Throughput is an EWMA of bytes over transfer time
+    (RTT minus the lowest RTT seen) for requests big enough to measure it. From
+    those the leader derives per-request deadlines, a batch size of roughly one
+    bandwidth-delay product, and optionally the heartbeat interval. Timeouts
+    back the deadline off exponentially until the next reply.
+    """
+    def __init__(self):
+        self.srtt: Optional[float] = None # Smoothed RTT (seconds), None until the first reply
+        self.rttvar: float = 0.0 # Mean deviation of the RTT (seconds)
+        self.min_rtt: Optional[float] = None # Lowest RTT seen, i.e. the latency without transfer time
+        self.bandwidth: Optional[float] = None # Smoothed throughput (bytes/s)
+        self._backoff: float = 1.0
+
+    def on_reply(self, request_bytes: int, rtt: float):
+        """Records the round trip of a request of `request_bytes` that was answered (not retried)."""
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar += RTT_VAR_GAIN * (abs(self.srtt - rtt) - self.rttvar)
+            self.srtt += RTT_GAIN * (rtt - self.srtt)
+        self.min_rtt = rtt if self.min_rtt is None else min(self.min_rtt, rtt)
+        if request_bytes >= BANDWIDTH_MIN_SAMPLE_BYTES:
+            sample = request_bytes / max(rtt - self.min_rtt, MIN_TRANSFER_S)
+            self.bandwidth = sample if self.bandwidth is None else self.bandwidth + BANDWIDTH_GAIN * (sample - self.bandwidth)
+        self._backoff = 1.0
+
+    def on_timeout(self):
+        self._backoff = min(self._backoff * 2, TIMEOUT_BACKOFF_MAX)
+
+    def deadline(self, request_bytes: int, floor: float, ceiling: float) -> Optional[float]:
+        """How long to wait for the reply to a request of `request_bytes`, or None before the first sample."""
+        if self.srtt is None:
+            return None
+        timeout = self.srtt + RTT_VAR_MULTIPLE * self.rttvar
+        if self.bandwidth is not None:
+            timeout += request_bytes / self.bandwidth
+        return min(max(timeout * self._backoff, floor), ceiling)
+
+    def batch_bytes(self) -> int:
+        """Payload budget for one AppendEntries: about what the link carries in one round trip."""
+        if self.bandwidth is None or self.min_rtt is None:
+            return BATCH_DEFAULT_BYTES
+        return int(min(max(self.bandwidth * self.min_rtt, BATCH_MIN_BYTES), BATCH_MAX_BYTES))
+
+    def heartbeat_interval(self, default: float, floor: float, ceiling: float) -> float:
+        """Heartbeat interval of about one smoothed RTT, so heartbeats don't pile up in flight on slow links."""
+        if self.srtt is None:
+            return default
+        return min(max(self.srtt, floor), ceiling)
@@ -0,0 +1,184 @@
+# src/distributed_fs/raft/log_store.py
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Callable, List, Optional
+
+# Import generated gRPC types
+from distributed_fs.generated import raft_pb2
+
+# --- Constants ---
+TERM_TAG = 0x08 # LogEntry field 1 (term) as a varint; serialized first, omitted when 0
+COMMAND_TAG = 0x12 # LogEntry field 2 (command), length-delimited
+
+def encode_entry(term: int, command: bytes) -> bytes:
+    """Serializes a log entry in the form LogStore, the WAL and AppendEntries all carry."""
+    return raft_pb2.LogEntry(term=term, command=command).SerializeToString()
+
+def peek_entry_term(buffer, start: int, end: int) -> int:
+    """Reads the term of the serialized LogEntry buffer[start:end] without decoding the command."""
+    if start < end and buffer[start] == TERM_TAG:
+        term = 0
+        shift = 0
+        position = start + 1
+        while True:
+            byte = buffer[position]
+            term |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return term
+            position += 1
+            shift += 7
+    if start == end or buffer[start] == COMMAND_TAG:
+        return 0 # Term 0 isn't serialized
+    # Fields in an unusual order (not written by us): let protobuf sort it out
+    return raft_pb2.LogEntry.FromString(buffer[start:end]).term
+
+class LogStore:
+    """
+    In-memory Raft log addressed by 1-based Raft index.
+
+    After log compaction the log no longer starts at index 1: entries up to and
+    including `snapshot_index` live only in the snapshot, and the first retained
+    entry is `snapshot_index + 1`. term_at(snapshot_index) still answers with
+    the snapshot's last included term so AppendEntries consistency checks work
+    right at the boundary.
+
+    Entries are kept as serialized LogEntry bytes (exactly what the WAL writes and
+    AppendEntries carries) with their terms in a parallel array('q'), so term
+    lookups never touch a protobuf object and the leader ships records to
+    followers without re-encoding them. entry_at() decodes one on demand.
+
+    Entries loaded at startup stay on disk: attach() registers them by term only
+    and their records are read back through `read_record` (an mmap of the log
+    segments) when they are applied or replicated. They always form a prefix of
+    the retained log, since everything appended later is held in memory.
+    """
+    def __init__(self, snapshot_index: int = 0, snapshot_term: int = 0):
+        self.snapshot_index = snapshot_index # Last index covered by the snapshot (0 = no snapshot)
+        self.snapshot_term = snapshot_term # Term of that entry
+        self._terms = array('q') # Term of each retained entry
+        self._on_disk: int = 0 # Leading retained entries whose records are only on disk
+        self._records: List[bytes] = [] # Serialized LogEntry of each entry after those
+        self._read_record: Optional[Callable[[int], bytes]] = None # Reads an on-disk record by index
+
+    def __len__(self) -> int:
+        """Number of entries retained (not the last index)."""
+        return len(self._terms)
+
+    @property
+    def first_index(self) -> int:
+        return self.snapshot_index + 1
+
+    @property
+    def last_index(self) -> int:
+        return self.snapshot_index + len(self._terms)
+
+    @property
+    def last_term(self) -> int:
+        if self._terms:
+            return self._terms[-1]
+        return self.snapshot_term
+
+    def term_at(self, index: int) -> int:
+        """Term of the entry at `index`. Raises IndexError if it was compacted away or doesn't exist yet."""
+        if index == self.snapshot_index:
+            return self.snapshot_term
+        if index < self.snapshot_index or index > self.last_index:
+            raise IndexError(f"log index {index} outside retained range [{self.snapshot_index}, {self.last_index}]")
+        return self._terms[index - self.snapshot_index - 1]
+
+    def entry_at(self, index: int) -> raft_pb2.LogEntry:
+        """Decodes the entry at `index`."""
+        return raft_pb2.LogEntry.FromString(self.record_at(index))
+
+    def record_at(self, index: int) -> bytes:
+        if index <= self.snapshot_index or index > self.last_index:
+            raise IndexError(f"log index {index} outside retained range [{self.first_index}, {self.last_index}]")
+        offset = index - self.snapshot_index - 1
+        if offset < self._on_disk:
+            return self._read_record(index)
+        return self._records[offset - self._on_disk]
+
+    def records_from(self, start: int, max_count: int) -> List[bytes]:
+        """Up to `max_count` serialized entries starting at index `start` (which must not be compacted)."""
+        if start <= self.snapshot_index:
+            raise IndexError(f"log index {start} already compacted into snapshot (snapshot_index={self.snapshot_index})")
+        offset = start - self.snapshot_index - 1
+        end = min(offset + max_count, len(self._terms))
+        if offset >= self._on_disk:
+            return self._records[offset - self._on_disk:end - self._on_disk]
+        disk_end = min(end, self._on_disk)
+        records = [self._read_record(self.snapshot_index + 1 + i) for i in range(offset, disk_end)]
+        records.extend(self._records[:end - self._on_disk] if end > self._on_disk else ())
+        return records
+
+    def terms_from(self, start: int, max_count: int) -> array:
+        """Terms of the entries records_from(start, max_count) returns."""
+        if start <= self.snapshot_index:
+            raise IndexError(f"log index {start} already compacted into snapshot (snapshot_index={self.snapshot_index})")
+        offset = start - self.snapshot_index - 1
+        return self._terms[offset:offset + max_count]
+
+    def first_index_of_term(self, index: int) -> int:
+        """
+        First retained index whose term equals term_at(index). Terms never
+        decrease along a log, so this is a binary search.
+        """
+        term = self.term_at(index)
+        offset = bisect_left(self._terms, term, 0, max(0, index - self.snapshot_index))
+        return min(self.first_index + offset, index)
+
+    def last_index_of_term(self, term: int) -> int:
+        """Last retained index holding `term`, or 0 if the retained log has no such entry."""
+        offset = bisect_right(self._terms, term) # Entries before offset have a term <= `term`
+        if offset > 0 and self._terms[offset - 1] == term:
+            return self.snapshot_index + offset
+        return 0
+
+    def append(self, term: int, record: bytes) -> int:
+        """Appends a serialized entry of `term` and returns its index."""
+        self._terms.append(term)
+        self._records.append(record)
+        return self.last_index
+
+    def attach(self, terms: array, read_record: Callable[[int], bytes]):
+        """
+        Appends entries that are already on disk, given only their terms (on an empty
+        log). read_record(index) fetches the record of any of them when it's needed.
+        """
+        if self._terms:
+            raise ValueError("can only attach on-disk entries to an empty log")
+        self._terms.extend(terms)
+        self._on_disk = len(terms)
+        self._read_record = read_record
+
+    def truncate_after(self, index: int):
+        """Deletes every entry after `index`."""
+        if index < self.snapshot_index:
+            raise IndexError(f"cannot truncate into the snapshot (index={index}, snapshot_index={self.snapshot_index})")
+        keep = index - self.snapshot_index
+        del self._terms[keep:]
+        if keep < self._on_disk:
+            self._on_disk = keep
+            self._records = []
+        else:
+            del self._records[keep - self._on_disk:]
+
+    def compact_through(self, index: int, term: int):
+        """Drops every entry up to and including `index`, which is now covered by a snapshot."""
+        if index <= self.snapshot_index:
+            return
+        drop = index - self.snapshot_index
+        del self._terms[:drop]
+        dropped_on_disk = min(drop, self._on_disk)
+        self._on_disk -= dropped_on_disk
+        del self._records[:drop - dropped_on_disk]
+        self.snapshot_index = index
+        self.snapshot_term = term
+
+    def reset(self, snapshot_index: int, snapshot_term: int):
+        """Discards every entry; the log now starts right after the given snapshot."""
+        self._terms = array('q')
+        self._on_disk = 0
+        self._records = []
+        self.snapshot_index = snapshot_index
+        self.snapshot_term = snapshot_term
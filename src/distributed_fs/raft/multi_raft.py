@@ -0,0 +1,283 @@
+# src/distributed_fs/raft/multi_raft.py
+import asyncio
+import logging
+import os
+from typing import Callable, Dict, List, Optional
+
+import grpc
+
+from distributed_fs.commands import decode_command
+from distributed_fs.generated import raft_pb2, raft_pb2_grpc
+from distributed_fs.raft.heartbeats import HeartbeatCoalescer
+from distributed_fs.raft.node import CLIENT_COMMIT_TIMEOUT_S, NodeState, RaftNode, close_peer_stubs
+from distributed_fs.raft.state_machine import StateMachine
+from distributed_fs.sharding import UNSHARDED_GROUP_ID, group_for_key
+
+# --- Constants ---
+# Added to the election timeouts of every replica but a group's preferred leader, so the preferred
+# one times out (and wins) first while it is up. Longer than the election timeout's random spread.
+PREFERRED_LEADER_HEAD_START_MS = 200
+FORWARD_TIMEOUT_S = CLIENT_COMMIT_TIMEOUT_S + 5.0 # A forwarded batch waits for the leader's commit wait, plus slack
+# Worker w of a multi-process node also listens on the node's port + WORKER_PORT_STRIDE * (w + 1),
+# where peers reach the groups it serves. Leaves room for that many nodes on consecutive ports.
+WORKER_PORT_STRIDE = 1000
+
+logger = logging.getLogger(__name__)
+
+def worker_for_group(group_id: int, num_workers: int) -> int:
+    """Worker process (0..num_workers-1) of a multi-process node that serves group `group_id`."""
+    return (group_id - 1) % num_workers
+
+def worker_port(port: int, worker: int, port_stride: int = WORKER_PORT_STRIDE) -> int:
+    """Own port of `worker` of the node whose shared port is `port`."""
+    return port + port_stride * (worker + 1)
+
+def worker_address(address: str, worker: int, port_stride: int = WORKER_PORT_STRIDE) -> str:
+    """Own address ("host:port") of `worker` of the node whose shared address is `address`."""
+    host, port = address.rsplit(':', 1)
+    return f"{host}:{worker_port(int(port), worker, port_stride)}"
+
+def prepare_data_dir(data_dir: str, num_groups: int):
+    """
+    Creates data_dir and, when sharded, the directory of every group in it.
+    Raises ValueError if data_dir was written with a different number of groups, since
+    keys would then be looked up in groups that don't hold them.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    sharded_before = os.path.exists(os.path.join(data_dir, "group_1"))
+    unsharded_before = any(os.path.exists(os.path.join(data_dir, name)) for name in ("log", "raft.log", "hard_state.bin"))
+    if num_groups == 1:
+        if sharded_before:
+            raise ValueError(f"{data_dir} holds a sharded keyspace; start with the number of groups it was created with")
+        return
+    if unsharded_before or os.path.exists(os.path.join(data_dir, f"group_{num_groups + 1}")) or \
+            (sharded_before and not os.path.exists(os.path.join(data_dir, f"group_{num_groups}"))):
+        raise ValueError(f"{data_dir} was created with a different number of Raft groups than {num_groups}")
+    for group_id in range(1, num_groups + 1):
+        os.makedirs(os.path.join(data_dir, f"group_{group_id}"), exist_ok=True)
+
+def open_groups(node_id: int, peers_addresses: Dict[int, str], data_dir: str, num_groups: int,
+                make_state_machine: Callable[[str], StateMachine], coalesce_heartbeats: bool = True,
+                num_workers: int = 1, worker: int = 0, worker_port_stride: int = WORKER_PORT_STRIDE) -> 'MultiRaft':
+    """
+    Creates this node's replica of each of `num_groups` Raft groups, with
+    `make_state_machine(group_dir)` as its state machine. One group keeps the unsharded
+    layout (group 0, directly in data_dir); otherwise group g lives in data_dir/group_<g>,
+    and unless `coalesce_heartbeats` is False the groups' heartbeats to each peer are
+    sent together.
+    With `num_workers` > 1 the node is split over that many processes and this one,
+    `worker`, only opens the groups worker_for_group assigns it. Their Raft traffic goes
+    to the same worker of each peer (at worker_address), and client commands for the
+    other groups are passed to the worker of this node that serves them.
+    Raises ValueError if data_dir was written with a different number of groups, or if
+    there are fewer groups than workers.
+    """
+    if num_workers > 1 and num_groups < num_workers:
+        raise ValueError(f"{num_workers} worker processes need at least as many Raft groups, not {num_groups}")
+    prepare_data_dir(data_dir, num_groups)
+    if num_groups == 1:
+        return MultiRaft({UNSHARDED_GROUP_ID: RaftNode(node_id, peers_addresses, data_dir, make_state_machine(data_dir))})
+
+    remote_groups: Dict[int, str] = {} # {group_id: address of the worker of this node serving it}
+    if num_workers > 1:
+        own_address = peers_addresses[node_id]
+        remote_groups = {group_id: worker_address(own_address, worker_for_group(group_id, num_workers), worker_port_stride)
+                         for group_id in range(1, num_groups + 1) if worker_for_group(group_id, num_workers) != worker}
+        # Every peer serves our groups from its worker with the same index
+        peers_addresses = {peer_id: worker_address(address, worker, worker_port_stride)
+                           for peer_id, address in peers_addresses.items()}
+
+    peer_stubs: Dict[int, raft_pb2_grpc.RaftServiceStub] = {} # One channel per peer for all groups
+    coalescer = HeartbeatCoalescer(node_id) if coalesce_heartbeats else None
+    members = sorted(peers_addresses)
+    groups: Dict[int, RaftNode] = {}
+    for group_id in range(1, num_groups + 1):
+        if group_id in remote_groups:
+            continue
+        group_dir = os.path.join(data_dir, f"group_{group_id}")
+        node = RaftNode(node_id, peers_addresses, group_dir, make_state_machine(group_dir),
+                        group_id=group_id, peer_stubs=peer_stubs)
+        if members[(group_id - 1) % len(members)] != node_id:
+            node.election_timeout_offset_ms = PREFERRED_LEADER_HEAD_START_MS
+        node.heartbeat_coalescer = coalescer
+        groups[group_id] = node
+    return MultiRaft(groups, peer_stubs, coalescer, num_shards=num_groups, remote_groups=remote_groups)
+
+class MultiRaft:
+    """
+    The Raft groups this process is a member of, and routing between them.
+
+    When sharded, the keyspace is split into hash ranges (group_for_key), each
+    replicated by its own Raft group with its own log, snapshot, hard state and
+    state machine. Every node is a member of every group, and group g prefers
+    node number (g - 1) mod n as its leader, so leaders and their write load are
+    spread over all nodes. Raft RPCs carry the group_id they are for; client
+    commands are routed by key. A batch whose keys span several groups is split,
+    and the parts of groups led elsewhere are forwarded to their leaders, so any
+    node accepts any batch. Periodic heartbeats between two nodes travel as one
+    CoalescedHeartbeat per interval, whatever the number of groups.
+
+    A node split over several worker processes has one MultiRaft per worker,
+    holding that worker's groups. Commands for the others (`remote_groups`) are
+    passed on to the worker serving them, since the kernel hands client
+    connections to whichever worker it picks.
+    """
+    def __init__(self, groups: Dict[int, RaftNode],
+                 peer_stubs: Optional[Dict[int, raft_pb2_grpc.RaftServiceStub]] = None,
+                 heartbeat_coalescer: Optional[HeartbeatCoalescer] = None,
+                 num_shards: Optional[int] = None, remote_groups: Optional[Dict[int, str]] = None):
+        self.groups = groups # {group_id: RaftNode}
+        self.node_id = next(iter(groups.values())).node_id
+        self._peer_stubs = peer_stubs # Shared by all groups; closed by stop()
+        self._heartbeat_coalescer = heartbeat_coalescer # Shared by all groups; run by run()
+        # Number of hash ranges the keyspace is split into (0: not sharded, everything goes to group 0)
+        if num_shards is None:
+            num_shards = 0 if UNSHARDED_GROUP_ID in groups else len(groups)
+        self.num_shards = num_shards
+        self.remote_groups = remote_groups or {} # {group_id: address of the sibling worker serving it}
+        self._worker_channels: Dict[str, grpc.aio.Channel] = {} # {address: channel} to sibling workers
+        self._worker_stubs: Dict[str, raft_pb2_grpc.RaftServiceStub] = {} # {address: stub} of sibling workers
+
+    def group(self, group_id: int) -> Optional[RaftNode]:
+        return self.groups.get(group_id)
+
+    def group_id_for(self, command: bytes) -> Optional[int]:
+        """Group owning the key `command` operates on, or None if the command can't be decoded."""
+        if self.num_shards == 0:
+            return UNSHARDED_GROUP_ID
+        try:
+            _operation, key, _value = decode_command(command)
+        except ValueError:
+            return None
+        return group_for_key(key, self.num_shards)
+
+    async def handle_coalesced_heartbeat(self, request: raft_pb2.CoalescedHeartbeatArgs) -> raft_pb2.CoalescedHeartbeatReply:
+        """Hands each heartbeat to its group, as if it had arrived as its own AppendEntries."""
+        async def handle(args: raft_pb2.AppendEntriesArgs) -> raft_pb2.AppendEntriesReply:
+            node = self.groups.get(args.group_id)
+            if node is None:
+                # Term 0 is below any leader's term, so the leader ignores the reply
+                logger.warning(f"Node {self.node_id}: Heartbeat from {args.leader_id} for unknown Raft group {args.group_id}")
+                return raft_pb2.AppendEntriesReply(term=0, success=False)
+            return await node.handle_append_entries(args)
+
+        replies = await asyncio.gather(*(handle(args) for args in request.heartbeats))
+        return raft_pb2.CoalescedHeartbeatReply(replies=replies)
+
+    async def handle_client_command(self, request: raft_pb2.ClientCommandRequest) -> raft_pb2.ClientCommandReply:
+        group_id = self.group_id_for(request.command)
+        if group_id is None:
+            return raft_pb2.ClientCommandReply(success=False, message="Invalid or unsupported command")
+        if group_id in self.remote_groups:
+            return await self._forward_command(group_id, request)
+        # A group led elsewhere redirects the client to that group's leader
+        return await self.groups[group_id].handle_client_command(request)
+
+    async def handle_client_batch(self, request: raft_pb2.ClientBatchRequest) -> raft_pb2.ClientBatchReply:
+        """
+        Executes a batch whose commands may belong to different groups: each group's
+        commands run as one batch of their own (in their original order), all groups
+        at once. Commands of a group that couldn't execute them fail individually,
+        with that group's leader as their leader_hint.
+        """
+        results: List[Optional[raft_pb2.ClientCommandReply]] = [None] * len(request.commands)
+        positions: Dict[int, List[int]] = {} # {group_id: positions of its commands in the batch}
+        for position, command in enumerate(request.commands):
+            group_id = self.group_id_for(command.command)
+            if group_id is None:
+                results[position] = raft_pb2.ClientCommandReply(success=False, message="Invalid or unsupported command")
+            else:
+                positions.setdefault(group_id, []).append(position)
+        if len(positions) == 1 and len(next(iter(positions.values()))) == len(results):
+            # The whole batch belongs to one group: it redirects the client itself if it is led elsewhere
+            group_id = next(iter(positions))
+            if group_id in self.remote_groups:
+                return await self._forward_batch(group_id, request)
+            return await self.groups[group_id].handle_client_batch(request)
+
+        group_ids = list(positions)
+        replies = await asyncio.gather(*(
+            self._execute_group_batch(group_id, raft_pb2.ClientBatchRequest(
+                commands=[request.commands[position] for position in positions[group_id]]))
+            for group_id in group_ids))
+        for group_id, reply in zip(group_ids, replies):
+            for i, position in enumerate(positions[group_id]):
+                if reply.success:
+                    results[position] = reply.results[i]
+                else:
+                    results[position] = raft_pb2.ClientCommandReply(success=False, leader_hint=reply.leader_hint, message=reply.message)
+        return raft_pb2.ClientBatchReply(success=True, message=f"Executed {len(results)} commands in {len(group_ids)} groups", results=results)
+
+    async def _execute_group_batch(self, group_id: int, request: raft_pb2.ClientBatchRequest) -> raft_pb2.ClientBatchReply:
+        """Runs a batch of one group's commands here if we lead the group (or nobody is known to), else on its leader."""
+        if group_id in self.remote_groups:
+            return await self._forward_batch(group_id, request, follow_redirect=True)
+        node = self.groups[group_id]
+        leader_id = node.leader_id
+        if node.state == NodeState.LEADER or leader_id is None or leader_id == node.node_id:
+            return await node.handle_client_batch(request)
+        leader_addr = node.peers_addresses.get(leader_id, "")
+        stub = await node._get_peer_stub(leader_id, leader_addr)
+        if stub is None:
+            return raft_pb2.ClientBatchReply(success=False, leader_hint=leader_addr, message="Not the leader")
+        logger.debug(f"Node {node.name}: Forwarding {len(request.commands)} batched commands to leader {leader_id}")
+        try:
+            # The leader gets a batch of a single group, which it never forwards again
+            return await stub.ExecuteBatch(request, timeout=FORWARD_TIMEOUT_S)
+        except grpc.aio.AioRpcError as e:
+            logger.warning(f"Node {node.name}: Forwarding batch to leader {leader_id} failed: {e.code()} - {e.details()}")
+            return raft_pb2.ClientBatchReply(success=False, leader_hint=leader_addr, message=f"Forwarding to the group leader failed: {e.code()}")
+
+    def _worker_stub(self, address: str) -> raft_pb2_grpc.RaftServiceStub:
+        """Stub of the worker process at `address` (one channel per worker)."""
+        if address not in self._worker_stubs:
+            self._worker_channels[address] = grpc.aio.insecure_channel(address)
+            self._worker_stubs[address] = raft_pb2_grpc.RaftServiceStub(self._worker_channels[address])
+        return self._worker_stubs[address]
+
+    async def _forward_command(self, group_id: int, request: raft_pb2.ClientCommandRequest) -> raft_pb2.ClientCommandReply:
+        """Passes a command of a group served by a sibling worker on to that worker."""
+        address = self.remote_groups[group_id]
+        try:
+            return await self._worker_stub(address).ExecuteCommand(request, timeout=FORWARD_TIMEOUT_S)
+        except grpc.aio.AioRpcError as e:
+            logger.warning(f"Node {self.node_id}: Passing command for group {group_id} to worker at {address} failed: {e.code()} - {e.details()}")
+            return raft_pb2.ClientCommandReply(success=False, leader_hint=address, message=f"Forwarding to the group's worker failed: {e.code()}")
+
+    async def _forward_batch(self, group_id: int, request: raft_pb2.ClientBatchRequest,
+                             follow_redirect: bool = False) -> raft_pb2.ClientBatchReply:
+        """
+        Passes a batch of one group served by a sibling worker on to that worker. It
+        redirects the batch if its replica is a follower; with `follow_redirect` the batch
+        then goes on to the leader's worker, as parts of our own groups would.
+        """
+        address = self.remote_groups[group_id]
+        reply = await self._send_batch(address, group_id, request)
+        if follow_redirect and not reply.success and reply.leader_hint and reply.leader_hint != address:
+            reply = await self._send_batch(reply.leader_hint, group_id, request)
+        return reply
+
+    async def _send_batch(self, address: str, group_id: int, request: raft_pb2.ClientBatchRequest) -> raft_pb2.ClientBatchReply:
+        try:
+            # The worker gets a batch of a single group, which it never passes on again
+            return await self._worker_stub(address).ExecuteBatch(request, timeout=FORWARD_TIMEOUT_S)
+        except grpc.aio.AioRpcError as e:
+            logger.warning(f"Node {self.node_id}: Passing batch for group {group_id} to worker at {address} failed: {e.code()} - {e.details()}")
+            return raft_pb2.ClientBatchReply(success=False, leader_hint=address, message=f"Forwarding to the group's worker failed: {e.code()}")
+
+    async def run(self):
+        """Runs every group's background tasks."""
+        if self._heartbeat_coalescer is not None:
+            self._heartbeat_coalescer.start()
+        await asyncio.gather(*(node.run() for node in self.groups.values()))
+
+    async def stop(self):
+        if self._heartbeat_coalescer is not None:
+            self._heartbeat_coalescer.stop()
+        await asyncio.gather(*(node.stop() for node in self.groups.values()))
+        if self._peer_stubs is not None:
+            await close_peer_stubs(self._peer_stubs, str(self.node_id))
+        for channel in self._worker_channels.values():
+            await channel.close()
+        self._worker_channels.clear()
+        self._worker_stubs.clear()
@@ -7,15 +7,45 @@ import logging
 import random
 import os
 from enum import Enum, auto
-from typing import Dict, List, Optional, Tuple
+from functools import partial
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
 
 # Import generated gRPC types
+from distributed_fs.commands import decode_command
 from distributed_fs.generated import raft_pb2, raft_pb2_grpc
+from distributed_fs.raft.hard_state import HardStateFile
+from distributed_fs.raft.heartbeats import HeartbeatCoalescer
+from distributed_fs.raft.link_estimator import LinkEstimator
+from distributed_fs.raft.log_store import LogStore, encode_entry, peek_entry_term
+from distributed_fs.raft.proposals import ProposalQueue
+from distributed_fs.raft.replicator import PeerReplicator
+from distributed_fs.raft.segments import SegmentedLog
+from distributed_fs.raft.snapshot import (SnapshotMetadata, SnapshotReceiver, read_snapshot,
+                                          read_snapshot_metadata, write_snapshot)
+from distributed_fs.raft.state_machine import MemoryStateMachine, Operation, StateMachine
+from distributed_fs.raft.wal import GroupCommitWAL
 
 # --- Constants ---
 ELECTION_TIMEOUT_MIN_MS = 800
 ELECTION_TIMEOUT_MAX_MS = 950
 HEARTBEAT_INTERVAL_MS = 50
+APPEND_ENTRIES_TIMEOUT_MIN_MS = 50 # Floor for RTT-based AppendEntries deadlines (absorbs scheduling hiccups)
+# Snapshot the state machine once this many applied entries sit in the log. Every snapshot writes out
+# the whole state, with SqliteStateMachine a full copy of the database, so this also sets how often
+# that cost is paid: raise it for large SQLite datasets (the log then keeps more entries on disk).
+SNAPSHOT_THRESHOLD_ENTRIES = 10000
+SNAPSHOT_CHUNK_BYTES = 256 * 1024 # Size of each InstallSnapshot chunk
+SNAPSHOT_MAX_INFLIGHT_CHUNKS = 4 # Unacknowledged chunks allowed per transfer (flow control window)
+SNAPSHOT_ACK_TIMEOUT_S = 5.0 # Give up on a transfer stream if no ack arrives within this time
+CLIENT_COMMIT_TIMEOUT_S = 10.0 # How long a client request waits for its entries to commit
+READ_INDEX_TIMEOUT_S = 5.0 # How long a linearizable read waits to confirm leadership and catch up
+# How far two nodes' clocks may drift apart while one lease runs, i.e. their maximum relative
+# rate drift times ELECTION_TIMEOUT_MIN_MS (100 ms allows 12.5%). Leases last ELECTION_TIMEOUT_MIN_MS
+# minus this. Offsets between the clocks don't matter: each node only measures intervals on its own.
+LEASE_DRIFT_BOUND_MS = 100
+# gRPC backs off reconnects for up to 2 minutes by default; a restarted peer that hears nothing
+# for an election timeout starts an election and deposes a healthy leader
+PEER_RECONNECT_BACKOFF_MAX_MS = 300
 
 # --- Enums ---
 class NodeState(Enum):
@@ -26,35 +56,65 @@ class NodeState(Enum):
 # --- Raft Node Class ---
 logger = logging.getLogger(__name__)
 
+async def close_peer_stubs(peer_stubs: Dict[int, raft_pb2_grpc.RaftServiceStub], name: str):
+    """Closes the channels behind `peer_stubs` and empties it."""
+    for peer_id, stub in peer_stubs.items():
+        if hasattr(stub, '_channel'): # Access underlying channel if possible
+            try:
+                # Ensure channel is closed
+                await stub._channel.close() # Close the channel gracefully
+                logger.debug(f"Node {name}: Closed gRPC channel to peer {peer_id}")
+            except Exception as e:
+                logger.warning(f"Node {name}: Error closing channel to peer {peer_id}: {e}")
+    peer_stubs.clear()
+
 class RaftNode:
-    def __init__(self, node_id: int, peers_addresses: Dict[int, str], data_dir: str):
+    def __init__(self, node_id: int, peers_addresses: Dict[int, str], data_dir: str,
+                 state_machine: Optional[StateMachine] = None, group_id: int = 0,
+                 peer_stubs: Optional[Dict[int, raft_pb2_grpc.RaftServiceStub]] = None):
         self.node_id = node_id
         self.peers_addresses = peers_addresses # Dict {peer_id: "host:port"}
         self.data_dir = data_dir
-        self.peer_stubs = {} # To store gRPC client stubs {peer_id: RaftServiceStub}
+        # Raft group (shard) this node is a member of; 0 when the process runs a single group.
+        # Stamped on every Raft RPC so one server can multiplex many groups.
+        self.group_id = group_id
+        self.name = str(node_id) if group_id == 0 else f"{node_id}/g{group_id}" # For log messages
+        # To store gRPC client stubs {peer_id: RaftServiceStub}. Groups in one process share
+        # theirs (and so one channel per peer); whoever passed them in closes them.
+        self._owns_peer_stubs = peer_stubs is None
+        self.peer_stubs = peer_stubs if peer_stubs is not None else {}
 
         # Ensure data directory exists
         os.makedirs(self.data_dir, exist_ok=True)
 
         # --- File Paths ---
-        self.state_file_path = os.path.join(self.data_dir, "raft_state.json")
-        self.log_file_path = os.path.join(self.data_dir, "raft.log")
+        self.hard_state_path = os.path.join(self.data_dir, "hard_state.bin") # current_term + voted_for (A/B slots)
+        self.state_file_path = os.path.join(self.data_dir, "raft_state.json") # JSON state file of older versions
+        self.log_file_path = os.path.join(self.data_dir, "raft.log") # Single-file log of older versions
+        self.log_dir = os.path.join(self.data_dir, "log") # Segmented log (<first_index>.seg + .idx)
+        self.snapshot_file_path = os.path.join(self.data_dir, "snapshot.bin")
 
         # === Persistent state on all servers ===
         # (Updated on stable storage before responding to RPCs)
         self.current_term: int = 0
         self.voted_for: Optional[int] = None
-        self.log: List[raft_pb2.LogEntry] = [] # In-memory for now
-        # Load persistent state from disk
-        self._load_state()
-        self._load_log()
+        self.log: LogStore = LogStore() # Entries after the last snapshot, addressed by 1-based Raft index
+        self._log_segments = SegmentedLog(self.node_id, self.log_dir)
 
         # === Volatile state on all servers ===
         self.commit_index: int = 0
         self.last_applied: int = 0
         self.state: NodeState = NodeState.FOLLOWER
         self.leader_id: Optional[int] = None # Track current known leader
-        self.kv_store: Dict[str, bytes] = {} # Simple in-memory K/V store
+        # Key/value state that committed commands are applied to (in-memory unless given a durable one)
+        self.state_machine: StateMachine = state_machine if state_machine is not None else MemoryStateMachine()
+
+        # Load persistent state from disk (the snapshot and a durable state machine seed commit_index/last_applied)
+        self._load_state()
+        self._load_snapshot()
+        self._load_log()
+        # Group-commit writer for new log entries (keeps the active segment open, batches fsyncs)
+        self._wal = GroupCommitWAL(self.node_id, self._log_segments)
 
         # === Volatile state on leaders ===
         # (Reinitialized after election)
@@ -63,166 +123,317 @@ class RaftNode:
 
         # === Internal state ===
         self._election_timer: Optional[asyncio.TimerHandle] = None
-        self._heartbeat_timer: Optional[asyncio.Task] = None # Task for periodic heartbeats
+        # Added to every election timeout. Lets the replica meant to lead a group (see MultiRaft)
+        # win elections first; only ever lengthens timeouts, so leases stay safe.
+        self.election_timeout_offset_ms: float = 0.0
+        self._replicators: Dict[int, PeerReplicator] = {} # Leader: replication loop per peer {peer_id: PeerReplicator}
+        # Measured RTT/throughput to each peer; drives AppendEntries deadlines and batch sizes.
+        # Kept across terms so a new leadership starts with what we learned before.
+        self._links: Dict[int, LinkEstimator] = {}
+        # Send heartbeats about once per measured RTT to each peer (see PeerReplicator)
+        # instead of every HEARTBEAT_INTERVAL_MS
+        self.adaptive_heartbeat: bool = False
+        # Shared by the Raft groups of a process (see MultiRaft); sends their periodic
+        # heartbeats to each peer as one RPC. None: the replicators send their own.
+        self.heartbeat_coalescer: Optional[HeartbeatCoalescer] = None
         # self._loop = asyncio.get_running_loop() # remove this line
         self._votes_received: set = set() # Used during candidate state
         # Tracks futures for client requests waiting for commit {log_index: asyncio.Future}
         self._commit_futures: Dict[int, asyncio.Future] = {}
         # Lock for safely accessing/modifying _commit_futures
         self._commit_futures_lock = asyncio.Lock()
-
-        logger.info(f"Node {self.node_id}: Initialized in Follower state. Term: {self.current_term}")
-        logger.info(f"Node {self.node_id}: Peers: {self.peers_addresses}")
+        # Leader: coalesces concurrent ExecuteCommand proposals into one append
+        self._proposals = ProposalQueue(self.node_id, self._append_client_entries)
+        # Leader: commands already decoded when the client sent them, so applying them doesn't
+        # decode them again {log_index: (term, parsed command)}; popped as entries are applied
+        self._parsed_commands: Dict[int, Tuple[int, Operation]] = {}
+        # ReadIndex: GETs confirm leadership with a heartbeat round shared by concurrent reads.
+        # False restores the old behaviour of answering from the leader's state machine right away,
+        # which can return stale data from a deposed leader.
+        self.linearizable_reads: bool = True
+        self._term_start_index: int = 0 # Leader: index of this term's no-op entry
+        self._read_round: int = 0 # Leader: latest leadership-confirmation round started
+        self._confirmed_read_round: int = 0 # Leader: latest round acknowledged by a majority
+        self._read_round_scheduled: bool = False
+        self._read_waiters: List[Tuple[int, asyncio.Future]] = [] # (round, future) waiting for a majority ack
+        self._apply_waiters: List[Tuple[int, asyncio.Future]] = [] # (index, future) waiting for last_applied
+        # Leader leases: after a majority acks a heartbeat, no other leader can be elected for
+        # ELECTION_TIMEOUT_MIN_MS (followers ignore candidates while they hear from a leader), so
+        # GETs skip the confirmation round until the lease runs out. Safe only while clock rates
+        # drift apart by less than the drift bound over a lease. A restarted node has forgotten
+        # whom it heard from, so with leases on it refuses every vote for ELECTION_TIMEOUT_MIN_MS.
+        self.lease_reads: bool = False
+        self.lease_drift_bound_ms: float = LEASE_DRIFT_BOUND_MS
+        self._started_at: Optional[float] = None # Loop time run() was called
+        self._last_leader_contact: float = 0.0 # Follower: loop time of the last RPC from the leader
+        # Follower reads (BOUNDED_STALENESS): the newest leader commit index we've heard of, and
+        # when we last had applied everything the leader had committed at the time
+        self._leader_commit: int = 0
+        self._caught_up_at: float = 0.0
+        self._freshness_waiters: List[asyncio.Future] = [] # Bounded reads re-checking after each AppendEntries
+        self._apply_task: Optional[asyncio.Future] = None # Background _apply_committed_entries(), if one ran
+        self._snapshot_in_progress: bool = False
+        self._snapshot_task: Optional[asyncio.Future] = None # Background _take_snapshot(), if one ran
+        # Follower: a received snapshot is being verified and restored (off the event loop); until it
+        # is done, appends and further snapshot chunks are refused and no local snapshot is started
+        self._installing_snapshot: bool = False
+        # Follower: partially received snapshot from the leader (resumable across streams)
+        self._snapshot_receiver: Optional[SnapshotReceiver] = None
+        # Leader: running InstallSnapshot transfers {peer_id: Task} and where to resume them
+        # {peer_id: ((last_included_index, last_included_term), acknowledged_bytes)}
+        self._snapshot_transfers: Dict[int, asyncio.Task] = {}
+        self._snapshot_resume_offsets: Dict[int, Tuple[Tuple[int, int], int]] = {}
+
+        logger.info(f"Node {self.name}: Initialized in Follower state. Term: {self.current_term}")
+        logger.info(f"Node {self.name}: Peers: {self.peers_addresses}")
 
 
     # --- Persistence Methods ---
 
-    def _persist_state(self):
-        """Saves current_term and voted_for to the state file."""
-        state = {
-            "current_term": self.current_term,
-            "voted_for": self.voted_for,
-        }
+    def _persist_state(self) -> asyncio.Future:
+        """
+        Queues current_term and voted_for (as they are now) for writing to the state file
+        on the WAL's disk thread. Returns a future that resolves once they're durable;
+        await it before replying to an RPC or asking for votes.
+        """
+        return self._wal.submit(self._write_state_file, self.current_term, self.voted_for)
+
+    def _write_state_file(self, current_term: int, voted_for: Optional[int]):
+        """Saves current_term and voted_for to the hard state file (blocks on fdatasync)."""
         try:
-            # Write atomically: write to temp file, then rename
-            temp_path = self.state_file_path + ".tmp"
-            with open(temp_path, 'w') as f:
-                json.dump(state, f)
-                f.flush() # Ensure Python's buffer is flushed to OS
-                os.fsync(f.fileno()) # Ensure OS buffer is flushed to disk
-            os.rename(temp_path, self.state_file_path)
-            logger.debug(f"Node {self.node_id}: Persisted state: term={self.current_term}, voted_for={self.voted_for}")
-        except IOError as e:
-            logger.error(f"Node {self.node_id}: Failed to persist state to {self.state_file_path}: {e}", exc_info=True)
+            self._hard_state.save(current_term, voted_for)
+            logger.debug(f"Node {self.name}: Persisted state: term={current_term}, voted_for={voted_for}")
+        except OSError as e:
+            logger.error(f"Node {self.name}: Failed to persist state to {self.hard_state_path}: {e}", exc_info=True)
             # Critical error, might need to handle more robustly (e.g., crash?)
 
     def _load_state(self):
-        """Loads current_term and voted_for from the state file."""
+        """
+        Loads current_term and voted_for from the hard state file (or the JSON file of older versions).
+        Raises ValueError rather than start from term 0 without a vote when the saved state
+        can't be read or migrated: the node may already have voted in a later term.
+        """
+        self._hard_state = HardStateFile(self.hard_state_path)
         try:
-            if os.path.exists(self.state_file_path):
+            state = self._hard_state.load()
+            if state is not None:
+                self.current_term, self.voted_for = state
+                logger.info(f"Node {self.name}: Loaded state: term={self.current_term}, voted_for={self.voted_for}")
+            elif not self._hard_state.blank():
+                raise ValueError(f"neither slot of {self.hard_state_path} holds a valid state")
+            elif os.path.exists(self.state_file_path):
                 with open(self.state_file_path, 'r') as f:
                     state = json.load(f)
-                    self.current_term = state.get("current_term", 0)
-                    self.voted_for = state.get("voted_for", None)
-                    logger.info(f"Node {self.node_id}: Loaded state: term={self.current_term}, voted_for={self.voted_for}")
+                self.current_term = state.get("current_term", 0)
+                self.voted_for = state.get("voted_for", None)
+                self._hard_state.save(self.current_term, self.voted_for)
+                os.remove(self.state_file_path) # Only once the hard state file holds it
+                logger.info(f"Node {self.name}: Migrated state from {self.state_file_path}: term={self.current_term}, voted_for={self.voted_for}")
             else:
-                logger.info(f"Node {self.node_id}: State file not found. Initializing state.")
+                logger.info(f"Node {self.name}: State file not found. Initializing state.")
                 # Initial state is term 0, voted_for None (already defaults)
                 # Persist initial state? Good practice.
-                self._persist_state()
-        except (IOError, json.JSONDecodeError) as e:
-            logger.error(f"Node {self.node_id}: Failed to load state from {self.state_file_path}: {e}. Starting with default state.", exc_info=True)
-            # Reset to default state in case of corruption
-            self.current_term = 0
-            self.voted_for = None
-            # Attempt to persist default state to potentially fix corruption for next boot
-            self._persist_state()
+                self._write_state_file(self.current_term, self.voted_for)
+        except (OSError, ValueError) as e: # json.JSONDecodeError is a ValueError
+            logger.error(f"Node {self.name}: Failed to load state from {self.hard_state_path}: {e}. Refusing to start.", exc_info=True)
+            self._hard_state.close()
+            raise ValueError(f"Node {self.name}: cannot recover current_term and voted_for ({e}); "
+                             f"refusing to start with a reset term and vote") from e
 
 
-    def _persist_log_entry(self, entry: raft_pb2.LogEntry):
-        """Appends a single serialized log entry (with length prefix) to the log file."""
+    def _load_snapshot(self):
+        """
+        Sets the log base from the snapshot file, if any, and restores the state machine
+        from it unless a durable state machine has already applied past the snapshot.
+        """
+        partial_path = self.snapshot_file_path + ".partial"
+        if os.path.exists(partial_path):
+            os.remove(partial_path) # Left over from an interrupted InstallSnapshot
+        # Entries a durable state machine applied before the restart are committed; only replay the rest
+        self.last_applied = self.commit_index = self.state_machine.applied_index
         try:
-            entry_bytes = entry.SerializeToString()
-            # Prefix with 4-byte length (unsigned int, network byte order)
-            length_prefix = struct.pack("!I", len(entry_bytes))
-            with open(self.log_file_path, 'ab') as f: # Append binary mode
-                f.write(length_prefix)
-                f.write(entry_bytes)
-                f.flush() # Ensure Python's buffer is flushed to OS
-                os.fsync(f.fileno()) # Ensure OS buffer is flushed to disk
-            logger.debug(f"Node {self.node_id}: Persisted log entry (term={entry.term}, size={len(entry_bytes)})")
-        except IOError as e:
-            logger.error(f"Node {self.node_id}: Failed to persist log entry to {self.log_file_path}: {e}", exc_info=True)
-            # Critical error
-
-    def _truncate_log_file(self, index: int):
-        """Truncates the persisted log file *after* the entry at the given (0-based) index."""
-        # This is complex to do safely and efficiently by modifying the file in place.
-        # A simpler (but less efficient for large logs) approach is to reload the
-        # in-memory log up to 'index' and rewrite the entire log file.
-        logger.warning(f"Node {self.node_id}: Truncating log file from index {index+1} (0-based index {index})")
+            snapshot = read_snapshot(self.snapshot_file_path)
+            if snapshot is None:
+                logger.info(f"Node {self.name}: Snapshot file not found. Replaying log from index {self.last_applied + 1}.")
+                return
+            metadata, count, records = snapshot
+            if self.state_machine.applied_index < metadata.last_applied:
+                self.state_machine.restore(records, metadata.last_applied)
+            else:
+                records.close() # The state machine is already newer than the snapshot
+        except (IOError, ValueError) as e:
+            logger.error(f"Node {self.name}: Failed to load snapshot from {self.snapshot_file_path}: {e}. Starting without snapshot.", exc_info=True)
+            return
+
+        self.log.reset(metadata.last_included_index, metadata.last_included_term)
+        # Everything in a snapshot is committed and applied by definition
+        self.commit_index = max(self.commit_index, metadata.last_included_index)
+        self.last_applied = max(self.last_applied, metadata.last_applied)
+        logger.info(f"Node {self.name}: Loaded snapshot: last_included_index={metadata.last_included_index}, last_included_term={metadata.last_included_term}, keys={count}, last_applied={self.last_applied}")
+
+    def _maybe_take_snapshot(self):
+        """Starts a background snapshot once enough applied entries have accumulated in the log."""
+        if self._snapshot_in_progress or self._installing_snapshot:
+            return
+        if self.last_applied - self.log.snapshot_index < SNAPSHOT_THRESHOLD_ENTRIES:
+            return
         try:
-            # Keep entries up to and including 'index'
-            entries_to_keep = self.log[:index + 1]
-            temp_path = self.log_file_path + ".tmp"
-
-            # Rewrite the log file with only the entries to keep
-            with open(temp_path, 'wb') as f: # Write binary mode (overwrite)
-                 for entry in entries_to_keep:
-                      entry_bytes = entry.SerializeToString()
-                      length_prefix = struct.pack("!I", len(entry_bytes))
-                      f.write(length_prefix)
-                      f.write(entry_bytes)
-                 f.flush()
-                 os.fsync(f.fileno())
-
-            os.rename(temp_path, self.log_file_path)
-            logger.info(f"Node {self.node_id}: Log file rewritten, truncated after index {index}")
-
-        except IOError as e:
-            logger.error(f"Node {self.node_id}: Failed to truncate log file at index {index}: {e}", exc_info=True)
-            # Critical error - log file might be corrupt
+            # Captured right away: the apply task may start its next batch before _take_snapshot runs
+            captured = self._capture_state_machine()
+        except Exception as e:
+            logger.error(f"Node {self.name}: Failed to take snapshot: {e}", exc_info=True)
+            return
+        self._snapshot_in_progress = True
+        self._snapshot_task = asyncio.ensure_future(self._take_snapshot(captured))
 
-    def _load_log(self):
-        """Loads log entries from the log file."""
-        self.log = []
+    def _capture_state_machine(self) -> Tuple[int, int, Iterator[Tuple[str, bytes]]]:
+        """(last_applied, key count, records) of the state machine now, between two applied batches."""
+        count, records = self.state_machine.snapshot() # Point-in-time view; apply keeps running while we write
+        return self.last_applied, count, records
+
+    async def _take_snapshot(self, captured: Tuple[int, int, Iterator[Tuple[str, bytes]]]):
+        """Writes the captured state machine to the snapshot file, then compacts the log prefix it covers."""
         try:
-            if not os.path.exists(self.log_file_path):
-                logger.info(f"Node {self.node_id}: Log file not found. Starting with empty log.")
-                # Create an empty file? Optional.
-                # open(self.log_file_path, 'ab').close()
-                return
+            index, count, records = captured
+            metadata = SnapshotMetadata(last_included_index=index,
+                                        last_included_term=self.log.term_at(index),
+                                        last_applied=index)
+            logger.info(f"Node {self.name}: Taking snapshot at index {index} (term {metadata.last_included_term}, {count} keys)")
 
-            with open(self.log_file_path, 'rb') as f: # Read binary mode
-                while True:
-                    # Read length prefix (4 bytes)
-                    length_bytes = f.read(4)
-                    if not length_bytes:
-                        break # End of file
-                    if len(length_bytes) < 4:
-                        logger.error(f"Node {self.node_id}: Corrupt log file? Could not read full length prefix.")
-                        break # Treat as corrupt
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, write_snapshot, self.snapshot_file_path, metadata, count, records)
 
-                    entry_length = struct.unpack("!I", length_bytes)[0]
+            if self.log.snapshot_index >= index:
+                # A snapshot installed from the leader meanwhile already covers this one
+                return
+            # The snapshot is durable; drop the covered prefix from memory and disk
+            self.log.compact_through(metadata.last_included_index, metadata.last_included_term)
+            await self._wal.delete_through(metadata.last_included_index)
+            logger.info(f"Node {self.name}: Snapshot complete. Log now starts at index {self.log.first_index} ({len(self.log)} entries retained)")
+        except Exception as e:
+            logger.error(f"Node {self.name}: Failed to take snapshot: {e}", exc_info=True)
+        finally:
+            self._snapshot_in_progress = False
 
-                    # Read the entry bytes
-                    entry_bytes = f.read(entry_length)
-                    if len(entry_bytes) < entry_length:
-                        logger.error(f"Node {self.node_id}: Corrupt log file? Could not read full entry (expected {entry_length}, got {len(entry_bytes)}).")
-                        # Decide whether to stop loading or try to continue
-                        break # Stop loading on corruption
+    def _persist_log_entries(self, records: List[bytes]) -> asyncio.Future:
+        """
+        Hands serialized log entries to the group-commit WAL.
+        Returns a future that resolves once they are durable (one fsync is shared
+        by every entry appended within the WAL's batch window).
+        """
+        logger.debug(f"Node {self.name}: Queued {len(records)} log entries for group commit")
+        return self._wal.append(records)
 
-                    # Deserialize and append
-                    entry = raft_pb2.LogEntry()
-                    entry.ParseFromString(entry_bytes)
-                    self.log.append(entry)
+    def _truncate_log_file(self, index: int) -> asyncio.Future:
+        """
+        Truncates the persisted log file *after* the entry at the given (0-based) index.
+        Returns a future that fails if the entries could not be removed from disk.
+        """
+        # Segments make this O(1): later segment files are deleted and the segment
+        # holding index+1 is ftruncated at that record's offset from its sidecar index.
+        logger.warning(f"Node {self.name}: Truncating log file from index {index+1} (0-based index {index})")
+        # Queued on the WAL's disk thread after anything still buffered and before any later
+        # append, so entries persisted afterwards (and awaited before replying) land after the cut.
+        # If it fails, the WAL refuses every later append.
+        return self._wal.truncate_after(index + 1)
 
-            logger.info(f"Node {self.node_id}: Loaded {len(self.log)} entries from log file.")
+    def _load_log(self):
+        """
+        Indexes the log entries after the snapshot in the log segments. Only the length
+        prefixes and terms are read (through mmap); records stay on disk until applied or sent.
+        """
+        self.log.truncate_after(self.log.snapshot_index)
+        try:
+            terms = self._log_segments.load(peek_entry_term)
+            if not terms and os.path.exists(self.log_file_path):
+                self._migrate_legacy_log_file()
+                terms = self._log_segments.load(peek_entry_term)
+
+            first_index = self._log_segments.first_index
+            if terms and first_index > self.log.first_index:
+                # A gap between snapshot and log (e.g. crash right after installing a snapshot)
+                logger.warning(f"Node {self.name}: Log starts at {first_index} but snapshot ends at {self.log.snapshot_index}. Discarding log.")
+                terms = terms[:0]
+                self._log_segments.reset(self.log.first_index)
+            elif not terms:
+                self._log_segments.reset(self.log.first_index)
+
+            skip = self.log.snapshot_index - first_index # Position of the snapshot's last entry in `terms`
+            if 0 <= skip < len(terms) and terms[skip] != self.log.snapshot_term:
+                logger.warning(f"Node {self.name}: Log entry {self.log.snapshot_index} (term {terms[skip]}) conflicts with snapshot (term {self.log.snapshot_term}). Discarding log.")
+                self._log_segments.reset(self.log.first_index)
+            elif skip + 1 < len(terms):
+                # Entries up to the snapshot's are already covered by it
+                self.log.attach(terms[max(0, skip + 1):], self._log_segments.read_record)
+
+            if self._log_segments.last_index < self.log.snapshot_index:
+                # Every segment is older than the snapshot, start the segmented log after it
+                self._log_segments.reset(self.log.first_index)
+
+            logger.info(f"Node {self.name}: Loaded {len(self.log)} entries from log segments (indices {self.log.first_index}..{self.log.last_index}).")
 
         except (IOError, struct.error, Exception) as e: # Catch protobuf parsing errors too
-             logger.error(f"Node {self.node_id}: Failed to load log from {self.log_file_path}: {e}. Starting with potentially truncated log.", exc_info=True)
+             logger.error(f"Node {self.name}: Failed to load log from {self.log_dir}: {e}. Starting with potentially truncated log.", exc_info=True)
              # Log might be partially loaded or empty now due to error.
 
+    def _migrate_legacy_log_file(self) -> List[bytes]:
+        """Copies a single-file raft.log from older versions into the segmented log, then removes it."""
+        records = []
+        with open(self.log_file_path, 'rb') as f: # Read binary mode
+            while True:
+                # Read length prefix (4 bytes)
+                length_bytes = f.read(4)
+                if not length_bytes:
+                    break # End of file
+                if len(length_bytes) < 4:
+                    logger.error(f"Node {self.name}: Corrupt log file? Could not read full length prefix.")
+                    break # Treat as corrupt
+
+                entry_length = struct.unpack("!I", length_bytes)[0]
+
+                # Read the entry bytes
+                entry_bytes = f.read(entry_length)
+                if len(entry_bytes) < entry_length:
+                    logger.error(f"Node {self.name}: Corrupt log file? Could not read full entry (expected {entry_length}, got {len(entry_bytes)}).")
+                    break # Stop loading on corruption
+                records.append(entry_bytes)
+
+        self._log_segments.append(records)
+        self._log_segments.sync()
+        os.remove(self.log_file_path)
+        logger.info(f"Node {self.name}: Migrated {len(records)} entries from {self.log_file_path} to {self.log_dir}")
+        return records
+
     # --- Core Raft Logic Methods (Placeholders) ---
 
     async def handle_request_vote(self, request: raft_pb2.RequestVoteArgs) -> raft_pb2.RequestVoteReply:
-        logger.debug(f"Node {self.node_id}: Handling RequestVote from Candidate {request.candidate_id} for term {request.term}")
+        logger.debug(f"Node {self.name}: Handling RequestVote from Candidate {request.candidate_id} for term {request.term}")
 
         # --- PERSISTENCE POINT ---
-        # Need to persist self.current_term and self.voted_for before returning
-        # We will add self._persist_state() calls later
+        # current_term and voted_for must be durable before we reply; the write runs on the
+        # disk thread and is awaited once, right before returning
+        state_durable: Optional[asyncio.Future] = None
 
         # 1. Reply false if term < currentTerm (§5.1)
         if request.term < self.current_term:
-            logger.info(f"Node {self.node_id}: Denying vote to {request.candidate_id} (term {request.term} < current term {self.current_term})")
+            logger.info(f"Node {self.name}: Denying vote to {request.candidate_id} (term {request.term} < current term {self.current_term})")
+            return raft_pb2.RequestVoteReply(term=self.current_term, vote_granted=False)
+
+        # While a leader is still heard from, a candidate can only be a disrupted or partitioned
+        # server: ignore it without adopting its term (Raft thesis §4.2.3). Leader leases rely on this.
+        if request.term > self.current_term and self._heard_from_leader_recently():
+            logger.info(f"Node {self.name}: Ignoring RequestVote from {request.candidate_id} for term {request.term} (leader {self.leader_id} is still active)")
+            return raft_pb2.RequestVoteReply(term=self.current_term, vote_granted=False)
+        if self._may_be_inside_a_lease():
+            logger.info(f"Node {self.name}: Ignoring RequestVote from {request.candidate_id} for term {request.term} (just started, a leader lease may still be running)")
             return raft_pb2.RequestVoteReply(term=self.current_term, vote_granted=False)
 
         # If request term is higher, update term and become follower FIRST
         if request.term > self.current_term:
-            logger.info(f"Node {self.node_id}: Received higher term {request.term} in RequestVote from {request.candidate_id}. Stepping down.")
+            logger.info(f"Node {self.name}: Received higher term {request.term} in RequestVote from {request.candidate_id}. Stepping down.")
             old_term = self.current_term # Keep old term for logging if needed
             self._become_follower(request.term)
-            self._persist_state() # Persist updated term & reset voted_for
+            state_durable = self._persist_state() # Persist updated term & reset voted_for
 
         # 2. If votedFor is null or candidateId... (§5.2, §5.4)
         vote_granted = False
@@ -238,26 +449,30 @@ class RaftNode:
             )
 
             if candidate_log_is_ok:
-                logger.info(f"Node {self.node_id}: Granting vote to Candidate {request.candidate_id} for term {self.current_term}. My log: (idx={my_last_log_index}, term={my_last_log_term}), Cand log: (idx={candidate_last_log_index}, term={candidate_last_log_term})")
+                logger.info(f"Node {self.name}: Granting vote to Candidate {request.candidate_id} for term {self.current_term}. My log: (idx={my_last_log_index}, term={my_last_log_term}), Cand log: (idx={candidate_last_log_index}, term={candidate_last_log_term})")
                 vote_granted = True
                 self.voted_for = request.candidate_id # Record vote
-                self._persist_state()
+                state_durable = self._persist_state()
                 self._reset_election_timer() # Reset timer ONLY if vote is granted
             else:
-                logger.info(f"Node {self.node_id}: Denying vote to Candidate {request.candidate_id} for term {self.current_term}. Candidate log not up-to-date. My log: (idx={my_last_log_index}, term={my_last_log_term}), Cand log: (idx={candidate_last_log_index}, term={candidate_last_log_term})")
+                logger.info(f"Node {self.name}: Denying vote to Candidate {request.candidate_id} for term {self.current_term}. Candidate log not up-to-date. My log: (idx={my_last_log_index}, term={my_last_log_term}), Cand log: (idx={candidate_last_log_index}, term={candidate_last_log_term})")
         else:
-            logger.info(f"Node {self.node_id}: Denying vote to Candidate {request.candidate_id} (already voted for {self.voted_for} in term {self.current_term})")
+            logger.info(f"Node {self.name}: Denying vote to Candidate {request.candidate_id} (already voted for {self.voted_for} in term {self.current_term})")
 
         # Reply with current term (might have been updated) and vote status
-        return raft_pb2.RequestVoteReply(term=self.current_term, vote_granted=vote_granted)
+        reply = raft_pb2.RequestVoteReply(term=self.current_term, vote_granted=vote_granted)
+        if state_durable is not None:
+            await state_durable # Writes are ordered, so this covers the step-down write too
+        return reply
 
     async def handle_append_entries(self, request: raft_pb2.AppendEntriesArgs) -> raft_pb2.AppendEntriesReply:
         success = False # Initialize success to False
-        logger.debug(f"Node {self.node_id}: Handling AppendEntries from {request.leader_id} for term {request.term}")
+        state_durable: Optional[asyncio.Future] = None # New term, awaited before replying
+        logger.debug(f"Node {self.name}: Handling AppendEntries from {request.leader_id} for term {request.term}")
 
         # 1. Reply false if term < currentTerm (§5.1)
         if request.term < self.current_term:
-            logger.info(f"Node {self.node_id}: Rejecting AppendEntries from {request.leader_id} (term {request.term} < current term {self.current_term})")
+            logger.info(f"Node {self.name}: Rejecting AppendEntries from {request.leader_id} (term {request.term} < current term {self.current_term})")
             return raft_pb2.AppendEntriesReply(term=self.current_term, success=False)
 
         # Raft paper rules for AppendEntries (§5.1, §5.3):
@@ -269,9 +484,9 @@ class RaftNode:
         # If RPC received: reset election timer. If term > currentTerm: step down.
 
         if request.term > self.current_term:
-            logger.info(f"Node {self.node_id}: Received higher term {request.term} from leader {request.leader_id}. Stepping down.")
+            logger.info(f"Node {self.name}: Received higher term {request.term} from leader {request.leader_id}. Stepping down.")
             self._become_follower(request.term)
-            self._persist_state() # Persist updated term & reset voted_for
+            state_durable = self._persist_state() # Persist updated term & reset voted_for
             # Continue processing the AppendEntries in the new term below
 
         # (Only process if term is current or we just updated it)
@@ -280,25 +495,38 @@ class RaftNode:
             if self.state != NodeState.LEADER:
                 self._become_follower(request.term) # Ensure follower state if candidate/leader sees valid leader
                 self.leader_id = request.leader_id
-                logger.debug(f"Node {self.node_id}: Recognized {self.leader_id} as leader for term {self.current_term}")
+                logger.debug(f"Node {self.name}: Recognized {self.leader_id} as leader for term {self.current_term}")
                 self._reset_election_timer()
+                self._last_leader_contact = asyncio.get_running_loop().time()
 
             # --- Log Consistency Check (§5.3) ---
             log_matched = False # Initialize here
+            conflict_term = 0
+            conflict_index = 0
 
             # 2. Reply false if log doesn't contain an entry at prevLogIndex whose term matches prevLogTerm
-            if request.prev_log_index == 0:
+            if self._installing_snapshot:
+                # The log is about to be replaced; the leader retries once the snapshot is installed
+                logger.debug(f"Node {self.name}: Rejecting AppendEntries while installing a snapshot")
+            elif request.prev_log_index == 0:
                 # If prevLogIndex is 0, it's effectively a match with the "entry" before the first log entry
                 log_matched = True
-            elif request.prev_log_index > len(self.log):
+            elif request.prev_log_index < self.log.snapshot_index:
+                # Everything up to our snapshot is committed, so it matches the leader's log by definition.
+                # Entries we've already compacted away are skipped below.
+                log_matched = True
+            elif request.prev_log_index > self.log.last_index:
                 # Log doesn't contain prevLogIndex (it's too short)
-                logger.info(f"Node {self.node_id}: Rejecting AppendEntries. Log too short (len={len(self.log)}, prevLogIndex={request.prev_log_index})")
-                # log_matched remains False
-            elif self.log[request.prev_log_index - 1].term != request.prev_log_term:
-                # Term at (0-indexed) self.log[request.prev_log_index - 1] does not match prevLogTerm
-                logger.info(f"Node {self.node_id}: Rejecting AppendEntries. Term mismatch at index {request.prev_log_index} (myTerm={self.log[request.prev_log_index - 1].term}, prevLogTerm={request.prev_log_term})")
-                # log_matched remains False
-                # TODO: Optimization: Could include conflict term/index in reply to help leader find match faster
+                logger.info(f"Node {self.name}: Rejecting AppendEntries. Log too short (lastIndex={self.log.last_index}, prevLogIndex={request.prev_log_index})")
+                # log_matched remains False; the leader can jump straight to our end of log
+                conflict_index = self.log.last_index + 1
+            elif self.log.term_at(request.prev_log_index) != request.prev_log_term:
+                # Term at prevLogIndex does not match prevLogTerm
+                logger.info(f"Node {self.name}: Rejecting AppendEntries. Term mismatch at index {request.prev_log_index} (myTerm={self.log.term_at(request.prev_log_index)}, prevLogTerm={request.prev_log_term})")
+                # log_matched remains False; tell the leader which term conflicts and where it starts
+                # so it can skip the whole term in one round trip
+                conflict_term = self.log.term_at(request.prev_log_index)
+                conflict_index = self.log.first_index_of_term(request.prev_log_index)
             else:
                 # Log is long enough and term at prevLogIndex matches.
                 log_matched = True
@@ -306,26 +534,32 @@ class RaftNode:
             if log_matched:
                 success = True # Set success to True ONLY if log_matched is confirmed
                 # --- Append/Truncate Logic ---
+                new_entries = [] # Entries appended by this request, persisted with one group commit
+                truncated = None # Removal of a conflicting suffix from disk, if any
                 current_log_index = request.prev_log_index # Start checking from the entry *after* prevLogIndex
-                for i, entry in enumerate(request.entries):
+                # Entries stay serialized; leaders that don't send entry_terms make us decode them for the term
+                entry_terms = request.entry_terms or [raft_pb2.LogEntry.FromString(record).term for record in request.entries]
+                for record, entry_term in zip(request.entries, entry_terms):
                     current_log_index += 1
-                    if current_log_index > len(self.log):
+                    if current_log_index <= self.log.snapshot_index:
+                        continue # Already covered by our snapshot
+                    if current_log_index > self.log.last_index:
                         # Append new entry
-                        self.log.append(entry)
-                        self._persist_log_entry(entry) # Persist *before* adding to in-memory? Or after? Raft needs it durable. Let's persist first.
-                        logger.debug(f"Node {self.node_id}: Appended entry at index {current_log_index} (term {entry.term})")
-                    elif self.log[current_log_index - 1].term != entry.term:
+                        self.log.append(entry_term, record)
+                        new_entries.append(record)
+                        logger.debug(f"Node {self.name}: Appended entry at index {current_log_index} (term {entry_term})")
+                    elif self.log.term_at(current_log_index) != entry_term:
                         # Conflict: delete existing entry and all that follow
-                        logger.warning(f"Node {self.node_id}: Log conflict at index {current_log_index}. Truncating log. Existing term: {self.log[current_log_index - 1].term}, New term: {entry.term}")
+                        logger.warning(f"Node {self.name}: Log conflict at index {current_log_index}. Truncating log. Existing term: {self.log.term_at(current_log_index)}, New term: {entry_term}")
                         # Truncate in-memory log FIRST
-                        self.log = self.log[:current_log_index - 1]
+                        self.log.truncate_after(current_log_index - 1)
                         # Truncate persisted log file
-                        self._truncate_log_file(current_log_index - 2) # Pass 0-based index of last entry to keep
+                        truncated = self._truncate_log_file(current_log_index - 2) # Pass 0-based index of last entry to keep
 
                         # Append the new entry
-                        self.log.append(entry)
-                        self._persist_log_entry(entry)
-                        logger.debug(f"Node {self.node_id}: Appended entry at index {current_log_index} (term {entry.term}) after truncation")
+                        self.log.append(entry_term, record)
+                        new_entries.append(record)
+                        logger.debug(f"Node {self.name}: Appended entry at index {current_log_index} (term {entry_term}) after truncation")
                     # else: entry matches, do nothing
 
                 # --- Update Commit Index ---
@@ -335,26 +569,172 @@ class RaftNode:
                     new_commit_index = min(request.leader_commit, current_log_index)
                     if new_commit_index > self.commit_index:
                         self.commit_index = new_commit_index
-                        logger.info(f"Node {self.node_id}: Updated commitIndex to {self.commit_index}")
+                        logger.info(f"Node {self.name}: Updated commitIndex to {self.commit_index}")
                         # --- Trigger State Machine Application ---
                         self._apply_log_entries() # We'll add this later
 
+                # --- Entries must be durable before we acknowledge them ---
+                # Success tells the leader we hold everything through prev_log_index + len(entries).
+                # Entries already in our log (appended by an earlier frame, or a heartbeat) may still
+                # be in a group commit, so wait for everything queued so far, not only our own.
+                durable = self._persist_log_entries(new_entries) if new_entries else self._wal.barrier()
+                try:
+                    # A failed truncation fails durable too: the WAL refuses appends on top of a stale suffix
+                    await asyncio.gather(*([truncated] if truncated is not None else []), durable)
+                except Exception as e:
+                    logger.error(f"Node {self.name}: Failed to persist log entries through index {current_log_index}: {e}")
+                    success = False
+
+            self._note_leader_commit(request.leader_commit)
+
         # Reply section remains largely the same, term might have updated
-        return raft_pb2.AppendEntriesReply(term=self.current_term, success=success)
+        reply = raft_pb2.AppendEntriesReply(
+            term=self.current_term,
+            success=success,
+            conflict_term=conflict_term,
+            conflict_index=conflict_index,
+            last_log_index=self.log.last_index
+        )
+        if state_durable is not None:
+            await state_durable # Already done if new entries were persisted (writes are ordered)
+        return reply
 
         # Other methods (like becoming follower/candidate/leader) don't
         # inherently require persistence *at that moment*, they rely on the
         # state being persisted when it changes (term/vote) or when log entries
         # are added.
 
-    async def handle_client_command(self, request: raft_pb2.ClientCommandRequest) -> raft_pb2.ClientCommandReply:
-            logger.debug(f"Node {self.node_id}: Handling Client Command (ID: {request.command_id})")
+    async def handle_append_entries_stream(self, request_iterator: AsyncIterator[raft_pb2.AppendEntriesArgs]) -> AsyncIterator[raft_pb2.AppendEntriesReply]:
+        """
+        Serves a leader's AppendEntriesStream: one reply per frame, in frame order.
+        Frames are handled as soon as they arrive, so the leader can pipeline them
+        and their fsyncs share group commits. Each handler starts in arrival order,
+        so the in-memory log is updated in the order the leader sent the frames.
+        """
+        handlers: asyncio.Queue = asyncio.Queue()
 
-            # 1. Check if leader
-            if self.state != NodeState.LEADER:
-                leader_hint = self.peers_addresses.get(self.leader_id, "")
-                logger.info(f"Node {self.node_id}: Not leader, redirecting client to {leader_hint}")
-                return raft_pb2.ClientCommandReply(success=False, leader_hint=leader_hint, message="Not the leader")
+        async def read_frames():
+            try:
+                async for request in request_iterator:
+                    handlers.put_nowait(asyncio.ensure_future(self.handle_append_entries(request)))
+            finally:
+                handlers.put_nowait(None) # End of stream
+
+        reader = asyncio.create_task(read_frames())
+        try:
+            while True:
+                handler = await handlers.get()
+                if handler is None:
+                    break
+                yield await handler
+        finally:
+            reader.cancel()
+
+    async def handle_install_snapshot_chunk(self, chunk: raft_pb2.InstallSnapshotChunk) -> raft_pb2.InstallSnapshotReply:
+        """Handles one chunk of an InstallSnapshot stream and acknowledges how many bytes we now hold."""
+        if chunk.term < self.current_term:
+            logger.info(f"Node {self.name}: Rejecting InstallSnapshot chunk from {chunk.leader_id} (term {chunk.term} < current term {self.current_term})")
+            return raft_pb2.InstallSnapshotReply(term=self.current_term)
+
+        if chunk.term > self.current_term:
+            logger.info(f"Node {self.name}: Received higher term {chunk.term} in InstallSnapshot from {chunk.leader_id}. Stepping down.")
+            self._become_follower(chunk.term)
+            await self._persist_state()
+            if chunk.term < self.current_term:
+                # A newer term arrived while the disk was busy
+                return raft_pb2.InstallSnapshotReply(term=self.current_term)
+        if self.state != NodeState.FOLLOWER:
+            self._become_follower(chunk.term)
+        self.leader_id = chunk.leader_id
+        self._reset_election_timer() # The leader isn't sending us heartbeats while it streams the snapshot
+        self._last_leader_contact = asyncio.get_running_loop().time()
+
+        if self._installing_snapshot:
+            # A completed transfer is still being restored; the leader starts over and then learns it's done
+            return raft_pb2.InstallSnapshotReply(term=self.current_term, bytes_stored=0)
+
+        if chunk.last_included_index <= self.last_applied:
+            # We already applied everything the snapshot covers, nothing to install
+            logger.info(f"Node {self.name}: Ignoring snapshot through index {chunk.last_included_index}, already applied up to {self.last_applied}")
+            self._abort_snapshot_receiver()
+            return raft_pb2.InstallSnapshotReply(term=self.current_term, done=True)
+
+        receiver = self._snapshot_receiver
+        if receiver is None or not receiver.matches(chunk.last_included_index, chunk.last_included_term):
+            if chunk.offset != 0:
+                # Resuming a transfer we know nothing about, ask the leader to start over
+                return raft_pb2.InstallSnapshotReply(term=self.current_term, bytes_stored=0)
+            self._abort_snapshot_receiver()
+            logger.info(f"Node {self.name}: Receiving snapshot through index {chunk.last_included_index} (term {chunk.last_included_term}) from leader {chunk.leader_id}")
+            receiver = SnapshotReceiver(self.snapshot_file_path, chunk.last_included_index, chunk.last_included_term)
+            self._snapshot_receiver = receiver
+
+        bytes_stored = receiver.write_chunk(chunk.offset, chunk.data)
+        if not chunk.done or bytes_stored != chunk.offset + len(chunk.data):
+            return raft_pb2.InstallSnapshotReply(term=self.current_term, bytes_stored=bytes_stored)
+
+        # Last chunk: validate, make it the current snapshot and reset the state machine from it.
+        # Both read the whole snapshot, so they run off the event loop to keep heartbeats and
+        # replies flowing; the log and state machine are left alone meanwhile.
+        self._snapshot_receiver = None
+        self._installing_snapshot = True
+        try:
+            if self._snapshot_task is not None and not self._snapshot_task.done():
+                # A local snapshot still being written would rename its older file over ours
+                await asyncio.shield(self._snapshot_task)
+            if self._apply_task is not None and not self._apply_task.done():
+                await asyncio.shield(self._apply_task) # Stops after the batch it is applying
+            loop = asyncio.get_running_loop()
+            try:
+                metadata = await loop.run_in_executor(None, receiver.finish)
+            except (IOError, OSError, ValueError) as e:
+                logger.error(f"Node {self.name}: Received snapshot is invalid: {e}. Discarding it.", exc_info=True)
+                receiver.abort()
+                return raft_pb2.InstallSnapshotReply(term=self.current_term, bytes_stored=0)
+            try:
+                await self._install_snapshot(metadata)
+            except Exception as e:
+                # The state machine rolled back; the leader will send the snapshot again
+                logger.error(f"Node {self.name}: Failed to restore the state machine from the received snapshot: {e}", exc_info=True)
+                return raft_pb2.InstallSnapshotReply(term=self.current_term, bytes_stored=0)
+        finally:
+            self._installing_snapshot = False
+        self._apply_log_entries() # Entries we kept after the snapshot's end
+        return raft_pb2.InstallSnapshotReply(term=self.current_term, bytes_stored=bytes_stored, done=True)
+
+    async def _install_snapshot(self, metadata: SnapshotMetadata):
+        """Replaces the state machine with the snapshot just received from the leader (§7)."""
+        index, term = metadata.last_included_index, metadata.last_included_term
+        # Restore first: if it fails the old state and log are still consistent, and after a
+        # crash the (already renamed) snapshot file is restored again on startup
+        count = await asyncio.get_running_loop().run_in_executor(None, self._restore_snapshot_file, metadata)
+        if index <= self.log.last_index and index > self.log.snapshot_index and self.log.term_at(index) == term:
+            # We already have the entry the snapshot ends with: keep the entries that follow it
+            self.log.compact_through(index, term)
+            on_disk = self._wal.delete_through(index)
+        else:
+            # Discard the entire log, it either conflicts with or is older than the snapshot
+            self.log.reset(index, term)
+            on_disk = self._wal.reset(index + 1)
+        self.commit_index = max(self.commit_index, index)
+        self.last_applied = index
+        self._parsed_commands.clear()
+        await on_disk # If the old log can't be discarded, the WAL refuses appends from now on
+        logger.info(f"Node {self.name}: Installed snapshot through index {index} (term {term}, {count} keys). Log now ends at {self.log.last_index}")
+
+    def _restore_snapshot_file(self, metadata: SnapshotMetadata) -> int:
+        """Resets the state machine from the snapshot file (executor thread). Returns the number of keys."""
+        _, count, records = read_snapshot(self.snapshot_file_path)
+        self.state_machine.restore(records, metadata.last_applied)
+        return count
+
+    def _abort_snapshot_receiver(self):
+        if self._snapshot_receiver is not None:
+            self._snapshot_receiver.abort()
+            self._snapshot_receiver = None
+
+    async def handle_client_command(self, request: raft_pb2.ClientCommandRequest) -> raft_pb2.ClientCommandReply:
+            logger.debug(f"Node {self.name}: Handling Client Command (ID: {request.command_id})")
 
             # --- Try parsing command locally first for GET ---
             parsed_command = self._parse_command(request.command)
@@ -363,84 +743,432 @@ class RaftNode:
             if parsed_command:
                 operation, key, _ = parsed_command # Ignore value for now
 
-            # --- Handle GET directly (Linearizability Concern: Read from Leader's state) ---
+            # 1. Check if leader (followers may serve GETs that tolerate staleness)
+            follower_read = operation == "GET" and request.consistency != raft_pb2.LINEARIZABLE
+            if self.state != NodeState.LEADER and not follower_read:
+                leader_hint = self.peers_addresses.get(self.leader_id, "")
+                logger.info(f"Node {self.name}: Not leader, redirecting client to {leader_hint}")
+                return raft_pb2.ClientCommandReply(success=False, leader_hint=leader_hint, message="Not the leader")
+
+            # --- Handle GET from local state once it is fresh enough for the requested consistency ---
             if operation == "GET" and key is not None:
-                value = self.kv_store.get(key, None) # Read from local KV store
+                read_error = await self._prepare_read(request)
+                if read_error is not None:
+                    return read_error
+                value = self.state_machine.get(key) # Read from the local state machine
                 if value is not None:
-                    logger.info(f"Node {self.node_id}: Leader handled GET for key '{key}' (found)")
+                    logger.info(f"Node {self.name}: {self.state.name.capitalize()} handled GET for key '{key}' (found)")
                     return raft_pb2.ClientCommandReply(
                         success=True,
                         message="Key found",
                         value=value
                     )
                 else:
-                    logger.info(f"Node {self.node_id}: Leader handled GET for key '{key}' (not found)")
+                    logger.info(f"Node {self.name}: {self.state.name.capitalize()} handled GET for key '{key}' (not found)")
                     return raft_pb2.ClientCommandReply(success=False, message="Key not found")
             # --- END GET Handling ---
 
             # --- Handle PUT/DELETE (go through Raft log) ---
             elif operation == "PUT" or operation == "DELETE":
-                logger.info(f"Node {self.node_id}: Leader received {operation} command for key '{key}'. Appending to log.")
+                logger.info(f"Node {self.name}: Leader received {operation} command for key '{key}'. Appending to log.")
                 # Proceed with appending to log and waiting for commit...
-                log_entry = raft_pb2.LogEntry(
-                    term=self.current_term,
-                    command=request.command
-                )
-                self.log.append(log_entry)
-                log_index = len(self.log)
-                self._persist_log_entry(log_entry)
-                logger.info(f"Node {self.node_id}: Leader appended {operation} command to log at index {log_index}, term {self.current_term}")
-
-                commit_future = asyncio.Future()
-                async with self._commit_futures_lock:
-                    self._commit_futures[log_index] = commit_future
+                # Concurrent proposals are coalesced into one append + WAL write
+                term = self.current_term
+                log_index = await self._proposals.propose(request.command)
+                if log_index is None:
+                    leader_hint = self.peers_addresses.get(self.leader_id, "")
+                    logger.info(f"Node {self.name}: Lost leadership before appending {operation} command, redirecting client to {leader_hint}")
+                    return raft_pb2.ClientCommandReply(success=False, leader_hint=leader_hint, message="Not the leader")
+                logger.info(f"Node {self.name}: Leader appended {operation} command to log at index {log_index}, term {self.current_term}")
+                self._cache_parsed_command(log_index, term, parsed_command)
 
                 try:
-                    client_timeout_seconds = 10.0
-                    logger.debug(f"Node {self.node_id}: Leader waiting for commit of index {log_index}...")
-                    await asyncio.wait_for(commit_future, timeout=client_timeout_seconds)
+                    logger.debug(f"Node {self.name}: Leader waiting for commit of index {log_index}...")
+                    await self._wait_for_commit(log_index, CLIENT_COMMIT_TIMEOUT_S)
 
                     # Apply happens automatically now via _apply_log_entries triggered by commit index update
 
-                    logger.info(f"Node {self.node_id}: Leader confirmed commit of index {log_index}. Replying success to client.")
+                    logger.info(f"Node {self.name}: Leader confirmed commit of index {log_index}. Replying success to client.")
                     return raft_pb2.ClientCommandReply(success=True, message=f"{operation} command committed")
 
                 except asyncio.TimeoutError:
-                    logger.error(f"Node {self.node_id}: Timeout waiting for commit of log index {log_index} for client command {request.command_id}")
-                    async with self._commit_futures_lock:
-                        if log_index in self._commit_futures and not self._commit_futures[log_index].done():
-                            self._commit_futures[log_index].cancel("Client request timed out")
-                        self._commit_futures.pop(log_index, None)
+                    logger.error(f"Node {self.name}: Timeout waiting for commit of log index {log_index} for client command {request.command_id}")
                     return raft_pb2.ClientCommandReply(success=False, message="Timeout waiting for command commit")
                 except Exception as e:
-                    logger.error(f"Node {self.node_id}: Error processing client command {request.command_id} for index {log_index}: {e}", exc_info=True)
-                    async with self._commit_futures_lock:
-                        if log_index in self._commit_futures and not self._commit_futures[log_index].done():
-                            self._commit_futures[log_index].set_exception(e)
-                        self._commit_futures.pop(log_index, None)
+                    logger.error(f"Node {self.name}: Error processing client command {request.command_id} for index {log_index}: {e}", exc_info=True)
                     return raft_pb2.ClientCommandReply(success=False, message=f"Internal server error: {e}")
             else:
                 # Command was not parsable or not PUT/GET/DELETE
-                logger.error(f"Node {self.node_id}: Leader received invalid/unsupported client command: {request.command[:50]}...")
+                logger.error(f"Node {self.name}: Leader received invalid/unsupported client command: {request.command[:50]}...")
                 return raft_pb2.ClientCommandReply(success=False, message="Invalid or unsupported command")
 
+    async def handle_client_batch(self, request: raft_pb2.ClientBatchRequest) -> raft_pb2.ClientBatchReply:
+        """
+        Executes a batch of client commands. All PUT/DELETE commands are appended as one
+        contiguous run of log entries with a single WAL write, and the batch waits once
+        for the last of them to commit. GETs are answered after that wait, so they see
+        every write in the batch (a batch of only GETs goes through ReadIndex instead).
+        """
+        logger.debug(f"Node {self.name}: Handling Client Batch ({len(request.commands)} commands)")
+
+        if self.state != NodeState.LEADER:
+            leader_hint = self.peers_addresses.get(self.leader_id, "")
+            logger.info(f"Node {self.name}: Not leader, redirecting client batch to {leader_hint}")
+            return raft_pb2.ClientBatchReply(success=False, leader_hint=leader_hint, message="Not the leader")
+
+        results: List[Optional[raft_pb2.ClientCommandReply]] = [None] * len(request.commands)
+        writes: List[Tuple[int, str]] = [] # (position in batch, operation)
+        reads: List[Tuple[int, str]] = [] # (position in batch, key)
+        commands: List[bytes] = []
+        parsed_writes: List[Operation] = []
+        for position, command in enumerate(request.commands):
+            parsed_command = self._parse_command(command.command)
+            operation = parsed_command[0] if parsed_command else None
+            if operation == "PUT" or operation == "DELETE":
+                commands.append(command.command)
+                parsed_writes.append(parsed_command)
+                writes.append((position, operation))
+            elif operation == "GET":
+                reads.append((position, parsed_command[1]))
+            else:
+                results[position] = raft_pb2.ClientCommandReply(success=False, message="Invalid or unsupported command")
+
+        write_reply: Optional[raft_pb2.ClientCommandReply] = None
+        if commands:
+            last_index = self._append_client_entries(commands)
+            logger.info(f"Node {self.name}: Leader appended batch of {len(commands)} commands at indices {last_index - len(commands) + 1}-{last_index}, term {self.current_term}")
+            for log_index, parsed_command in enumerate(parsed_writes, last_index - len(commands) + 1):
+                self._cache_parsed_command(log_index, self.current_term, parsed_command)
+
+            try:
+                # Entries commit in order, so the last one committing covers the whole run
+                await self._wait_for_commit(last_index, CLIENT_COMMIT_TIMEOUT_S)
+            except asyncio.TimeoutError:
+                logger.error(f"Node {self.name}: Timeout waiting for commit of log index {last_index} for client batch")
+                write_reply = raft_pb2.ClientCommandReply(success=False, message="Timeout waiting for command commit")
+            except Exception as e:
+                logger.error(f"Node {self.name}: Error processing client batch ending at index {last_index}: {e}", exc_info=True)
+                write_reply = raft_pb2.ClientCommandReply(success=False, message=f"Internal server error: {e}")
+            for position, operation in writes:
+                results[position] = write_reply or raft_pb2.ClientCommandReply(success=True, message=f"{operation} command committed")
+
+        if reads and self.linearizable_reads and (not commands or write_reply is not None):
+            # Committing the batch's writes already proved we were leader after the reads arrived;
+            # without that, run the ReadIndex barrier.
+            read_error = await self._read_index()
+            if read_error is not None:
+                for position, _ in reads:
+                    results[position] = read_error
+                reads = []
+
+        for position, key in reads:
+            value = self.state_machine.get(key)
+            if value is not None:
+                results[position] = raft_pb2.ClientCommandReply(success=True, message="Key found", value=value)
+            else:
+                results[position] = raft_pb2.ClientCommandReply(success=False, message="Key not found")
+
+        return raft_pb2.ClientBatchReply(success=True, message=f"Executed {len(results)} commands", results=results)
+
+    def _append_client_entries(self, commands: List[bytes]) -> Optional[int]:
+        """
+        Appends client commands as a contiguous run of entries in the current term,
+        persists them with one WAL write and wakes the replicators once.
+        Returns the index of the last entry, or None if we are not the leader.
+        """
+        if self.state != NodeState.LEADER:
+            return None
+        term = self.current_term
+        records = [encode_entry(term, command) for command in commands]
+        for record in records:
+            last_index = self.log.append(term, record)
+        durable = self._persist_log_entries(records)
+        # The leader counts towards the majority once the entries are on its own disk
+        durable.add_done_callback(partial(self._on_leader_entries_durable, self.current_term, last_index))
+        self._notify_replicators() # Ship them now rather than on the next heartbeat
+        return last_index
+
+    def _cache_parsed_command(self, index: int, term: int, parsed_command: Operation):
+        """Remembers how the entry this leader appended at `index` in `term` decodes, for _apply_log_entries."""
+        # Still leader in that term: the entry at `index` is the one we appended
+        if self.state == NodeState.LEADER and term == self.current_term and index > self.last_applied:
+            self._parsed_commands[index] = (term, parsed_command)
+
+    # --- ReadIndex (linearizable reads without a log entry) ---
+
+    async def _prepare_read(self, request: raft_pb2.ClientCommandRequest) -> Optional[raft_pb2.ClientCommandReply]:
+        """Waits until the state machine may serve this GET at its consistency level. Returns None, or an error reply."""
+        if request.consistency == raft_pb2.ANY:
+            return None
+        if request.consistency == raft_pb2.BOUNDED_STALENESS:
+            max_lag_entries = request.max_lag_entries if request.HasField('max_lag_entries') else None
+            max_staleness_ms = request.max_staleness_ms if request.HasField('max_staleness_ms') else None
+            return await self._bounded_read(max_lag_entries, max_staleness_ms)
+        if self.linearizable_reads:
+            return await self._read_index()
+        return None
+
+    async def _bounded_read(self, max_lag_entries: Optional[int], max_staleness_ms: Optional[int]) -> Optional[raft_pb2.ClientCommandReply]:
+        """
+        BOUNDED_STALENESS reads. A follower serves them once it is at most `max_lag_entries`
+        behind the newest leader commit index it has heard of and was last caught up at most
+        `max_staleness_ms` ago, waiting for the next AppendEntries while it isn't. The leader's
+        commit index is only as recent as our last contact with it, so a lag bound also needs
+        that contact to be less than an election timeout old. With neither bound given, the
+        follower must have applied everything the leader had committed within the last
+        election timeout. The leader answers locally if a majority acknowledged it recently
+        enough, and goes through ReadIndex otherwise.
+        """
+        if max_lag_entries is None and max_staleness_ms is None:
+            max_lag_entries, max_staleness_ms = 0, ELECTION_TIMEOUT_MIN_MS
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + READ_INDEX_TIMEOUT_S
+        while True:
+            if self.state == NodeState.LEADER:
+                # Nobody else can have committed anything while a majority still follows us
+                acked_at = self._majority_ack_time()
+                limit_ms = max_staleness_ms if max_staleness_ms is not None else ELECTION_TIMEOUT_MIN_MS
+                if acked_at is not None and (loop.time() - acked_at) * 1000.0 <= limit_ms:
+                    return await self._wait_for_read_index(max(self.commit_index, self._term_start_index))
+                return await self._read_index()
+            if self._within_staleness_bound(max_lag_entries, max_staleness_ms):
+                return None
+
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                leader_hint = self.peers_addresses.get(self.leader_id, "")
+                logger.info(f"Node {self.name}: Too stale for bounded read (applied={self.last_applied}, leader commit={self._leader_commit}), redirecting client to {leader_hint}")
+                return raft_pb2.ClientCommandReply(success=False, leader_hint=leader_hint, message="Node too stale for the requested bound")
+            future = loop.create_future()
+            self._freshness_waiters.append(future)
+            try:
+                await asyncio.wait_for(future, timeout=remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    def _within_staleness_bound(self, max_lag_entries: Optional[int], max_staleness_ms: Optional[int]) -> bool:
+        if max_lag_entries is not None:
+            # A partitioned follower would otherwise measure its lag against a frozen commit index
+            if not self._heard_from_leader_recently():
+                return False
+            if self._leader_commit - self.last_applied > max_lag_entries:
+                return False
+        if max_staleness_ms is not None:
+            staleness_ms = (asyncio.get_running_loop().time() - self._caught_up_at) * 1000.0
+            if staleness_ms > max_staleness_ms:
+                return False
+        return True
+
+    def _note_leader_commit(self, leader_commit: int):
+        """Follower: records the leader's commit index from an AppendEntries and wakes bounded reads."""
+        self._leader_commit = max(self._leader_commit, leader_commit)
+        if self.last_applied >= leader_commit:
+            self._caught_up_at = asyncio.get_running_loop().time()
+        self._wake_freshness_waiters()
+
+    def _wake_freshness_waiters(self):
+        waiters = self._freshness_waiters
+        self._freshness_waiters = []
+        for future in waiters:
+            if not future.done():
+                future.set_result(None)
+
+    async def _wait_for_read_index(self, read_index: int) -> Optional[raft_pb2.ClientCommandReply]:
+        if not await self._wait_for_applied(read_index, READ_INDEX_TIMEOUT_S):
+            logger.error(f"Node {self.name}: Timeout waiting to apply read index {read_index} (last_applied={self.last_applied})")
+            return raft_pb2.ClientCommandReply(success=False, message="Timeout waiting for read index")
+        return None
+
+    async def _read_index(self) -> Optional[raft_pb2.ClientCommandReply]:
+        """
+        ReadIndex barrier (Raft thesis §6.4). Records the commit index, confirms we are
+        still leader with a heartbeat round acknowledged by a majority (skipped while we
+        hold a leader lease), and waits until the state machine has applied up to the
+        recorded index. Returns None once the state machine may be read, or an error reply for the client.
+        """
+        # Until this term's no-op commits we may not know the latest commit index
+        read_index = max(self.commit_index, self._term_start_index)
+        if not self._lease_valid() and not await self._confirm_leadership():
+            leader_hint = self.peers_addresses.get(self.leader_id, "") if self.leader_id != self.node_id else ""
+            logger.info(f"Node {self.name}: Could not confirm leadership for read, redirecting client to {leader_hint}")
+            return raft_pb2.ClientCommandReply(success=False, leader_hint=leader_hint, message="Not the leader")
+        return await self._wait_for_read_index(read_index)
+
+    async def _confirm_leadership(self) -> bool:
+        """
+        True once a majority has answered a heartbeat sent after this call started.
+        Every read that arrives before the next round is sent shares that round.
+        """
+        if self.state != NodeState.LEADER:
+            return False
+        if len(self.peers_addresses) // 2 + 1 <= 1:
+            return True # Single-node cluster, nobody else can be leader
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._read_waiters.append((self._read_round + 1, future))
+        # With a round already in flight, this read rides on the next one (started when it completes)
+        if self._read_round == self._confirmed_read_round:
+            self._schedule_read_round()
+        try:
+            return await asyncio.wait_for(future, timeout=READ_INDEX_TIMEOUT_S)
+        except asyncio.TimeoutError:
+            return False
+
+    def _schedule_read_round(self):
+        if not self._read_round_scheduled:
+            self._read_round_scheduled = True
+            asyncio.get_running_loop().call_soon(self._start_read_round)
+
+    def _lease_valid(self) -> bool:
+        """True if lease reads are on and a majority acked a heartbeat sent less than a lease ago."""
+        if not self.lease_reads or self.state != NodeState.LEADER:
+            return False
+        lease_s = (ELECTION_TIMEOUT_MIN_MS - self.lease_drift_bound_ms) / 1000.0
+        if lease_s <= 0:
+            return False # Clock rates too far apart to trust a lease
+        acked_at = self._majority_ack_time()
+        return acked_at is not None and asyncio.get_running_loop().time() < acked_at + lease_s
+
+    def _majority_ack_time(self) -> Optional[float]:
+        """Leader: latest send time of a request that a majority has acknowledged in this term."""
+        majority = (len(self.peers_addresses) // 2) + 1
+        if majority <= 1:
+            return asyncio.get_running_loop().time()
+        # Send times of the newest acked request per peer; we count as one vote
+        acked = sorted((r.acked_sent_at for r in self._replicators.values()), reverse=True)
+        if len(acked) < majority - 1 or acked[majority - 2] == 0.0:
+            return None
+        return acked[majority - 2]
+
+    def _heard_from_leader_recently(self) -> bool:
+        """True if we are the leader or heard from one within the minimum election timeout."""
+        if self.state == NodeState.LEADER:
+            return True
+        if self.state != NodeState.FOLLOWER or self.leader_id is None:
+            return False
+        elapsed = asyncio.get_running_loop().time() - self._last_leader_contact
+        return elapsed < ELECTION_TIMEOUT_MIN_MS / 1000.0
+
+    def _may_be_inside_a_lease(self) -> bool:
+        """
+        True while lease reads are on and we started less than the minimum election timeout
+        ago: before the restart we may have acked a leader whose lease is still running.
+        """
+        if not self.lease_reads:
+            return False
+        if self._started_at is None:
+            return True
+        return asyncio.get_running_loop().time() - self._started_at < ELECTION_TIMEOUT_MIN_MS / 1000.0
+
+    def _start_read_round(self):
+        """Starts a leadership-confirmation round: every replicator sends a heartbeat now."""
+        self._read_round_scheduled = False
+        if self.state != NodeState.LEADER:
+            self._resolve_read_waiters(False)
+            return
+        self._read_round += 1
+        for replicator in self._replicators.values():
+            replicator.request_heartbeat()
+
+    def _on_read_round_acked(self):
+        """Called by a replicator when a peer acknowledged a newer round; wakes confirmed reads."""
+        majority = (len(self.peers_addresses) // 2) + 1
+        acked = sorted((r.acked_read_round for r in self._replicators.values()), reverse=True)
+        if len(acked) < majority - 1:
+            return
+        # We count as one vote, so the (majority-1)-th best peer decides
+        confirmed_round = acked[majority - 2]
+        if confirmed_round <= self._confirmed_read_round:
+            return
+        self._confirmed_read_round = confirmed_round
+        still_waiting = []
+        for read_round, future in self._read_waiters:
+            if future.done():
+                continue
+            if read_round <= confirmed_round:
+                future.set_result(True)
+            else:
+                still_waiting.append((read_round, future))
+        self._read_waiters = still_waiting
+        if still_waiting:
+            self._schedule_read_round()
+
+    def _resolve_read_waiters(self, result: bool):
+        waiters = self._read_waiters
+        self._read_waiters = []
+        for _, future in waiters:
+            if not future.done():
+                future.set_result(result)
+
+    async def _wait_for_applied(self, index: int, timeout: float) -> bool:
+        """Waits until last_applied >= index. Returns False on timeout."""
+        if self.last_applied >= index:
+            return True
+        future = asyncio.get_running_loop().create_future()
+        self._apply_waiters.append((index, future))
+        try:
+            await asyncio.wait_for(future, timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def _notify_apply_waiters(self):
+        if not self._apply_waiters:
+            return
+        still_waiting = []
+        for index, future in self._apply_waiters:
+            if future.done():
+                continue
+            if index <= self.last_applied:
+                future.set_result(True)
+            else:
+                still_waiting.append((index, future))
+        self._apply_waiters = still_waiting
+
+    async def _wait_for_commit(self, log_index: int, timeout: float):
+        """
+        Waits until `log_index` is committed. Raises asyncio.TimeoutError after `timeout`
+        seconds; the pending commit future is cleaned up on any failure.
+        """
+        commit_future = asyncio.Future()
+        async with self._commit_futures_lock:
+            self._commit_futures[log_index] = commit_future
+            # A quorum of followers may already have committed it while we waited for the lock
+            if self.commit_index >= log_index and not commit_future.done():
+                self._commit_futures.pop(log_index, None)
+                commit_future.set_result(True)
+
+        try:
+            await asyncio.wait_for(commit_future, timeout=timeout)
+        except Exception:
+            async with self._commit_futures_lock:
+                if self._commit_futures.get(log_index) is commit_future:
+                    del self._commit_futures[log_index]
+            raise
+
     # --- State Transitions ---
 
     def _become_follower(self, term: int):
         """Transitions node to Follower state."""
         if self.state != NodeState.FOLLOWER or term > self.current_term:
-             logger.info(f"Node {self.node_id}: Transitioning to Follower state for term {term}")
+             logger.info(f"Node {self.name}: Transitioning to Follower state for term {term}")
         self.state = NodeState.FOLLOWER
+        if term > self.current_term:
+            # Only a new term clears the vote: a follower that hears from the leader of its
+            # current term must still refuse other candidates of that term
+            self.voted_for = None
         self.current_term = term
-        self.voted_for = None # Reset vote for the new term
         self.leader_id = None # Reset leader hint
-        self._cancel_heartbeat_timer() # Followers don't send heartbeats
+        self._stop_replicators() # Followers don't replicate
+        self._proposals.fail_pending() # ...or accept proposals
+        self._resolve_read_waiters(False) # ...or serve ReadIndex reads
+        self._cancel_snapshot_transfers() # ...or snapshots
         self._reset_election_timer() # Start election timer
 
     def _become_candidate(self):
         """Transitions node to Candidate state and starts election."""
         if self.state == NodeState.LEADER:
-            logger.warn(f"Node {self.node_id}: Leader attempting to become candidate? Ignoring.")
+            logger.warn(f"Node {self.name}: Leader attempting to become candidate? Ignoring.")
             return
 
         self.current_term += 1
@@ -450,60 +1178,62 @@ class RaftNode:
         self.leader_id = None
 
         # --- PERSIST STATE CHANGE ---
-        self._persist_state()
+        state_durable = self._persist_state()
 
-        logger.info(f"Node {self.node_id}: Transitioning to Candidate state for term {self.current_term}. Voted for self.")
+        logger.info(f"Node {self.name}: Transitioning to Candidate state for term {self.current_term}. Voted for self.")
 
         self._reset_election_timer() # Reset timer to start election period
-        self._cancel_heartbeat_timer()
+        self._stop_replicators()
 
         # --- Start Election --- Implementation needed
         # Send RequestVote RPCs to all other peers concurrently
-        asyncio.create_task(self._start_election())
+        asyncio.create_task(self._start_election(self.current_term, state_durable))
 
     def _become_leader(self):
             """Transitions node to Leader state."""
             if self.state != NodeState.CANDIDATE:
-                logger.error(f"Node {self.node_id}: Invalid transition to Leader from {self.state}. Ignoring.")
+                logger.error(f"Node {self.name}: Invalid transition to Leader from {self.state}. Ignoring.")
                 return
 
-            logger.info(f"Node {self.node_id}: Transitioning to Leader state for term {self.current_term}")
+            logger.info(f"Node {self.name}: Transitioning to Leader state for term {self.current_term}")
             self.state = NodeState.LEADER
             self.leader_id = self.node_id # I am the leader
             self._cancel_election_timer() # Leaders don't need election timers
 
             # Initialize leader-specific state
-            last_log_idx = len(self.log)
+            last_log_idx = self.log.last_index
             self.next_index = {peer_id: last_log_idx + 1 for peer_id in self.peers_addresses} # Initialize for ALL peers (including self for consistency)
             self.match_index = {peer_id: 0 for peer_id in self.peers_addresses} # Initialize for ALL peers
+            self._confirmed_read_round = self._read_round # New replicators start with no acked rounds
+            self._wake_freshness_waiters() # Bounded reads waiting as a follower are ours to answer now
 
             # --- Add No-Op Entry for Current Term ---
-            logger.info(f"Node {self.node_id}: Leader adding initial no-op entry for term {self.current_term}")
-            no_op_entry = raft_pb2.LogEntry(term=self.current_term, command=b'NOOP') # Use a special command string or empty bytes
-            self.log.append(no_op_entry)
-            self._persist_log_entry(no_op_entry)
-            # Leader immediately matches its own new entry
-            self.match_index[self.node_id] = len(self.log)
-            self.next_index[self.node_id] = len(self.log) + 1
-            logger.debug(f"Node {self.node_id}: Appended NOOP entry at index {len(self.log)}, term {self.current_term}")
+            logger.info(f"Node {self.name}: Leader adding initial no-op entry for term {self.current_term}")
+            no_op_record = encode_entry(self.current_term, b'NOOP') # Use a special command string or empty bytes
+            no_op_index = self.log.append(self.current_term, no_op_record)
+            self._term_start_index = no_op_index # Reads must wait for this to commit
+            durable = self._persist_log_entries([no_op_record])
+            # Leader matches its own log up to the no-op once the group commit has fsynced it
+            # (the WAL flushes in order, so every earlier entry is durable by then)
+            durable.add_done_callback(partial(self._on_leader_entries_durable, self.current_term, no_op_index))
+            self.next_index[self.node_id] = no_op_index + 1
+            logger.debug(f"Node {self.name}: Appended NOOP entry at index {no_op_index}, term {self.current_term}")
             # --- End No-Op ---
 
-            # Start sending heartbeats immediately (which will now include the no-op)
-            self._start_heartbeat_timer() # This will trigger _send_append_entries_to_all
-
-            # Optional: Trigger an immediate replication cycle instead of waiting for the timer
-            # asyncio.create_task(self._send_append_entries_to_all())
+            # Start replicating immediately (the first round carries the no-op)
+            self._start_replicators()
 
 
     # --- Election Logic ---
 
-    async def _start_election(self):
-        """Sends RequestVote RPCs to peers."""
-        if self.state != NodeState.CANDIDATE:
+    async def _start_election(self, term: int, state_durable: asyncio.Future):
+        """Sends RequestVote RPCs to peers once our new term and self-vote are durable."""
+        await state_durable
+        if self.state != NodeState.CANDIDATE or self.current_term != term:
             return
 
         majority = (len(self.peers_addresses) // 2) + 1
-        logger.info(f"Node {self.node_id}: Starting election for term {self.current_term}. Need {majority} votes.")
+        logger.info(f"Node {self.name}: Starting election for term {self.current_term}. Need {majority} votes.")
 
         # Get actual last log index/term
         last_log_index, last_log_term = self._get_last_log_info()
@@ -512,11 +1242,16 @@ class RaftNode:
             term=self.current_term,
             candidate_id=self.node_id,
             last_log_index=last_log_index,
-            last_log_term=last_log_term
+            last_log_term=last_log_term,
+            group_id=self.group_id
         )
 
         # Reset votes received for this election attempt
         self._votes_received = {self.node_id} # Automatically count self-vote
+        if len(self._votes_received) >= majority:
+            # A single-node cluster: our own vote is the majority
+            self._become_leader()
+            return
 
         # Create tasks to send RPCs concurrently
         vote_tasks = []
@@ -540,7 +1275,7 @@ class RaftNode:
                 peer_id, reply = result # Unpack the result
 
                 if reply.term > self.current_term:
-                    logger.info(f"Node {self.node_id}: Discovered higher term {reply.term} from vote reply from {peer_id}. Stepping down.")
+                    logger.info(f"Node {self.name}: Discovered higher term {reply.term} from vote reply from {peer_id}. Stepping down.")
                     self._become_follower(reply.term)
                     self._persist_state()
                     # Cancel remaining vote tasks (optional but cleaner)
@@ -549,11 +1284,11 @@ class RaftNode:
                     return # Stop election processing
 
                 if reply.vote_granted:
-                    logger.debug(f"Node {self.node_id}: Vote granted by peer {peer_id} for term {self.current_term}")
+                    logger.debug(f"Node {self.name}: Vote granted by peer {peer_id} for term {self.current_term}")
                     self._votes_received.add(peer_id) # Add the ID of the granting peer
                     # Check if majority reached
                     if len(self._votes_received) >= majority:
-                        logger.info(f"Node {self.node_id}: Received majority votes ({len(self._votes_received)}/{majority}). Becoming Leader.")
+                        logger.info(f"Node {self.name}: Received majority votes ({len(self._votes_received)}/{majority}). Becoming Leader.")
                         self._become_leader()
                         # Cancel remaining vote tasks (optional but cleaner)
                         for p_task in pending_tasks:
@@ -562,7 +1297,7 @@ class RaftNode:
 
         # If loop finishes and still candidate, election failed or was superseded
         if self.state == NodeState.CANDIDATE and args.term == self.current_term:
-             logger.info(f"Node {self.node_id}: Election finished for term {self.current_term}, did not receive majority or state changed. Votes: {len(self._votes_received)}/{majority}")
+             logger.info(f"Node {self.name}: Election finished for term {self.current_term}, did not receive majority or state changed. Votes: {len(self._votes_received)}/{majority}")
         # Cleanup any remaining pending tasks if loop exited early
         for p_task in pending_tasks:
             p_task.cancel()
@@ -573,21 +1308,21 @@ class RaftNode:
             stub = await self._get_peer_stub(peer_id, peer_addr)
             if stub:
                  request_timeout = (ELECTION_TIMEOUT_MIN_MS / 1000.0) * 0.8
-                 logger.debug(f"Node {self.node_id}: Sending RequestVote term {args.term} to {peer_id} with timeout {request_timeout:.2f}s")
+                 logger.debug(f"Node {self.name}: Sending RequestVote term {args.term} to {peer_id} with timeout {request_timeout:.2f}s")
                  reply = await stub.RequestVote(args, timeout=request_timeout)
-                 logger.debug(f"Node {self.node_id}: Received RequestVote reply from {peer_id}: term={reply.term}, granted={reply.vote_granted}")
+                 logger.debug(f"Node {self.name}: Received RequestVote reply from {peer_id}: term={reply.term}, granted={reply.vote_granted}")
                  return (peer_id, reply) # Return tuple with peer_id
             else:
-                 logger.warning(f"Node {self.node_id}: Could not get stub for peer {peer_id}")
+                 logger.warning(f"Node {self.name}: Could not get stub for peer {peer_id}")
                  return None
         except grpc.aio.AioRpcError as e:
-             logger.warning(f"Node {self.node_id}: RPC error sending RequestVote to {peer_id} ({peer_addr}): {e.code()} - {e.details()}")
+             logger.warning(f"Node {self.name}: RPC error sending RequestVote to {peer_id} ({peer_addr}): {e.code()} - {e.details()}")
              return None
         except asyncio.TimeoutError: # Catch asyncio timeout specifically if grpc doesn't map it
-             logger.warning(f"Node {self.node_id}: RPC timeout sending RequestVote to {peer_id} ({peer_addr})")
+             logger.warning(f"Node {self.name}: RPC timeout sending RequestVote to {peer_id} ({peer_addr})")
              return None
         except Exception as e:
-            logger.error(f"Node {self.node_id}: Unexpected error sending RequestVote to {peer_id}: {e}", exc_info=True)
+            logger.error(f"Node {self.name}: Unexpected error sending RequestVote to {peer_id}: {e}", exc_info=True)
             return None
 
 
@@ -597,6 +1332,7 @@ class RaftNode:
         """Resets the election timer to a new random interval."""
         self._cancel_election_timer() # Cancel any existing timer
         timeout = random.uniform(ELECTION_TIMEOUT_MIN_MS / 1000.0, ELECTION_TIMEOUT_MAX_MS / 1000.0)
+        timeout += self.election_timeout_offset_ms / 1000.0
 
         # Get the currently running loop HERE
         loop = asyncio.get_running_loop()
@@ -604,7 +1340,7 @@ class RaftNode:
         # Note: self._election_timeout doesn't need to be async,
         # call_later just schedules it to run in the loop context.
 
-        logger.debug(f"Node {self.node_id}: Election timer reset to {timeout:.3f} seconds.")
+        logger.debug(f"Node {self.name}: Election timer reset to {timeout:.3f} seconds.")
 
     #helper function - out of place.
     async def _notify_commit_futures(self, committed_up_to_index: int):
@@ -616,121 +1352,125 @@ class RaftNode:
                 if index <= committed_up_to_index:
                     future = self._commit_futures.pop(index, None) # Remove and get future
                     if future and not future.done():
-                        logger.debug(f"Node {self.node_id}: Notifying future for committed index {index}")
+                        logger.debug(f"Node {self.name}: Notifying future for committed index {index}")
                         future.set_result(True) # Signal success
                     elif future and future.done():
                         # Already done (e.g., timed out/cancelled), log maybe?
-                        logger.debug(f"Node {self.node_id}: Future for committed index {index} was already done.")
+                        logger.debug(f"Node {self.name}: Future for committed index {index} was already done.")
 
-    def _parse_command(self, command_bytes: bytes) -> Optional[Tuple[str, str, bytes]]:
+    def _parse_command(self, command_bytes: bytes) -> Optional[Operation]:
             """
-            Parses the command bytes from a log entry.
-            Format: OPERATION\nKEY\nVALUE (value is empty for GET/DEL)
-            Returns (operation, key, value) or None if invalid.
-            Value is only present for PUT.
+            Parses the command bytes from a client request or log entry, in the binary
+            format of distributed_fs.commands or the older OPERATION\nKEY\nVALUE text.
+            Returns (operation, key, value) or None if invalid. Value is only present for PUT.
             """
-            # Use the same separator as the client
-            COMMAND_SEPARATOR = b'\n' # Define here or import if shared
-
             try:
-                # Split based on newline separator
-                parts = command_bytes.split(COMMAND_SEPARATOR, 2) # <<<--- CHANGE HERE
-                operation = parts[0].decode('utf-8').upper()
-
-                if operation == "PUT" and len(parts) == 3:
-                    key = parts[1].decode('utf-8')
-                    # Ensure key doesn't contain separator itself (already checked client-side, but good practice)
-                    if COMMAND_SEPARATOR in parts[1]:
-                        logger.warning(f"Node {self.node_id}: Separator found in key during parsing: {parts[1][:50]}...")
-                        return None
-                    value = parts[2] # Keep value as bytes
-                    return operation, key, value
-                elif (operation == "GET" or operation == "DELETE") and len(parts) >= 2: # Allow parts=3 if extra newline was sent?
-                    # Check length >= 2, allow for potential trailing newline on key?
-                    key = parts[1].decode('utf-8')
-                    if COMMAND_SEPARATOR in parts[1]:
-                        logger.warning(f"Node {self.node_id}: Separator found in key during parsing: {parts[1][:50]}...")
-                        return None
-                    return operation, key, b'' # Return empty bytes for value
-                else:
-                    logger.warning(f"Node {self.node_id}: Could not parse command - incorrect parts for op '{operation}': {len(parts)} parts found. Command bytes: {command_bytes[:100]}...") # Log more bytes
-                    return None
-            except Exception as e:
-                logger.error(f"Node {self.node_id}: Error parsing command '{command_bytes[:100]}...': {e}", exc_info=True)
+                return decode_command(command_bytes)
+            except ValueError as e:
+                logger.warning(f"Node {self.name}: Could not parse command ({e}). Command bytes: {command_bytes[:100]}...")
                 return None
 
     def _apply_log_entries(self):
-            """Applies committed log entries to the state machine (KV store)."""
-            # Apply entries from last_applied + 1 up to commit_index
-            # Important: Do this carefully, ensure indices are handled correctly (0-based vs 1-based)
-
-            # Loop while the last applied index (0-based) is less than the committed index (1-based)
-            while self.last_applied < self.commit_index:
-                apply_idx_0based = self.last_applied # 0-based index to apply
-
-                # Safety check: Ensure the entry exists in the log
-                if apply_idx_0based >= len(self.log):
-                    # This should ideally not happen if commit_index logic is correct
-                    logger.error(f"Node {self.node_id}: Cannot apply index {apply_idx_0based + 1}, log length is {len(self.log)}. Stopping application.")
-                    break # Stop processing if we try to apply beyond the log end
-
-                entry_to_apply = self.log[apply_idx_0based]
-                command_bytes = entry_to_apply.command
-                log_index = apply_idx_0based + 1 # 1-based log index for logging
-
-                # --- Handle NOOP entries first ---
-                if command_bytes == b'NOOP':
-                    # Log the application of the NOOP entry
-                    logger.info(f"Node {self.node_id}: Applying NOOP log index {log_index} (term {entry_to_apply.term})")
-                    # No state change is needed for a NOOP entry
-
-                # --- Handle regular client commands ---
-                else:
-                    # Log that we are applying a regular command
-                    logger.info(f"Node {self.node_id}: Applying log index {log_index} (term {entry_to_apply.term}) to state machine.")
+        """
+        Applies committed log entries to the state machine in the background, unless that is
+        already running (it picks up entries committed meanwhile).
+        """
+        if self._apply_task is None or self._apply_task.done():
+            self._apply_task = asyncio.ensure_future(self._apply_committed_entries())
+
+    async def _apply_committed_entries(self):
+        """
+        Applies everything up to commit_index, one batch per round. State machine writes (SQLite
+        transactions and commits) run on an executor thread so heartbeats and replication aren't
+        held up; batches are applied one at a time and never while a snapshot is being restored.
+        """
+        loop = asyncio.get_running_loop()
+        while self.last_applied < self.commit_index and not self._installing_snapshot:
+            applied, operations = self._collect_committed_operations()
+            if applied == self.last_applied:
+                return # Nothing could be applied (error logged)
+            if operations:
+                try:
+                    await loop.run_in_executor(None, self.state_machine.apply_batch, applied, operations)
+                except Exception as e:
+                    # Nothing of the batch is applied; the next call retries from last_applied
+                    logger.error(f"Node {self.name}: State machine failed to apply entries {self.last_applied + 1}-{applied}: {e}", exc_info=True)
+                    return
+            self.last_applied = applied
+            logger.debug(f"Node {self.name}: Finished applying entries loop. lastApplied index reached = {self.last_applied} (commit_index = {self.commit_index})")
+
+            self._notify_apply_waiters() # Reads waiting for this state can proceed
+            if self.last_applied >= self._leader_commit:
+                self._caught_up_at = loop.time()
+            self._wake_freshness_waiters()
+
+            # A volatile state machine is persisted only by periodic snapshots, which
+            # also let us discard the log prefix they cover.
+            self._maybe_take_snapshot()
+
+    def _collect_committed_operations(self) -> Tuple[int, List[Operation]]:
+        """
+        Decodes the committed entries after last_applied. Returns the last index handled and
+        the state changes of those entries, in log order.
+        """
+        # Apply entries from last_applied + 1 up to commit_index
+        # Important: Do this carefully, ensure indices are handled correctly (0-based vs 1-based)
+        applied = self.last_applied # Last index handled by the loop below
+        operations: List[Operation] = [] # State changes of the entries handled, in log order
+
+        # Loop while the last applied index (0-based) is less than the committed index (1-based)
+        while applied < self.commit_index:
+            apply_idx_0based = applied # 0-based index to apply
+
+            # Safety check: Ensure the entry exists in the log
+            if apply_idx_0based >= self.log.last_index:
+                # This should ideally not happen if commit_index logic is correct
+                logger.error(f"Node {self.name}: Cannot apply index {apply_idx_0based + 1}, last log index is {self.log.last_index}. Stopping application.")
+                break # Stop processing if we try to apply beyond the log end
+
+            entry_to_apply = self.log.entry_at(apply_idx_0based + 1)
+            command_bytes = entry_to_apply.command
+            log_index = apply_idx_0based + 1 # 1-based log index for logging
+
+            # --- Handle NOOP entries first ---
+            if command_bytes == b'NOOP':
+                # Log the application of the NOOP entry
+                logger.info(f"Node {self.name}: Applying NOOP log index {log_index} (term {entry_to_apply.term})")
+                # No state change is needed for a NOOP entry
+
+            # --- Handle regular client commands ---
+            else:
+                # Log that we are applying a regular command
+                logger.info(f"Node {self.name}: Applying log index {log_index} (term {entry_to_apply.term}) to state machine.")
 
-                    # Parse the command bytes
+                # Parse the command bytes, unless we did when the client sent them
+                cached = self._parsed_commands.pop(log_index, None)
+                if cached is not None and cached[0] == entry_to_apply.term:
+                    parsed_command = cached[1]
+                else:
                     parsed_command = self._parse_command(command_bytes)
 
-                    if parsed_command:
-                        operation, key, value = parsed_command
-                        if operation == "PUT":
-                            self.kv_store[key] = value
-                            logger.debug(f"Node {self.node_id}: Applied PUT key='{key}' (value size={len(value)})")
-                        elif operation == "DELETE":
-                            # Use pop with default None to avoid KeyError if key doesn't exist
-                            old_value = self.kv_store.pop(key, None)
-                            if old_value is not None:
-                                logger.debug(f"Node {self.node_id}: Applied DELETE key='{key}' (existed)")
-                            else:
-                                logger.debug(f"Node {self.node_id}: Applied DELETE key='{key}' (did not exist)")
-                        elif operation == "GET":
-                            # GET operations don't modify state, applying them is a no-op here.
-                            # They are handled directly by client requests checking the state machine later.
-                            # Log for completeness.
-                            logger.debug(f"Node {self.node_id}: Applying GET key='{key}' (no state change during apply phase)")
-                        else:
-                            # Should not happen if parsing logic covers all valid command types from format_command
-                            logger.warning(f"Node {self.node_id}: Unknown operation '{operation}' encountered during apply for index {log_index}")
+                if parsed_command:
+                    operation, key, value = parsed_command
+                    if operation == "PUT" or operation == "DELETE":
+                        operations.append(parsed_command)
+                        logger.debug(f"Node {self.name}: Applying {operation} key='{key}' (value size={len(value)})")
+                    elif operation == "GET":
+                        # GET operations don't modify state, applying them is a no-op here.
+                        # They are handled directly by client requests checking the state machine later.
+                        # Log for completeness.
+                        logger.debug(f"Node {self.name}: Applying GET key='{key}' (no state change during apply phase)")
                     else:
-                        # Log an error if parsing failed for a non-NOOP command
-                        logger.error(f"Node {self.node_id}: Failed to parse command for applying log index {log_index}. Skipping application for this entry. Command bytes: {command_bytes[:100]}...")
-
-                # --- Successfully applied entry (or handled NOOP/error), advance last_applied ---
-                self.last_applied += 1
-
-            # Optional: Log after the loop finishes if any entries were applied
-            if self.last_applied > 0: # Check if any entries have ever been applied
-                # Can compare with initial value if needed, but this simple check is fine
-                logger.debug(f"Node {self.node_id}: Finished applying entries loop. lastApplied index reached = {self.last_applied} (commit_index = {self.commit_index})")
-
-            # TODO: Persist last_applied? If the node crashes, it needs to know
-            #       where it left off applying. For simplicity, we are not persisting
-            #       last_applied or the kv_store itself in this version.
-            #       A real system would need to persist the kv_store or snapshot it,
-            #       and persist last_applied.
+                        # Should not happen if parsing logic covers all valid command types from format_command
+                        logger.warning(f"Node {self.name}: Unknown operation '{operation}' encountered during apply for index {log_index}")
+                else:
+                    # Log an error if parsing failed for a non-NOOP command
+                    logger.error(f"Node {self.name}: Failed to parse command for applying log index {log_index}. Skipping application for this entry. Command bytes: {command_bytes[:100]}...")
 
+            # --- Entry handled (NOOP/error included), move on to the next one ---
+            applied += 1
 
+        return applied, operations
 
     def _cancel_election_timer(self):
         """Cancels the election timer if it's running."""
@@ -741,149 +1481,69 @@ class RaftNode:
     def _election_timeout(self):
         """Callback function when the election timer expires."""
         if self.state == NodeState.FOLLOWER or self.state == NodeState.CANDIDATE:
-            logger.info(f"Node {self.node_id}: Election timeout reached in state {self.state}. Starting election.")
+            logger.info(f"Node {self.name}: Election timeout reached in state {self.state}. Starting election.")
             self._become_candidate()
         else: # Leader state
-            logger.debug(f"Node {self.node_id}: Election timeout callback triggered in Leader state (should be cancelled). Ignoring.")
+            logger.debug(f"Node {self.name}: Election timeout callback triggered in Leader state (should be cancelled). Ignoring.")
             # This might happen due to race conditions if timer fired just as node became leader
 
-    def _start_heartbeat_timer(self):
-        """Starts the periodic heartbeat task for Leaders."""
-        self._cancel_heartbeat_timer() # Ensure only one runs
-        if self.state == NodeState.LEADER:
-            logger.info(f"Node {self.node_id}: Starting heartbeat timer (interval: {HEARTBEAT_INTERVAL_MS}ms)")
-            self._heartbeat_timer = asyncio.create_task(self._send_heartbeats_periodically())
+    def _start_replicators(self):
+        """Starts one replicator task per peer for the current leadership term."""
+        self._stop_replicators() # Ensure only one set runs
+        if self.state != NodeState.LEADER:
+            logger.warning(f"Node {self.name}: Tried to start replicators when not Leader.")
+            return
+        logger.info(f"Node {self.name}: Starting replicators (heartbeat interval: {'adaptive' if self.adaptive_heartbeat else f'{HEARTBEAT_INTERVAL_MS}ms'})")
+        for peer_id, peer_addr in self.peers_addresses.items():
+            if peer_id == self.node_id:
+                continue
+            replicator = PeerReplicator(self, peer_id, peer_addr, HEARTBEAT_INTERVAL_MS)
+            self._replicators[peer_id] = replicator
+            replicator.start()
+
+    def _stop_replicators(self):
+        """Stops the replicator tasks if they are running."""
+        if self._replicators:
+            logger.debug(f"Node {self.name}: Stopping replicators.")
+        for replicator in self._replicators.values():
+            replicator.stop()
+        self._replicators = {}
+
+    def _notify_replicators(self):
+        """Wakes every replicator so newly appended entries go out without waiting for a heartbeat."""
+        for replicator in self._replicators.values():
+            replicator.notify()
+
+    def _next_index_after_reject(self, peer_id: int, args: raft_pb2.AppendEntriesArgs, reply: raft_pb2.AppendEntriesReply) -> int:
+        """
+        Picks the next index to try after a follower rejected `args` (§5.3 fast backup).
+        - Follower log too short: resume right after its last entry.
+        - Term conflict we also have: resume after our last entry of that term.
+        - Term conflict we don't have: skip the follower's whole conflicting term.
+        Falls back to a single step back for replies without hints.
+        """
+        if reply.conflict_index > 0:
+            new_next = reply.conflict_index
+            if reply.conflict_term > 0:
+                last_of_term = self.log.last_index_of_term(reply.conflict_term)
+                if last_of_term > 0:
+                    new_next = last_of_term + 1
         else:
-             logger.warning(f"Node {self.node_id}: Tried to start heartbeat timer when not Leader.")
-
-
-    def _cancel_heartbeat_timer(self):
-        """Cancels the heartbeat task if it's running."""
-        if self._heartbeat_timer and not self._heartbeat_timer.done():
-            self._heartbeat_timer.cancel()
-            logger.debug(f"Node {self.node_id}: Heartbeat timer cancelled.")
-        self._heartbeat_timer = None
-
-    async def _send_heartbeats_periodically(self):
-        """Task that periodically sends AppendEntries (heartbeats)."""
-        while self.state == NodeState.LEADER:
-            try:
-                logger.debug(f"Node {self.node_id}: Sending heartbeats for term {self.current_term}")
-                # --- Send AppendEntries (empty) to all peers --- Implementation needed
-                # Use asyncio.gather to send concurrently
-                # Process replies: if term > currentTerm, step down
-                await self._send_append_entries_to_all() # TODO: Create this helper method
-
-                # Wait for the next interval
-                await asyncio.sleep(HEARTBEAT_INTERVAL_MS / 1000.0)
-            except asyncio.CancelledError:
-                logger.info(f"Node {self.node_id}: Heartbeat task cancelled.")
-                break # Exit loop if task is cancelled
-            except Exception as e:
-                logger.error(f"Node {self.node_id}: Error in heartbeat loop: {e}", exc_info=True)
-                # Avoid busy-looping on error, wait a bit before retrying
-                await asyncio.sleep(1)
-
-    async def _send_append_entries_to_all(self):
-            """Sends AppendEntries (potentially with log entries) to all peers."""
-            if self.state != NodeState.LEADER:
-                logger.debug(f"Node {self.node_id}: Not leader, skipping AppendEntries")
-                return
-
-            # Track the term we started with to detect term changes
-            start_term = self.current_term
-            tasks = []
-
-            # Prepare requests for all peers
-            for peer_id, peer_addr in self.peers_addresses.items():
-                if peer_id == self.node_id:
-                    continue
-
-                # Get log state for this peer with bounds checking
-                next_idx = min(self.next_index.get(peer_id, 1), len(self.log) + 1)
-                prev_log_index = next_idx - 1
-                prev_log_term = 0
-
-                if prev_log_index > 0 and prev_log_index <= len(self.log):
-                    prev_log_term = self.log[prev_log_index - 1].term
-
-                # Determine entries to send with batch size limit
-                MAX_ENTRIES_PER_BATCH = 100  # Configurable
-                entries_to_send = self.log[next_idx - 1:next_idx - 1 + MAX_ENTRIES_PER_BATCH]
-
-                logger.debug(f"Node {self.node_id}: Preparing AppendEntries for {peer_id}: "
-                           f"nextIndex={next_idx}, prevLogIndex={prev_log_index}, "
-                           f"prevLogTerm={prev_log_term}, numEntries={len(entries_to_send)}")
-
-                args = raft_pb2.AppendEntriesArgs(
-                    term=self.current_term,
-                    leader_id=self.node_id,
-                    prev_log_index=prev_log_index,
-                    prev_log_term=prev_log_term,
-                    entries=entries_to_send,
-                    leader_commit=self.commit_index
-                )
-                tasks.append(asyncio.create_task(self._send_single_append_entries(peer_id, peer_addr, args)))
-
-            # Process results as they arrive instead of waiting for all
-            pending = tasks
-            while pending and self.state == NodeState.LEADER and self.current_term == start_term:
-                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
-
-                for task in done:
-                    try:
-                        result = task.result()
-                        if not result:
-                            continue
-
-                        peer_id, reply, request_args = result
-
-                        # Check if we're still leader and in the same term
-                        if self.state != NodeState.LEADER or self.current_term != start_term:
-                            logger.info(f"Node {self.node_id}: No longer leader or term changed, stopping AppendEntries processing")
-                            return
-
-                        if reply.term > self.current_term:
-                            logger.info(f"Node {self.node_id}: Discovered higher term {reply.term} from {peer_id}, stepping down")
-                            self._become_follower(reply.term)
-                            self._persist_state()
-                            return
+            new_next = args.prev_log_index
+        # Never move past the probe that was rejected, nor below what is known to match
+        new_next = min(new_next, args.prev_log_index)
+        return max(1, self.match_index.get(peer_id, 0) + 1, new_next)
+
+    def _on_leader_entries_durable(self, term: int, last_index: int, durable: asyncio.Future):
+        """Done-callback for the leader's own WAL writes: advance match_index[self] and try to commit."""
+        if durable.cancelled() or durable.exception() is not None:
+            return
+        if self.state != NodeState.LEADER or self.current_term != term:
+            return
+        if last_index > self.match_index.get(self.node_id, 0):
+            self.match_index[self.node_id] = last_index
+            asyncio.ensure_future(self._update_commit_index())
 
-                        # Process successful responses
-                        if reply.success:
-                            new_match_index = request_args.prev_log_index + len(request_args.entries)
-                            new_next_index = new_match_index + 1
-
-                            # Update indices atomically
-                            self.match_index[peer_id] = max(self.match_index.get(peer_id, 0), new_match_index)
-                            self.next_index[peer_id] = max(self.next_index.get(peer_id, 1), new_next_index)
-
-                            logger.debug(f"Node {self.node_id}: Updated indices for {peer_id}: "
-                                       f"match_index={self.match_index[peer_id]}, "
-                                       f"next_index={self.next_index[peer_id]}")
-                        else:
-                            # On failure, decrease next_index but ensure it doesn't go below 1
-                            # Also implement fast backup using conflict index if provided
-                            current_next = self.next_index.get(peer_id, 1)
-                            new_next = max(1, current_next - 1)
-                            self.next_index[peer_id] = new_next
-                            logger.debug(f"Node {self.node_id}: Decreased next_index for {peer_id} to {new_next}")
-
-                    except Exception as e:
-                        logger.error(f"Node {self.node_id}: Error processing AppendEntries result: {e}", exc_info=True)
-
-                # Update commit index if we're still leader
-                if self.state == NodeState.LEADER and self.current_term == start_term:
-                    await self._update_commit_index()
-
-            # Clean up any remaining tasks if we exited the loop early
-            for task in pending:
-                task.cancel()
-                self.commit_index = N
-                logger.info(f"Node {self.node_id}: Leader updated commitIndex from {initial_commit_index_before_update} to {self.commit_index} based on majority match ({match_count}/{majority})")
-                # Trigger commit notification for waiting clients
-                asyncio.create_task(self._notify_commit_futures(self.commit_index))
-                # Trigger state machine application
     async def _update_commit_index(self):
         """Helper method to update the leader's commit index based on match_index values."""
         if self.state != NodeState.LEADER:
@@ -899,35 +1559,51 @@ class RaftNode:
         # Only update if the potential commit index is greater than current
         if potential_commit > self.commit_index:
             # Verify the entry at potential_commit is from current term
-            if potential_commit <= len(self.log) and self.log[potential_commit - 1].term == self.current_term:
+            if potential_commit <= self.log.last_index and self.log.term_at(potential_commit) == self.current_term:
                 old_commit = self.commit_index
                 self.commit_index = potential_commit
-                logger.info(f"Node {self.node_id}: Advanced commit index {old_commit} -> {self.commit_index}")
+                logger.info(f"Node {self.name}: Advanced commit index {old_commit} -> {self.commit_index}")
 
                 # Notify clients and apply entries
                 await self._notify_commit_futures(self.commit_index)
                 self._apply_log_entries()
 
+    def _link(self, peer_id: int) -> LinkEstimator:
+        link = self._links.get(peer_id)
+        if link is None:
+            link = self._links[peer_id] = LinkEstimator()
+        return link
+
+    def _append_entries_timeout(self, peer_id: int, args: raft_pb2.AppendEntriesArgs) -> float:
+        """How long to wait for an AppendEntries reply from `peer_id`, from the measured RTT and throughput."""
+        # ByteSize() is computed natively, no need to serialize every entry just to measure it
+        entries_size = args.ByteSize()
+        ceiling = ELECTION_TIMEOUT_MIN_MS / 1000.0 * 0.8 # Never exceed 80% of min election timeout
+        timeout = self._link(peer_id).deadline(entries_size, APPEND_ENTRIES_TIMEOUT_MIN_MS / 1000.0, ceiling)
+        if timeout is not None:
+            return timeout
+        # Nothing measured yet: scale the heartbeat interval by the request size
+        base_timeout = HEARTBEAT_INTERVAL_MS / 1000.0
+        # Add more time for larger payloads, but cap it
+        size_factor = min(2.0, 1.0 + (entries_size / (1024 * 1024)))  # Scale up to 2x for 1MB+
+        return min(
+            base_timeout * size_factor * 2.0,  # Double the heartbeat interval as base
+            ceiling
+        )
+
     async def _send_single_append_entries(self, peer_id: int, peer_addr: str, args: raft_pb2.AppendEntriesArgs) -> Optional[Tuple[int, raft_pb2.AppendEntriesReply, raft_pb2.AppendEntriesArgs]]:
         """
         Helper to send a single AppendEntries RPC with improved error handling and retry logic.
         Returns (peer_id, reply, original_args) on success, None on failure.
 
         The function implements:
-        1. Dynamic timeout based on message size
+        1. Dynamic timeout from the peer's measured RTT and throughput
         2. Better error handling and logging
         3. Stub connection management
         4. Proper resource cleanup
         """
-        # Calculate timeout based on message size and type
-        base_timeout = HEARTBEAT_INTERVAL_MS / 1000.0
-        entries_size = sum(len(entry.SerializeToString()) for entry in args.entries)
-        # Add more time for larger payloads, but cap it
-        size_factor = min(2.0, 1.0 + (entries_size / (1024 * 1024)))  # Scale up to 2x for 1MB+
-        request_timeout = min(
-            base_timeout * size_factor * 2.0,  # Double the heartbeat interval as base
-            ELECTION_TIMEOUT_MIN_MS / 1000.0 * 0.8  # But never exceed 80% of min election timeout
-        )
+        request_timeout = self._append_entries_timeout(peer_id, args)
+        link = self._link(peer_id)
 
         retry_count = 0
         MAX_RETRIES = 2  # Limit retries to avoid infinite loops
@@ -940,35 +1616,38 @@ class RaftNode:
                 try:
                     stub = await self._get_peer_stub(peer_id, peer_addr)
                     if not stub:
-                        logger.error(f"Node {self.node_id}: Failed to get/create stub for peer {peer_id} at {peer_addr}")
+                        logger.error(f"Node {self.name}: Failed to get/create stub for peer {peer_id} at {peer_addr}")
                         return None
                 except Exception as e:
-                    logger.error(f"Node {self.node_id}: Error creating stub for peer {peer_id}: {e}", exc_info=True)
+                    logger.error(f"Node {self.name}: Error creating stub for peer {peer_id}: {e}", exc_info=True)
                     return None
 
                 # Log attempt details
                 entries_count = len(args.entries)
                 logger.debug(
-                    f"Node {self.node_id}: Sending AppendEntries to {peer_id} "
+                    f"Node {self.name}: Sending AppendEntries to {peer_id} "
                     f"(term={args.term}, entries={entries_count}, "
                     f"prevIndex={args.prev_log_index}, timeout={request_timeout:.2f}s)"
                 )
 
                 # Use asyncio.wait_for for more reliable timeout handling
                 try:
+                    sent_at = asyncio.get_running_loop().time()
                     reply = await asyncio.wait_for(
                         stub.AppendEntries(args),
                         timeout=request_timeout
                     )
+                    if retry_count == 0: # A retried request's RTT is ambiguous (Karn's rule)
+                        link.on_reply(args.ByteSize(), asyncio.get_running_loop().time() - sent_at)
 
                     # Successful RPC, check reply
                     if not reply:
-                        logger.warning(f"Node {self.node_id}: Received empty reply from {peer_id}")
+                        logger.warning(f"Node {self.name}: Received empty reply from {peer_id}")
                         return None
 
                     # Log success details
                     logger.debug(
-                        f"Node {self.node_id}: Received AppendEntries reply from {peer_id}: "
+                        f"Node {self.name}: Received AppendEntries reply from {peer_id}: "
                         f"term={reply.term}, success={reply.success}"
                     )
 
@@ -976,29 +1655,30 @@ class RaftNode:
 
                 except asyncio.TimeoutError:
                     logger.warning(
-                        f"Node {self.node_id}: Timeout sending AppendEntries to {peer_id} "
+                        f"Node {self.name}: Timeout sending AppendEntries to {peer_id} "
                         f"(attempt {retry_count + 1}/{MAX_RETRIES + 1}, timeout={request_timeout:.2f}s)"
                     )
                     # Don't retry on timeout - it's usually better to let the next heartbeat handle it
+                    link.on_timeout()
                     return None
 
             except grpc.aio.AioRpcError as e:
                 # Handle specific gRPC errors
                 if e.code() == grpc.StatusCode.UNAVAILABLE:
                     logger.warning(
-                        f"Node {self.node_id}: Peer {peer_id} unavailable "
+                        f"Node {self.name}: Peer {peer_id} unavailable "
                         f"(attempt {retry_count + 1}/{MAX_RETRIES + 1}): {e.details()}"
                     )
                     # Invalidate stub on connection errors
                     self.peer_stubs.pop(peer_id, None)
                 elif e.code() == grpc.StatusCode.DEADLINE_EXCEEDED:
                     logger.warning(
-                        f"Node {self.node_id}: RPC deadline exceeded for peer {peer_id} "
+                        f"Node {self.name}: RPC deadline exceeded for peer {peer_id} "
                         f"(attempt {retry_count + 1}/{MAX_RETRIES + 1})"
                     )
                 else:
                     logger.error(
-                        f"Node {self.node_id}: Unexpected gRPC error with peer {peer_id}: "
+                        f"Node {self.name}: Unexpected gRPC error with peer {peer_id}: "
                         f"{e.code()} - {e.details()}"
                     )
                     # Don't retry on unexpected errors
@@ -1006,7 +1686,7 @@ class RaftNode:
 
             except Exception as e:
                 logger.error(
-                    f"Node {self.node_id}: Unexpected error sending AppendEntries to {peer_id}: {e}",
+                    f"Node {self.name}: Unexpected error sending AppendEntries to {peer_id}: {e}",
                     exc_info=True
                 )
                 # Don't retry on unexpected errors
@@ -1020,9 +1700,113 @@ class RaftNode:
                 await asyncio.sleep(backoff)
 
         # If we get here, we've exhausted retries
-        logger.error(f"Node {self.node_id}: Failed to send AppendEntries to {peer_id} after {MAX_RETRIES + 1} attempts")
+        logger.error(f"Node {self.name}: Failed to send AppendEntries to {peer_id} after {MAX_RETRIES + 1} attempts")
         return None
 
+    # --- Snapshot Transfer (Leader) ---
+
+    def _start_snapshot_transfer(self, peer_id: int, peer_addr: str):
+        """Starts streaming our snapshot to a peer unless a transfer is already running."""
+        task = self._snapshot_transfers.get(peer_id)
+        if task is not None and not task.done():
+            return
+        logger.info(f"Node {self.name}: Peer {peer_id} needs index {self.next_index.get(peer_id)}, but log starts at {self.log.first_index}. Sending snapshot.")
+        self._snapshot_transfers[peer_id] = asyncio.create_task(self._send_snapshot_to_peer(peer_id, peer_addr))
+
+    def _cancel_snapshot_transfers(self):
+        for task in self._snapshot_transfers.values():
+            if not task.done():
+                task.cancel()
+        self._snapshot_transfers.clear()
+
+    async def _send_snapshot_to_peer(self, peer_id: int, peer_addr: str):
+        """
+        Streams the snapshot file to a peer in SNAPSHOT_CHUNK_BYTES chunks over InstallSnapshot.
+        At most SNAPSHOT_MAX_INFLIGHT_CHUNKS chunks are unacknowledged at any time, and an
+        interrupted transfer resumes from the last offset the follower acknowledged.
+        """
+        start_term = self.current_term
+        try:
+            with open(self.snapshot_file_path, 'rb') as f: # Keeps this snapshot readable even if a newer one replaces it
+                metadata = read_snapshot_metadata(f)
+                total_size = os.fstat(f.fileno()).st_size
+                snapshot_id = (metadata.last_included_index, metadata.last_included_term)
+                resume = self._snapshot_resume_offsets.get(peer_id)
+                offset = resume[1] if resume and resume[0] == snapshot_id else 0
+
+                stub = await self._get_peer_stub(peer_id, peer_addr)
+                if not stub:
+                    return
+                logger.info(f"Node {self.name}: Sending snapshot through index {metadata.last_included_index} to {peer_id} ({total_size} bytes, starting at offset {offset})")
+
+                call = stub.InstallSnapshot()
+                window = asyncio.Semaphore(SNAPSHOT_MAX_INFLIGHT_CHUNKS)
+                expected_acks: List[int] = [] # bytes_stored we expect after each in-flight chunk
+
+                async def send_chunks():
+                    position = offset
+                    while True:
+                        await window.acquire()
+                        f.seek(position)
+                        data = f.read(SNAPSHOT_CHUNK_BYTES)
+                        done = position + len(data) >= total_size
+                        expected_acks.append(position + len(data))
+                        await call.write(raft_pb2.InstallSnapshotChunk(
+                            term=start_term,
+                            leader_id=self.node_id,
+                            last_included_index=metadata.last_included_index,
+                            last_included_term=metadata.last_included_term,
+                            offset=position,
+                            data=data,
+                            done=done,
+                            group_id=self.group_id
+                        ))
+                        position += len(data)
+                        if done:
+                            break
+                    await call.done_writing()
+
+                sender = asyncio.create_task(send_chunks())
+                try:
+                    while True:
+                        reply = await asyncio.wait_for(call.read(), timeout=SNAPSHOT_ACK_TIMEOUT_S)
+                        if reply is grpc.aio.EOF:
+                            logger.warning(f"Node {self.name}: Snapshot stream to {peer_id} closed before completion")
+                            return
+                        if reply.term > self.current_term:
+                            logger.info(f"Node {self.name}: Discovered higher term {reply.term} from {peer_id} during snapshot transfer, stepping down")
+                            self._become_follower(reply.term)
+                            self._persist_state()
+                            return
+                        if self.state != NodeState.LEADER or self.current_term != start_term:
+                            return
+
+                        if reply.done:
+                            self.match_index[peer_id] = max(self.match_index.get(peer_id, 0), metadata.last_included_index)
+                            self.next_index[peer_id] = max(self.next_index.get(peer_id, 1), metadata.last_included_index + 1)
+                            self._snapshot_resume_offsets.pop(peer_id, None)
+                            logger.info(f"Node {self.name}: Peer {peer_id} installed snapshot through index {metadata.last_included_index}")
+                            return
+
+                        self._snapshot_resume_offsets[peer_id] = (snapshot_id, reply.bytes_stored)
+                        expected = expected_acks.pop(0) if expected_acks else None
+                        if reply.bytes_stored != expected:
+                            # Follower is at a different offset (restart or lost chunk): resume from there next round
+                            logger.info(f"Node {self.name}: Peer {peer_id} holds {reply.bytes_stored} snapshot bytes (expected {expected}), restarting stream from there")
+                            call.cancel()
+                            return
+                        window.release()
+                finally:
+                    sender.cancel()
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            logger.warning(f"Node {self.name}: Timed out waiting for snapshot ack from {peer_id}")
+        except grpc.aio.AioRpcError as e:
+            logger.warning(f"Node {self.name}: RPC error sending snapshot to {peer_id}: {e.code()} - {e.details()}")
+        except Exception as e:
+            logger.error(f"Node {self.name}: Unexpected error sending snapshot to {peer_id}: {e}", exc_info=True)
+
     # --- gRPC Client Stub Management ---
 
     async def _get_peer_stub(self, peer_id: int, peer_addr: str) -> Optional[raft_pb2_grpc.RaftServiceStub]:
@@ -1031,13 +1815,17 @@ class RaftNode:
             try:
                 # Create an insecure channel for simplicity
                 # For production, use secure channels (grpc.aio.secure_channel)
-                channel = grpc.aio.insecure_channel(peer_addr)
+                channel = grpc.aio.insecure_channel(peer_addr, options=[
+                    ('grpc.initial_reconnect_backoff_ms', HEARTBEAT_INTERVAL_MS),
+                    ('grpc.min_reconnect_backoff_ms', HEARTBEAT_INTERVAL_MS),
+                    ('grpc.max_reconnect_backoff_ms', PEER_RECONNECT_BACKOFF_MAX_MS),
+                ])
                 # Optional: Add connection testing or readiness check here?
                 # await channel.channel_ready() # Could block or fail
                 self.peer_stubs[peer_id] = raft_pb2_grpc.RaftServiceStub(channel)
-                logger.debug(f"Node {self.node_id}: Created gRPC stub for peer {peer_id} at {peer_addr}")
+                logger.debug(f"Node {self.name}: Created gRPC stub for peer {peer_id} at {peer_addr}")
             except Exception as e:
-                logger.error(f"Node {self.node_id}: Failed to create channel/stub for peer {peer_id} at {peer_addr}: {e}", exc_info=True)
+                logger.error(f"Node {self.name}: Failed to create channel/stub for peer {peer_id} at {peer_addr}: {e}", exc_info=True)
                 return None
         return self.peer_stubs[peer_id]
 
@@ -1045,7 +1833,8 @@ class RaftNode:
 
     async def run(self):
         """Starts the node's background tasks (timers)."""
-        logger.info(f"Node {self.node_id}: Starting main loop.")
+        logger.info(f"Node {self.name}: Starting main loop.")
+        self._started_at = asyncio.get_running_loop().time()
         # Initialize peer stubs (could be done lazily too)
         # for pid, addr in self.peers_addresses.items():
         #     if pid != self.node_id:
@@ -1062,26 +1851,26 @@ class RaftNode:
 
     async def stop(self):
         """Cleans up resources."""
-        logger.info(f"Node {self.node_id}: Stopping...")
+        logger.info(f"Node {self.name}: Stopping...")
         self._cancel_election_timer()
-        self._cancel_heartbeat_timer()
-        # Close gRPC client channels
-        for peer_id, stub in self.peer_stubs.items():
-            if hasattr(stub, '_channel'): # Access underlying channel if possible
-                try:
-                    # Ensure channel is closed
-                    await stub._channel.close() # Close the channel gracefully
-                    logger.debug(f"Node {self.node_id}: Closed gRPC channel to peer {peer_id}")
-                except Exception as e:
-                    logger.warning(f"Node {self.node_id}: Error closing channel to peer {peer_id}: {e}")
-        self.peer_stubs.clear()
-        logger.info(f"Node {self.node_id}: Stopped.")
+        replicators = list(self._replicators.values())
+        self._stop_replicators()
+        await asyncio.gather(*(replicator.wait_stopped() for replicator in replicators))
+        if self._apply_task is not None:
+            await asyncio.shield(self._apply_task) # The state machine is closed below
+        self._proposals.fail_pending()
+        self._cancel_snapshot_transfers()
+        self._abort_snapshot_receiver()
+        # Flush any buffered log entries and close the log file
+        await self._wal.close()
+        self._hard_state.close() # After the WAL: its disk thread may still have been writing it
+        self.state_machine.close()
+        # Close gRPC client channels (shared ones are closed by their owner)
+        if self._owns_peer_stubs:
+            await close_peer_stubs(self.peer_stubs, self.name)
+        logger.info(f"Node {self.name}: Stopped.")
 
     def _get_last_log_info(self) -> Tuple[int, int]:
         """Returns the index and term of the last entry in the log."""
-        # Log index is 1-based in Raft paper, len(log) is 0-based index + 1
-        last_log_index = len(self.log)
-        last_log_term = 0
-        if self.log:
-            last_log_term = self.log[-1].term
-        return last_log_index, last_log_term
+        # Log index is 1-based in Raft paper; the log may start after a snapshot
+        return self.log.last_index, self.log.last_term
@@ -0,0 +1,91 @@
+# src/distributed_fs/raft/proposals.py
+import asyncio
+import logging
+from typing import Callable, List, Optional
+
+# --- Constants ---
+PROPOSAL_BATCH_WINDOW_MS = 0.3 # How long to collect concurrent proposals before appending them
+PROPOSAL_BATCH_MAX_ENTRIES = 512 # Append immediately once this many proposals are queued
+
+logger = logging.getLogger(__name__)
+
+class ProposalQueue:
+    """
+    Leader-side queue that coalesces concurrent client proposals.
+
+    Commands proposed within `batch_window_ms` of each other (or until
+    `max_batch_entries` are queued) are handed to `append_batch` in one call,
+    which appends them as a contiguous run of log entries with a single WAL
+    write. propose() returns a future that resolves to the log index assigned
+    to that command, or to None if this node could not append it (e.g. it is
+    no longer the leader).
+    """
+    def __init__(self, node_id: int, append_batch: Callable[[List[bytes]], Optional[int]],
+                 batch_window_ms: float = PROPOSAL_BATCH_WINDOW_MS,
+                 max_batch_entries: int = PROPOSAL_BATCH_MAX_ENTRIES):
+        self.node_id = node_id
+        self.append_batch = append_batch # Appends commands, returns the last index used (None if it can't)
+        self.batch_window_ms = batch_window_ms
+        self.max_batch_entries = max_batch_entries
+
+        self._commands: List[bytes] = []
+        self._waiters: List[asyncio.Future] = [] # One per queued command, same order
+        self._flush_handle: Optional[asyncio.Handle] = None
+
+    def propose(self, command: bytes) -> asyncio.Future:
+        """Queues a command. Returns a future for the log index it gets (None if it wasn't appended)."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._commands.append(command)
+        self._waiters.append(future)
+
+        if len(self._commands) >= self.max_batch_entries:
+            self.flush()
+        elif self._flush_handle is None:
+            if self.batch_window_ms > 0:
+                self._flush_handle = loop.call_later(self.batch_window_ms / 1000.0, self.flush)
+            else:
+                # Still coalesces everything proposed during this loop iteration
+                self._flush_handle = loop.call_soon(self.flush)
+        return future
+
+    def flush(self):
+        """Appends every queued command in one batch and tells each caller its index."""
+        self._cancel_scheduled_flush()
+        if not self._commands:
+            return
+
+        commands = self._commands
+        waiters = self._waiters
+        self._commands = []
+        self._waiters = []
+
+        try:
+            last_index = self.append_batch(commands)
+        except Exception as e:
+            logger.error(f"Node {self.node_id}: Failed to append {len(commands)} proposals: {e}", exc_info=True)
+            for future in waiters:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        first_index = None if last_index is None else last_index - len(commands) + 1
+        for offset, future in enumerate(waiters):
+            if not future.done():
+                future.set_result(None if first_index is None else first_index + offset)
+        logger.debug(f"Node {self.node_id}: Appended {len(commands)} queued proposals (last index {last_index})")
+
+    def fail_pending(self):
+        """Resolves every queued proposal with None (used when stepping down)."""
+        self._cancel_scheduled_flush()
+        waiters = self._waiters
+        self._commands = []
+        self._waiters = []
+        for future in waiters:
+            if not future.done():
+                future.set_result(None)
+
+    def _cancel_scheduled_flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
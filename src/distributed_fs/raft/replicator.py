@@ -0,0 +1,462 @@
+# src/distributed_fs/raft/replicator.py
+import asyncio
+import logging
+from collections import deque
+from functools import partial
+from typing import TYPE_CHECKING, Awaitable, Callable, Deque, List, Optional, Set, Tuple
+
+import grpc
+
+# Import generated gRPC types
+from distributed_fs.generated import raft_pb2, raft_pb2_grpc
+
+if TYPE_CHECKING:
+    from distributed_fs.raft.node import RaftNode
+
+# --- Constants ---
+MAX_ENTRIES_PER_BATCH = 1000 # Entries per AppendEntries request (the link's byte budget usually decides first)
+MAX_INFLIGHT_APPEND_ENTRIES = 4 # Pipelined AppendEntries requests allowed per peer
+STREAM_RETRY_INTERVAL_S = 1.0 # After a replication stream breaks, use unary AppendEntries this long before reopening it
+# Bounds of adaptive heartbeat intervals; the upper one stays far below the 800 ms minimum election timeout
+ADAPTIVE_HEARTBEAT_MIN_MS = 10
+ADAPTIVE_HEARTBEAT_MAX_MS = 100
+
+logger = logging.getLogger(__name__)
+
+class _OutgoingFrames:
+    """
+    Request side of an AppendEntriesStream call: the frames put on `queue`
+    until a None. Not an async generator, so the call can be cancelled while
+    it waits for the next frame (closing a generator that is awaiting raises
+    RuntimeError).
+    """
+    def __init__(self, queue: asyncio.Queue):
+        self._queue = queue
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> raft_pb2.AppendEntriesArgs:
+        args = await self._queue.get()
+        if args is None:
+            raise StopAsyncIteration
+        return args
+
+class AppendEntriesStream:
+    """
+    Leader end of one AppendEntriesStream call to a follower.
+
+    send() writes a frame and returns a future for its reply. The follower
+    answers frames in the order it received them, so replies are matched to
+    requests first-in first-out. When the stream breaks every outstanding
+    future fails with ConnectionError and the stream stays closed.
+    """
+    def __init__(self, node_name: str, peer_id: int, stub: raft_pb2_grpc.RaftServiceStub):
+        self.node_name = node_name # For log messages
+        self.peer_id = peer_id
+        self.closed: bool = False
+        self.unimplemented: bool = False # The peer doesn't serve AppendEntriesStream
+        self._frames: asyncio.Queue = asyncio.Queue()
+        self._pending: Deque[asyncio.Future] = deque() # Reply futures in frame order
+        self._call = stub.AppendEntriesStream(_OutgoingFrames(self._frames))
+        self._reader = asyncio.create_task(self._read_replies())
+
+    def send(self, args: raft_pb2.AppendEntriesArgs) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        if self.closed:
+            future.set_exception(ConnectionError(f"replication stream to {self.peer_id} is closed"))
+            return future
+        self._pending.append(future)
+        self._frames.put_nowait(args)
+        return future
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._frames.put_nowait(None) # Ends the request side
+        self._call.cancel()
+        self._reader.cancel()
+        self._fail_pending()
+
+    @property
+    def finished(self) -> bool:
+        """True once the reply reader has ended."""
+        return self._reader.done()
+
+    async def wait_closed(self):
+        """Waits until the reply reader has finished after close()."""
+        await asyncio.gather(self._reader, return_exceptions=True)
+
+    async def _read_replies(self):
+        try:
+            async for reply in self._call:
+                if self._pending:
+                    future = self._pending.popleft()
+                    if not future.done(): # Timed out waiters are skipped, their reply is simply dropped
+                        future.set_result(reply)
+            logger.info(f"Node {self.node_name}: Replication stream to {self.peer_id} ended")
+        except asyncio.CancelledError:
+            pass
+        except grpc.aio.AioRpcError as e:
+            if e.code() == grpc.StatusCode.UNIMPLEMENTED:
+                self.unimplemented = True
+                logger.info(f"Node {self.node_name}: Peer {self.peer_id} doesn't support AppendEntriesStream, using unary AppendEntries")
+            elif e.code() != grpc.StatusCode.CANCELLED:
+                logger.warning(f"Node {self.node_name}: Replication stream to {self.peer_id} failed: {e.code()} - {e.details()}")
+        finally:
+            self.closed = True
+            self._fail_pending()
+
+    def _fail_pending(self):
+        while self._pending:
+            future = self._pending.popleft()
+            if not future.done():
+                future.set_exception(ConnectionError(f"replication stream to {self.peer_id} closed"))
+
+class PeerReplicator:
+    """
+    Leader-side replication loop for a single follower.
+
+    One task per peer runs for the whole leadership term. It is woken by
+    notify() as soon as the leader appends, sends the new entries right away
+    and advances next_index optimistically, so up to
+    MAX_INFLIGHT_APPEND_ENTRIES batches can be in flight at once. When there
+    is nothing to send it falls back to an empty AppendEntries every
+    heartbeat interval.
+
+    After a failed or rejected request the replicator drops back to probing
+    (one request in flight) until the follower accepts again; replies to
+    requests sent before the rejection are tagged with an older epoch and no
+    longer move next_index.
+
+    Requests travel over a long-lived AppendEntriesStream to the peer. If the
+    stream can't be used (it broke recently, or the peer doesn't implement
+    it) the replicator falls back to unary AppendEntries calls, one at a
+    time: separate calls can arrive out of order, so only the stream is
+    pipelined.
+
+    Every reply feeds the node's LinkEstimator for this peer, which sets the
+    reply deadline of each request, caps each batch at about one
+    bandwidth-delay product and, with node.adaptive_heartbeat, paces
+    heartbeats at about one RTT.
+
+    If the node has a HeartbeatCoalescer (it shares a process with other
+    Raft groups), periodic heartbeats are left to it while it covers the
+    peer: it collects coalesced_heartbeat() from every idle replicator of
+    the process for the same peer and sends them in one RPC. Heartbeats a
+    ReadIndex round asks for still go out right away, on the replicator's
+    own stream.
+    """
+    def __init__(self, node: "RaftNode", peer_id: int, peer_addr: str, heartbeat_interval_ms: float):
+        self.node = node
+        self.peer_id = peer_id
+        self.peer_addr = peer_addr
+        self.term = node.current_term # The leadership term this replicator works for
+        self.link = node._link(peer_id)
+        self._base_heartbeat_interval = heartbeat_interval_ms / 1000.0
+        self._full_batch_entries: int = MAX_ENTRIES_PER_BATCH # Entries that fit in the last batch budget
+
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopped: bool = False
+        self._inflight: Set[asyncio.Task] = set()
+        self._epoch: int = 0 # Bumped whenever next_index is moved back
+        self._probing: bool = True # Until the first accepted request we don't know where the follower is
+        self._last_sent: float = 0.0
+        self._retry_at: float = 0.0 # After a failed RPC, don't contact the peer again before this time
+        self._stream: Optional[AppendEntriesStream] = None
+        self._closing_streams: List[AppendEntriesStream] = [] # Closed, their reply readers may not have ended yet
+        self._stream_retry_at: float = 0.0 # Don't reopen a broken stream before this time
+        self._stream_supported: bool = True
+        self._heartbeat_requested: bool = False # Send even if idle (a ReadIndex round is waiting)
+        self.acked_read_round: int = 0 # Newest ReadIndex round this peer answered in our term
+        self.acked_sent_at: float = 0.0 # Send time of the newest request this peer answered in our term (lease start)
+
+    @property
+    def heartbeat_interval(self) -> float:
+        if not self.node.adaptive_heartbeat:
+            return self._base_heartbeat_interval
+        return self.link.heartbeat_interval(self._base_heartbeat_interval, ADAPTIVE_HEARTBEAT_MIN_MS / 1000.0,
+                                            ADAPTIVE_HEARTBEAT_MAX_MS / 1000.0)
+
+    def start(self):
+        if self.node.heartbeat_coalescer is not None:
+            self.node.heartbeat_coalescer.register(self)
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        self._stopped = True # Ends the loop even if wait_for() swallows the cancellation below (Python < 3.12)
+        self._wakeup.set()
+        if self.node.heartbeat_coalescer is not None:
+            self.node.heartbeat_coalescer.unregister(self)
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        for task in self._inflight:
+            task.cancel()
+        self._inflight.clear()
+        self._close_stream()
+
+    async def wait_stopped(self):
+        """After stop(): waits for the replication loop and the reply readers of its streams to end."""
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True) # Its cleanup may close one more stream
+        await asyncio.gather(*(stream.wait_closed() for stream in self._closing_streams))
+        self._closing_streams.clear()
+
+    def notify(self):
+        """Wakes the replicator, e.g. because the leader appended new entries."""
+        self._wakeup.set()
+
+    def request_heartbeat(self):
+        """Sends a request as soon as the pipeline allows, so the peer can confirm our leadership."""
+        self._heartbeat_requested = True
+        self._wakeup.set()
+
+    def _active(self) -> bool:
+        # Imported here to avoid a circular import at module load
+        from distributed_fs.raft.node import NodeState
+        return not self._stopped and self.node.state == NodeState.LEADER and self.node.current_term == self.term
+
+    async def _run(self):
+        node = self.node
+        loop = asyncio.get_running_loop()
+        logger.debug(f"Node {node.name}: Replicator for peer {self.peer_id} started for term {self.term}")
+        try:
+            while self._active():
+                self._wakeup.clear()
+                next_idx = node.next_index.get(self.peer_id, 1)
+
+                if next_idx <= node.log.snapshot_index:
+                    # The entries this peer needs have been compacted into our snapshot
+                    node._start_snapshot_transfer(self.peer_id, self.peer_addr)
+                    await self._wait(self.heartbeat_interval)
+                    continue
+
+                if loop.time() < self._retry_at:
+                    await self._wait(self._retry_at - loop.time())
+                    continue
+
+                # Only the stream delivers requests in order; unary calls may overtake each other and an
+                # older batch arriving late would look like a conflict, so without one: one at a time
+                window = 1 if self._probing or not self._stream_open() else MAX_INFLIGHT_APPEND_ENTRIES
+                pending = node.log.last_index - next_idx + 1
+                if self._heartbeat_requested:
+                    should_send = True
+                elif self._inflight:
+                    # Only pipeline full batches; a partial one waits for a reply so it can fill up
+                    should_send = pending >= self._full_batch_entries
+                elif self._heartbeats_coalesced():
+                    should_send = pending > 0
+                else:
+                    should_send = pending > 0 or loop.time() - self._last_sent >= self.heartbeat_interval
+                if len(self._inflight) < window and should_send:
+                    self._send(next_idx)
+                    continue
+
+                if self._heartbeats_coalesced():
+                    await self._wait(None) # Until there is something to send
+                else:
+                    await self._wait(max(0.0, self._last_sent + self.heartbeat_interval - loop.time()))
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Node {node.name}: Replicator for peer {self.peer_id} failed: {e}", exc_info=True)
+        finally:
+            for task in self._inflight:
+                task.cancel()
+            self._inflight.clear()
+            self._close_stream()
+            if node.heartbeat_coalescer is not None:
+                node.heartbeat_coalescer.unregister(self)
+            logger.debug(f"Node {node.name}: Replicator for peer {self.peer_id} stopped (term {self.term})")
+
+    async def _wait(self, timeout: Optional[float]):
+        """Sleeps until notify(), a reply, or `timeout` seconds (None: no limit), whichever comes first."""
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def _heartbeats_coalesced(self) -> bool:
+        coalescer = self.node.heartbeat_coalescer
+        return coalescer is not None and coalescer.covers(self.peer_id)
+
+    def coalesced_heartbeat(self) -> Optional[Tuple[raft_pb2.AppendEntriesArgs, Callable[[Optional[raft_pb2.AppendEntriesReply]], Awaitable[None]]]]:
+        """
+        For the HeartbeatCoalescer: a heartbeat for this peer and the coroutine function
+        to hand its reply to (None if it was lost), or None if the peer doesn't need one
+        now, because requests are in flight, entries are about to be sent, or it heard
+        from us less than half a heartbeat interval ago.
+        """
+        node = self.node
+        loop = asyncio.get_running_loop()
+        next_idx = node.next_index.get(self.peer_id, 1)
+        if (not self._active() or self._inflight or next_idx <= node.log.snapshot_index or next_idx <= node.log.last_index
+                or loop.time() < self._retry_at or loop.time() - self._last_sent < self.heartbeat_interval / 2):
+            return None
+        args = self._append_entries_args(next_idx, [])
+        self._last_sent = loop.time()
+        return args, partial(self._handle_heartbeat_reply, args, self._epoch, node._read_round, self._last_sent)
+
+    async def _handle_heartbeat_reply(self, args: raft_pb2.AppendEntriesArgs, epoch: int, read_round: int, sent_at: float,
+                                      reply: Optional[raft_pb2.AppendEntriesReply]):
+        # A lost coalesced heartbeat says nothing about what went out on our own stream
+        # since, so unlike a lost AppendEntries it doesn't rewind next_index
+        if reply is not None:
+            await self._handle_reply(args, epoch, read_round, sent_at, reply)
+
+    def _append_entries_args(self, next_idx: int, entries: List[bytes]) -> raft_pb2.AppendEntriesArgs:
+        node = self.node
+        prev_log_index = next_idx - 1
+        return raft_pb2.AppendEntriesArgs(
+            term=self.term,
+            leader_id=node.node_id,
+            prev_log_index=prev_log_index,
+            prev_log_term=node.log.term_at(prev_log_index),
+            entries=entries,
+            leader_commit=node.commit_index,
+            entry_terms=node.log.terms_from(next_idx, len(entries)),
+            group_id=node.group_id
+        )
+
+    def _send(self, next_idx: int):
+        """Sends the entries starting at next_idx (none for a heartbeat) and advances next_index optimistically."""
+        node = self.node
+        # Stored records go out as they are, no per-entry encoding
+        entries = self._batch(node.log.records_from(next_idx, MAX_ENTRIES_PER_BATCH))
+        args = self._append_entries_args(next_idx, entries)
+        node.next_index[self.peer_id] = next_idx + len(entries)
+        self._last_sent = asyncio.get_running_loop().time()
+        self._heartbeat_requested = False
+
+        # Any reply in our term to a request sent now confirms every read round started so far
+        task = asyncio.create_task(self._replicate(args, self._epoch, node._read_round, self._last_sent))
+        self._inflight.add(task)
+        task.add_done_callback(self._request_done)
+
+    def _request_done(self, task: asyncio.Task):
+        self._inflight.discard(task)
+        self._wakeup.set() # A pipeline slot is free again, also when the request was cancelled
+
+    def _batch(self, records: List[bytes]) -> List[bytes]:
+        """Trims `records` to the link's batch budget (always keeping at least one)."""
+        budget = self.link.batch_bytes()
+        size = 0
+        for count, record in enumerate(records):
+            size += len(record)
+            if size > budget and count > 0:
+                self._full_batch_entries = count
+                return records[:count]
+        self._full_batch_entries = MAX_ENTRIES_PER_BATCH
+        return records
+
+    async def _replicate(self, args: raft_pb2.AppendEntriesArgs, epoch: int, read_round: int, sent_at: float):
+        await self._handle_reply(args, epoch, read_round, sent_at, await self._append_entries(args))
+
+    async def _handle_reply(self, args: raft_pb2.AppendEntriesArgs, epoch: int, read_round: int, sent_at: float,
+                            reply: Optional[raft_pb2.AppendEntriesReply]):
+        """Acts on the reply to `args`, sent at `sent_at` in `epoch` (None: the request was lost)."""
+        node = self.node
+        try:
+            if not self._active():
+                return
+
+            if reply is None:
+                # Lost request: everything optimistically sent after it must be resent
+                if epoch == self._epoch:
+                    self._rewind(args.prev_log_index + 1)
+                    self._retry_at = asyncio.get_running_loop().time() + self.heartbeat_interval
+                return
+
+            if reply.term > node.current_term:
+                logger.info(f"Node {node.name}: Discovered higher term {reply.term} from {self.peer_id}, stepping down")
+                node._become_follower(reply.term)
+                node._persist_state()
+                return
+
+            if reply.term == self.term:
+                # The peer recognised us after sent_at, so it won't vote for anyone else for a while
+                self.acked_sent_at = max(self.acked_sent_at, sent_at)
+                if read_round > self.acked_read_round:
+                    self.acked_read_round = read_round
+                    node._on_read_round_acked()
+
+            if reply.success:
+                new_match_index = args.prev_log_index + len(args.entries)
+                node.match_index[self.peer_id] = max(node.match_index.get(self.peer_id, 0), new_match_index)
+                node.next_index[self.peer_id] = max(node.next_index.get(self.peer_id, 1), new_match_index + 1)
+                if epoch == self._epoch:
+                    self._probing = False
+                logger.debug(f"Node {node.name}: Updated indices for {self.peer_id}: "
+                             f"match_index={node.match_index[self.peer_id]}, "
+                             f"next_index={node.next_index[self.peer_id]}")
+                await node._update_commit_index()
+            elif reply.term == node.current_term and epoch == self._epoch:
+                # On failure, back next_index up using the follower's conflict hints
+                new_next = node._next_index_after_reject(self.peer_id, args, reply)
+                self._rewind(new_next)
+                logger.debug(f"Node {node.name}: Decreased next_index for {self.peer_id} to {new_next} (conflictTerm={reply.conflict_term}, conflictIndex={reply.conflict_index})")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Node {node.name}: Error processing AppendEntries result from {self.peer_id}: {e}", exc_info=True)
+        finally:
+            self._wakeup.set() # A pipeline slot is free again
+
+    async def _append_entries(self, args: raft_pb2.AppendEntriesArgs) -> Optional[raft_pb2.AppendEntriesReply]:
+        """Sends one AppendEntries over the replication stream (or unary as a fallback). Returns None on failure."""
+        stream = await self._get_stream()
+        if stream is None:
+            if len(self._inflight) > 1:
+                # Pipelined for a stream that has closed since; sent unary it could overtake the others
+                return None
+            result = await self.node._send_single_append_entries(self.peer_id, self.peer_addr, args)
+            return result[1] if result else None
+
+        timeout = self.node._append_entries_timeout(self.peer_id, args)
+        loop = asyncio.get_running_loop()
+        sent_at = loop.time()
+        try:
+            reply = await asyncio.wait_for(stream.send(args), timeout=timeout)
+            self.link.on_reply(args.ByteSize(), loop.time() - sent_at)
+            return reply
+        except asyncio.TimeoutError:
+            self.link.on_timeout()
+            # A stalled stream would hold up every later frame too; start over with a fresh one
+            logger.warning(f"Node {self.node.name}: Timeout waiting for streamed AppendEntries reply from {self.peer_id} (timeout={timeout:.2f}s)")
+            self._close_stream()
+        except ConnectionError:
+            if stream.unimplemented:
+                self._stream_supported = False
+            self._stream_retry_at = asyncio.get_running_loop().time() + STREAM_RETRY_INTERVAL_S
+        return None
+
+    def _stream_open(self) -> bool:
+        return self._stream is not None and not self._stream.closed
+
+    async def _get_stream(self) -> Optional[AppendEntriesStream]:
+        if self._stream_open():
+            return self._stream
+        if not self._stream_supported or asyncio.get_running_loop().time() < self._stream_retry_at:
+            return None
+        stub = await self.node._get_peer_stub(self.peer_id, self.peer_addr)
+        if stub is None:
+            return None
+        self._stream = AppendEntriesStream(self.node.name, self.peer_id, stub)
+        logger.debug(f"Node {self.node.name}: Opened replication stream to {self.peer_id}")
+        return self._stream
+
+    def _close_stream(self):
+        if self._stream is not None:
+            self._stream.close()
+            self._closing_streams = [stream for stream in self._closing_streams if not stream.finished]
+            self._closing_streams.append(self._stream)
+            self._stream = None
+        self._stream_retry_at = asyncio.get_running_loop().time() + STREAM_RETRY_INTERVAL_S
+
+    def _rewind(self, next_idx: int):
+        """Moves next_index back and invalidates every request still in flight."""
+        self.node.next_index[self.peer_id] = max(self.node.match_index.get(self.peer_id, 0) + 1, next_idx)
+        self._epoch += 1
+        self._probing = True
@@ -0,0 +1,397 @@
+# src/distributed_fs/raft/segments.py
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+import zlib
+from array import array
+from bisect import bisect_right
+from typing import Callable, List, Optional
+
+from distributed_fs.raft.fsutil import fsync_dir
+
+# --- Constants ---
+SEGMENT_MAX_BYTES = 16 * 1024 * 1024 # Roll over to a new segment file after this many bytes
+SEGMENT_SUFFIX = ".seg"
+INDEX_SUFFIX = ".idx"
+SEGMENT_MAGIC = b"RSEG"
+SEGMENT_VERSION = 2 # Checksummed records; version 1 files had no header and bare length prefixes
+SEGMENT_HEADER = struct.Struct("!4sI") # Magic, format version
+LENGTH_PREFIX = struct.Struct("!I") # 4-byte record length (unsigned int, network byte order)
+RECORD_TRAILER = struct.Struct("<I") # CRC32 of length prefix + record, little-endian (see CRC_RESIDUE)
+# zlib.crc32 of any data followed by its own little-endian CRC32 is this constant, whatever
+# the starting value. Seeding every record's CRC with it makes the CRC of a whole run of
+# valid records equal it too, so a segment is verified with a single zlib.crc32 call.
+CRC_RESIDUE = 0x2144DF1C
+OFFSET_ENTRY = struct.Struct("!Q") # 8-byte record offset in the sidecar index
+
+logger = logging.getLogger(__name__)
+
+class Segment:
+    """
+    One segment of the on-disk log.
+
+    `<first_index>.seg` starts with SEGMENT_HEADER and holds records for log
+    indices first_index, first_index+1, ..., each preceded by its length and
+    followed by a CRC32. `<first_index>.idx` holds the byte offset of each of
+    those records as a big-endian uint64. Segments written by older versions
+    have no header and no checksums; they're still read, but never appended to.
+
+    Records are read back through a read-only mmap of the segment file, opened
+    on first use and dropped whenever the file shrinks.
+    """
+    def __init__(self, log_dir: str, first_index: int):
+        self.first_index = first_index
+        base = os.path.join(log_dir, f"{first_index:020d}")
+        self.path = base + SEGMENT_SUFFIX
+        self.index_path = base + INDEX_SUFFIX
+        self.offsets = array('Q') # Byte offset of each record in the segment file
+        self.size: int = 0 # Bytes of valid data (header and records) in the segment file
+        self.checksummed: bool = True # False for version 1 segments
+        self._file = None
+        self._index_file = None
+        self._map: Optional[mmap.mmap] = None
+
+    @property
+    def last_index(self) -> int:
+        """Index of the last record in this segment (first_index - 1 if empty)."""
+        return self.first_index + len(self.offsets) - 1
+
+    def open_for_append(self):
+        if self._file is None:
+            self._file = open(self.path, 'ab')
+            self._index_file = open(self.index_path, 'ab')
+            if self.size == 0:
+                # New (or emptied) segment: always written in the current format
+                self._file.write(SEGMENT_HEADER.pack(SEGMENT_MAGIC, SEGMENT_VERSION))
+                self.size = SEGMENT_HEADER.size
+                self.checksummed = True
+
+    def append(self, records: List[bytes]):
+        """Appends serialized records (no fsync)."""
+        self.open_for_append()
+        if not self.checksummed:
+            raise ValueError(f"cannot append to version 1 segment {self.path}")
+        chunks = []
+        index_chunks = []
+        for record in records:
+            index_chunks.append(OFFSET_ENTRY.pack(self.size))
+            self.offsets.append(self.size)
+            prefix = LENGTH_PREFIX.pack(len(record))
+            chunks.append(prefix)
+            chunks.append(record)
+            chunks.append(RECORD_TRAILER.pack(zlib.crc32(record, zlib.crc32(prefix, CRC_RESIDUE))))
+            self.size += LENGTH_PREFIX.size + len(record) + RECORD_TRAILER.size
+        self._file.write(b''.join(chunks))
+        self._index_file.write(b''.join(index_chunks))
+
+    def sync(self):
+        if self._file is not None:
+            self._file.flush() # Ensure Python's buffer is flushed to OS
+            os.fsync(self._file.fileno()) # Ensure OS buffer is flushed to disk
+            self._index_file.flush()
+            os.fsync(self._index_file.fileno())
+
+    def truncate_after(self, index: int):
+        """Drops every record after `index` with an ftruncate at its known byte offset."""
+        keep = index - self.first_index + 1
+        if keep >= len(self.offsets):
+            return
+        self.close() # Also unmaps: touching pages past the new end of file would fault
+        new_size = self.offsets[keep]
+        with open(self.path, 'r+b') as f:
+            f.truncate(new_size)
+            os.fsync(f.fileno())
+        with open(self.index_path, 'r+b') as f:
+            f.truncate(keep * OFFSET_ENTRY.size)
+            os.fsync(f.fileno())
+        del self.offsets[keep:]
+        self.size = new_size
+
+    def scan(self, term_of: Callable[[mmap.mmap, int, int], int]) -> array:
+        """
+        Walks the length prefixes of the segment file through an mmap, rebuilding
+        `offsets` and stopping at the first incomplete record or the first one
+        whose CRC32 doesn't match. Payloads aren't copied or decoded: one zlib pass
+        checks every CRC at once (records are only checked one by one if it fails)
+        and term_of(buffer, start, end) peeks at the term of the record payload
+        buffer[start:end]. Returns the terms, one per record.
+        """
+        self.offsets = array('Q')
+        terms = array('q')
+        file_size = os.path.getsize(self.path)
+        offset = 0
+        self.checksummed = True
+        if file_size:
+            with open(self.path, 'rb') as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                if data[:len(SEGMENT_MAGIC)] == SEGMENT_MAGIC:
+                    if file_size >= SEGMENT_HEADER.size:
+                        _magic, version = SEGMENT_HEADER.unpack_from(data)
+                        if version != SEGMENT_VERSION:
+                            raise ValueError(f"Segment {self.path} has unsupported format version {version}")
+                        with memoryview(data) as view:
+                            intact = zlib.crc32(view[SEGMENT_HEADER.size:], CRC_RESIDUE) == CRC_RESIDUE
+                        offset = self._scan_records(data, SEGMENT_HEADER.size, term_of, terms, verify=not intact)
+                    # else: torn while writing the header, there are no records yet
+                elif SEGMENT_MAGIC.startswith(data[:len(SEGMENT_MAGIC)]):
+                    pass # Torn within the magic itself
+                else:
+                    self.checksummed = False
+                    offset = self._scan_records(data, 0, term_of, terms, verify=False)
+            finally:
+                data.close()
+        if offset != file_size:
+            logger.warning(f"Discarding {file_size - offset} trailing bytes of {self.path}")
+        self.size = offset
+        return terms
+
+    def _scan_records(self, data: mmap.mmap, offset: int, term_of: Callable[[mmap.mmap, int, int], int],
+                      terms: array, verify: bool) -> int:
+        """Indexes the records from `offset` on (see scan()); returns the end of the last valid one."""
+        file_size = len(data)
+        offsets_append = self.offsets.append
+        terms_append = terms.append
+        unpack_length = LENGTH_PREFIX.unpack_from
+        header_size = LENGTH_PREFIX.size
+        trailer_size = RECORD_TRAILER.size if self.checksummed else 0
+        with memoryview(data) as view: # Lets zlib read records without slicing copies
+            while offset + header_size <= file_size:
+                (length,) = unpack_length(data, offset)
+                start = offset + header_size
+                end = start + length
+                if end + trailer_size > file_size:
+                    logger.error(f"Corrupt segment {self.path}? Could not read full entry at offset {offset} (expected {length} bytes, got {file_size - start}).")
+                    break
+                if verify and zlib.crc32(view[offset:end], CRC_RESIDUE) != RECORD_TRAILER.unpack_from(data, end)[0]:
+                    logger.error(f"Corrupt segment {self.path}? Checksum mismatch for entry at offset {offset}.")
+                    break
+                offsets_append(offset)
+                terms_append(term_of(data, start, end))
+                offset = end + trailer_size
+        return offset
+
+    def read_record(self, index: int) -> bytes:
+        """Returns the record stored for log index `index` (which must be in this segment)."""
+        if self._map is None:
+            if self._file is not None:
+                self._file.flush() # The map must see everything we wrote
+            with open(self.path, 'rb') as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        offset = self.offsets[index - self.first_index]
+        (length,) = LENGTH_PREFIX.unpack_from(self._map, offset)
+        start = offset + LENGTH_PREFIX.size
+        return self._map[start:start + length]
+
+    def repair(self):
+        """Makes the files on disk match the records found by scan()."""
+        if os.path.getsize(self.path) != self.size:
+            with open(self.path, 'r+b') as f:
+                f.truncate(self.size)
+                os.fsync(f.fileno())
+        expected = array('Q', self.offsets)
+        if sys.byteorder == 'little':
+            expected.byteswap() # The sidecar stores big-endian offsets (OFFSET_ENTRY)
+        expected_index = expected.tobytes()
+        current_index = b''
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'rb') as f:
+                current_index = f.read()
+        if current_index != expected_index:
+            # The sidecar is derived data, rebuild it if a crash left it out of step
+            logger.warning(f"Rebuilding offset index {self.index_path} ({len(self.offsets)} records)")
+            with open(self.index_path, 'wb') as f:
+                f.write(expected_index)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def close(self):
+        for f in (self._file, self._index_file, self._map):
+            if f is not None:
+                f.close()
+        self._file = None
+        self._index_file = None
+        self._map = None
+
+    def delete(self):
+        self.close()
+        for path in (self.path, self.index_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+class SegmentedLog:
+    """
+    On-disk Raft log split into fixed-size segment files under `log_dir`.
+
+    Appends go to the newest (active) segment and roll over to a new file once
+    it exceeds `segment_max_bytes`. Truncating after index N deletes every
+    later segment and ftruncates a single segment at the record's known byte
+    offset, so it costs O(1) I/O regardless of log size. Whole segments below
+    a snapshot can be dropped with delete_through().
+
+    Writes come from a single thread (the WAL's disk thread) while read_record()
+    is called from the event loop; `_lock` keeps reads from seeing a segment
+    list or an mmap that is being changed. fsyncs run outside the lock.
+    """
+    def __init__(self, node_id: int, log_dir: str, segment_max_bytes: int = SEGMENT_MAX_BYTES):
+        self.node_id = node_id
+        self.log_dir = log_dir
+        self.segment_max_bytes = segment_max_bytes
+        self.segments: List[Segment] = []
+        self._dirty: List[Segment] = [] # Segments written since the last sync()
+        self._next_first_index: int = 1 # first_index for the next segment if none exist
+        self._lock = threading.RLock()
+        os.makedirs(self.log_dir, exist_ok=True)
+
+    @property
+    def first_index(self) -> int:
+        """Index of the oldest record still on disk."""
+        if self.segments:
+            return self.segments[0].first_index
+        return self._next_first_index
+
+    @property
+    def last_index(self) -> int:
+        if self.segments:
+            return self.segments[-1].last_index
+        return self._next_first_index - 1
+
+    def load(self, term_of: Callable[[mmap.mmap, int, int], int]) -> array:
+        """
+        Discovers the segment files and indexes every record, oldest first, without
+        reading the payloads (see Segment.scan()). Returns the term of each record;
+        the records themselves are fetched with read_record().
+        """
+        self.close()
+        self.segments = []
+        names = sorted(n for n in os.listdir(self.log_dir) if n.endswith(SEGMENT_SUFFIX))
+        terms = array('q')
+        for name in names:
+            first_index = int(name[:-len(SEGMENT_SUFFIX)])
+            if self.segments and first_index != self.segments[-1].last_index + 1:
+                # A gap means a later segment is orphaned (e.g. crash mid-truncate); drop it
+                logger.error(f"Node {self.node_id}: Log segment {name} does not follow index {self.segments[-1].last_index}. Discarding it and later segments.")
+                for stale in names[names.index(name):]:
+                    Segment(self.log_dir, int(stale[:-len(SEGMENT_SUFFIX)])).delete()
+                break
+            segment = Segment(self.log_dir, first_index)
+            segment_terms = segment.scan(term_of)
+            torn = segment.size < os.path.getsize(segment.path)
+            segment.repair()
+            self.segments.append(segment)
+            terms.extend(segment_terms)
+            if torn:
+                # Nothing after a torn record can be trusted
+                for stale in names[names.index(name) + 1:]:
+                    logger.error(f"Node {self.node_id}: Discarding log segment {stale} after torn record in {name}")
+                    Segment(self.log_dir, int(stale[:-len(SEGMENT_SUFFIX)])).delete()
+                break
+        if self.segments:
+            self._next_first_index = self.segments[-1].last_index + 1
+        logger.info(f"Node {self.node_id}: Indexed {len(terms)} records in {len(self.segments)} log segments in {self.log_dir}")
+        return terms
+
+    def read_record(self, index: int) -> bytes:
+        """Reads the record for log index `index` back from its segment."""
+        with self._lock:
+            position = bisect_right([segment.first_index for segment in self.segments], index) - 1
+            if position < 0 or index > self.segments[position].last_index:
+                raise IndexError(f"log index {index} is not on disk [{self.first_index}, {self.last_index}]")
+            return self.segments[position].read_record(index)
+
+    def reset(self, next_index: int):
+        """Removes every segment; the next append will be stored as `next_index`."""
+        with self._lock:
+            removed = self.segments
+            self.segments = []
+            self._dirty = []
+            self._next_first_index = next_index
+        for segment in removed:
+            segment.delete()
+        fsync_dir(self.log_dir)
+
+    def append(self, records: List[bytes]):
+        """Appends serialized records after last_index (buffered until sync())."""
+        if not records:
+            return
+        with self._lock:
+            active = self._active_segment()
+            if active.size >= self.segment_max_bytes or (active.offsets and not active.checksummed):
+                active = self._roll() # Version 1 segments are never appended to; an empty one is rewritten
+            active.append(records)
+        if active not in self._dirty:
+            self._dirty.append(active)
+
+    def sync(self):
+        """fsyncs every segment written since the last sync."""
+        for segment in self._dirty:
+            segment.sync()
+        self._dirty = []
+
+    def truncate_after(self, index: int):
+        """Removes every record with an index greater than `index`."""
+        if index >= self.last_index:
+            return
+        self.sync()
+        removed_files = False
+        with self._lock:
+            while self.segments and self.segments[-1].first_index > index:
+                segment = self.segments.pop()
+                logger.debug(f"Node {self.node_id}: Deleting log segment {segment.path}")
+                segment.delete()
+                removed_files = True
+            if self.segments:
+                self.segments[-1].truncate_after(index)
+            else:
+                self._next_first_index = index + 1
+        if removed_files:
+            fsync_dir(self.log_dir)
+
+    def delete_through(self, index: int) -> int:
+        """
+        Deletes whole segments whose records are all <= `index` (log compaction).
+        The active segment is never deleted. Returns the number of segments removed.
+        """
+        covered: List[Segment] = []
+        with self._lock:
+            while len(self.segments) > 1 and self.segments[0].last_index <= index:
+                covered.append(self.segments.pop(0))
+        for segment in covered:
+            segment.delete()
+        removed = len(covered)
+        if removed:
+            fsync_dir(self.log_dir)
+            logger.info(f"Node {self.node_id}: Deleted {removed} log segments covered by index {index}")
+        return removed
+
+    def close(self):
+        self.sync()
+        with self._lock:
+            for segment in self.segments:
+                segment.close()
+
+    def _active_segment(self) -> Segment:
+        if not self.segments:
+            segment = Segment(self.log_dir, self._next_first_index)
+            segment.open_for_append()
+            self.segments.append(segment)
+            fsync_dir(self.log_dir)
+        return self.segments[-1]
+
+    def _roll(self) -> Segment:
+        previous = self.segments[-1]
+        if previous in self._dirty:
+            previous.sync()
+            self._dirty.remove(previous)
+        previous.close()
+        segment = Segment(self.log_dir, previous.last_index + 1)
+        segment.open_for_append()
+        self.segments.append(segment)
+        fsync_dir(self.log_dir)
+        logger.debug(f"Node {self.node_id}: Rolled over to new log segment {segment.path}")
+        return segment
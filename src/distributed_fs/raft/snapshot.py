@@ -0,0 +1,178 @@
+# src/distributed_fs/raft/snapshot.py
+import logging
+import os
+import struct
+import zlib
+from typing import BinaryIO, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+from distributed_fs.raft.fsutil import fsync_dir
+
+# --- Constants ---
+SNAPSHOT_MAGIC = b'RSNP'
+SNAPSHOT_VERSION = 1
+# magic, version, last_included_index, last_included_term, last_applied, number of records
+HEADER = struct.Struct("!4sHqqqQ")
+RECORD_HEADER = struct.Struct("!II") # key length, value length
+TRAILER = struct.Struct("!I") # CRC32 of everything before it
+READ_BUFFER_BYTES = 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+class SnapshotMetadata(NamedTuple):
+    last_included_index: int
+    last_included_term: int
+    last_applied: int
+
+def write_snapshot(path: str, metadata: SnapshotMetadata, count: int, records: Iterable[Tuple[str, bytes]]):
+    """
+    Atomically replaces the snapshot file with `count` (key, value) records in the
+    compact binary layout: HEADER, then per key `!II` (key length, value length) +
+    key (UTF-8) + value, then a CRC32 trailer. Records are streamed to disk as they
+    are encoded, so the state machine never has to be materialized in memory.
+    """
+    temp_path = path + ".tmp"
+    size = 0
+    written = 0
+    with open(temp_path, 'wb', buffering=READ_BUFFER_BYTES) as f:
+        header = HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, metadata.last_included_index,
+                             metadata.last_included_term, metadata.last_applied, count)
+        crc = zlib.crc32(header)
+        f.write(header)
+        size += len(header)
+        for key, value in records:
+            key_bytes = key.encode('utf-8')
+            record = RECORD_HEADER.pack(len(key_bytes), len(value)) + key_bytes
+            crc = zlib.crc32(value, zlib.crc32(record, crc))
+            f.write(record)
+            f.write(value)
+            size += len(record) + len(value)
+            written += 1
+        if written != count:
+            raise ValueError(f"snapshot record count changed while writing ({written} written, {count} expected)")
+        f.write(TRAILER.pack(crc))
+        f.flush() # Ensure Python's buffer is flushed to OS
+        os.fsync(f.fileno()) # Ensure OS buffer is flushed to disk
+    os.rename(temp_path, path)
+    fsync_dir(os.path.dirname(path) or '.') # Make the rename durable
+    logger.debug(f"Wrote snapshot {path}: index={metadata.last_included_index}, term={metadata.last_included_term}, keys={count}, size={size + TRAILER.size}")
+
+def _parse_header(header: bytes) -> Tuple[SnapshotMetadata, int]:
+    magic, version, last_index, last_term, last_applied, count = HEADER.unpack(header)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        raise ValueError(f"unsupported snapshot format (magic={magic!r}, version={version})")
+    return SnapshotMetadata(last_index, last_term, last_applied), count
+
+def read_snapshot_metadata(f: BinaryIO) -> SnapshotMetadata:
+    """Reads just the header of an open snapshot file (the position is left after the header)."""
+    header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise ValueError(f"snapshot too short ({len(header)} bytes)")
+    return _parse_header(header)[0]
+
+def _read_exact(f: BinaryIO, length: int) -> bytes:
+    data = f.read(length)
+    if len(data) != length:
+        raise ValueError(f"snapshot truncated (wanted {length} bytes, got {len(data)})")
+    return data
+
+def read_snapshot(path: str) -> Optional[Tuple[SnapshotMetadata, int, Iterator[Tuple[str, bytes]]]]:
+    """
+    Opens the snapshot file and returns (metadata, number of records, record iterator),
+    or None if there isn't one. Records are decoded one at a time as the iterator is
+    consumed, so the snapshot is never held in memory as a whole. The iterator raises
+    ValueError if the file turns out to be corrupt, after yielding the records read so
+    far (StateMachine.restore() discards them); the header is checked right away.
+    """
+    if not os.path.exists(path):
+        return None
+    f = open(path, 'rb', buffering=READ_BUFFER_BYTES)
+    try:
+        header = _read_exact(f, HEADER.size)
+        metadata, count = _parse_header(header)
+    except Exception:
+        f.close()
+        raise
+
+    def records() -> Iterator[Tuple[str, bytes]]:
+        with f:
+            crc = zlib.crc32(header)
+            for _ in range(count):
+                record_header = _read_exact(f, RECORD_HEADER.size)
+                key_len, value_len = RECORD_HEADER.unpack(record_header)
+                key_bytes = _read_exact(f, key_len)
+                value = _read_exact(f, value_len)
+                crc = zlib.crc32(value, zlib.crc32(key_bytes, zlib.crc32(record_header, crc)))
+                yield key_bytes.decode('utf-8'), value
+
+            (expected_crc,) = TRAILER.unpack(_read_exact(f, TRAILER.size))
+            if crc != expected_crc:
+                raise ValueError("snapshot checksum mismatch")
+            if f.read(1):
+                raise ValueError("snapshot has unexpected trailing bytes")
+    return metadata, count, records()
+
+def verify_snapshot(path: str) -> SnapshotMetadata:
+    """Checks the header and CRC of a snapshot file without decoding its records. Raises ValueError if corrupt."""
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < HEADER.size + TRAILER.size:
+            raise ValueError(f"snapshot too short ({size} bytes)")
+        header = _read_exact(f, HEADER.size)
+        metadata, _count = _parse_header(header)
+        crc = zlib.crc32(header)
+        remaining = size - HEADER.size - TRAILER.size
+        while remaining > 0:
+            block = _read_exact(f, min(remaining, READ_BUFFER_BYTES))
+            crc = zlib.crc32(block, crc)
+            remaining -= len(block)
+        (expected_crc,) = TRAILER.unpack(_read_exact(f, TRAILER.size))
+    if crc != expected_crc:
+        raise ValueError("snapshot checksum mismatch")
+    return metadata
+
+class SnapshotReceiver:
+    """
+    Follower side of a chunked snapshot transfer.
+
+    Chunks are appended to `<path>.partial` as they arrive, so a transfer
+    interrupted by a dropped stream can resume from bytes_stored instead of
+    starting over. finish() fsyncs the file, validates it, and atomically
+    moves it over the real snapshot file.
+    """
+    def __init__(self, path: str, last_included_index: int, last_included_term: int):
+        self.path = path
+        self.partial_path = path + ".partial"
+        self.last_included_index = last_included_index
+        self.last_included_term = last_included_term
+        self.bytes_stored = 0
+        self._file = open(self.partial_path, 'wb')
+
+    def matches(self, last_included_index: int, last_included_term: int) -> bool:
+        return (self.last_included_index, self.last_included_term) == (last_included_index, last_included_term)
+
+    def write_chunk(self, offset: int, data: bytes) -> int:
+        """Appends `data` if it starts exactly at bytes_stored. Returns the new bytes_stored."""
+        if offset != self.bytes_stored:
+            return self.bytes_stored
+        self._file.write(data)
+        self.bytes_stored += len(data)
+        return self.bytes_stored
+
+    def finish(self) -> SnapshotMetadata:
+        """Makes the received snapshot durable and current, and returns its metadata."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        metadata = verify_snapshot(self.partial_path) # Validates the CRC before we replace anything
+        os.rename(self.partial_path, self.path)
+        fsync_dir(os.path.dirname(self.path) or '.')
+        return metadata
+
+    def abort(self):
+        try:
+            self._file.close()
+        finally:
+            try:
+                os.remove(self.partial_path)
+            except FileNotFoundError:
+                pass
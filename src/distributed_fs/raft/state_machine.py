@@ -0,0 +1,189 @@
+# src/distributed_fs/raft/state_machine.py
+import logging
+import os
+import sqlite3
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# --- Constants ---
+SQLITE_CACHE_KIB = 64 * 1024 # Page cache of the SQLite backend (64 MiB)
+
+logger = logging.getLogger(__name__)
+
+# A parsed client command as applied to the state machine: (operation, key, value).
+# operation is "PUT" or "DELETE"; value is b'' for DELETE.
+Operation = Tuple[str, str, bytes]
+
+class StateMachine(ABC):
+    """
+    The key/value state a RaftNode applies committed commands to.
+
+    Implementations must apply operations in the order given and make reads
+    reflect every applied operation. apply_batch() runs on an executor thread, one
+    batch at a time, while get() keeps being called on the event loop. `applied_index` is the last log index whose
+    effects survive a restart; the node only replays the log after it. Volatile
+    backends report 0 and are rebuilt from the snapshot and the log instead.
+    """
+    @property
+    def applied_index(self) -> int:
+        return 0
+
+    def apply(self, index: int, operation: str, key: str, value: bytes):
+        """Applies one operation taken from log entry `index`."""
+        self.apply_batch(index, [(operation, key, value)])
+
+    @abstractmethod
+    def apply_batch(self, last_index: int, operations: List[Operation]):
+        """Applies operations from consecutive log entries ending at `last_index` as one unit."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        """The value of `key`, or None if it isn't set."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of keys (may scan the whole store on disk-backed implementations)."""
+
+    @abstractmethod
+    def snapshot(self) -> Tuple[int, Iterator[Tuple[str, bytes]]]:
+        """
+        Captures the current state: returns (number of keys, iterator over (key, value)).
+        The iterator may be consumed on another thread while apply keeps running and
+        must still yield the state as of this call.
+        """
+
+    @abstractmethod
+    def restore(self, records: Iterable[Tuple[str, bytes]], applied_index: int):
+        """
+        Replaces the whole state with `records` (e.g. from a snapshot file). If iterating
+        `records` raises, the previous state must be left untouched. May run on another
+        thread, while get() keeps serving the previous state; nothing is applied meanwhile.
+        """
+
+    def close(self):
+        pass
+
+class MemoryStateMachine(StateMachine):
+    """The whole dataset in a dict; rebuilt from the snapshot and the log on every start."""
+    def __init__(self):
+        self.data: Dict[str, bytes] = {}
+
+    def apply_batch(self, last_index: int, operations: List[Operation]):
+        data = self.data
+        for operation, key, value in operations:
+            if operation == "PUT":
+                data[key] = value
+            elif operation == "DELETE":
+                data.pop(key, None)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.data.get(key)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def snapshot(self) -> Tuple[int, Iterator[Tuple[str, bytes]]]:
+        data = dict(self.data) # Point-in-time copy; apply keeps mutating self.data
+        return len(data), iter(data.items())
+
+    def restore(self, records: Iterable[Tuple[str, bytes]], applied_index: int):
+        self.data = dict(records) # Only replaces the old state once every record was read
+
+class SqliteStateMachine(StateMachine):
+    """
+    Keys and values in an SQLite database (WAL mode), so datasets larger than RAM
+    can be served and a restart only replays log entries after `applied_index`.
+
+    Each apply_batch() is one transaction that also records the batch's last log
+    index, so the data and applied_index are always consistent on disk. Batches are
+    written through their own connection, so reads (on the event loop) don't share
+    one with the applying thread and see each batch once it commits. Commits
+    aren't fsynced (synchronous=NORMAL): after a power loss the database may lose
+    its newest batches but stays consistent, and those entries are replayed from
+    the Raft log, which is durable.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = self._connect()
+        self._conn.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value BLOB NOT NULL) WITHOUT ROWID")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        row = self._conn.execute("SELECT value FROM meta WHERE name = 'applied_index'").fetchone()
+        self._applied_index = row[0] if row else 0
+        self._writer = self._connect(check_same_thread=False) # apply_batch(), on whichever executor thread
+        logger.info(f"Opened state machine database {path} (applied through index {self._applied_index})")
+
+    def _connect(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        # isolation_level=None: no implicit transactions, we issue BEGIN/COMMIT ourselves
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=check_same_thread)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_KIB}")
+        return conn
+
+    @property
+    def applied_index(self) -> int:
+        return self._applied_index
+
+    def apply_batch(self, last_index: int, operations: List[Operation]):
+        conn = self._writer
+        conn.execute("BEGIN")
+        try:
+            for operation, key, value in operations:
+                if operation == "PUT":
+                    conn.execute("INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)", (key, value))
+                elif operation == "DELETE":
+                    conn.execute("DELETE FROM kv WHERE key = ?", (key,))
+            conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('applied_index', ?)", (last_index,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._applied_index = last_index
+
+    def get(self, key: str) -> Optional[bytes]:
+        row = self._conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM kv").fetchone()[0]
+
+    def snapshot(self) -> Tuple[int, Iterator[Tuple[str, bytes]]]:
+        # A read transaction on a second connection pins the current state (WAL readers
+        # don't see later commits); it's started here so it reflects this exact point.
+        reader = self._connect(check_same_thread=False)
+        try:
+            reader.execute("BEGIN")
+            count = reader.execute("SELECT COUNT(*) FROM kv").fetchone()[0]
+        except Exception:
+            reader.close()
+            raise
+
+        def records() -> Iterator[Tuple[str, bytes]]:
+            try:
+                yield from reader.execute("SELECT key, value FROM kv")
+            finally:
+                reader.close() # Ends the read transaction
+        return count, records()
+
+    def restore(self, records: Iterable[Tuple[str, bytes]], applied_index: int):
+        # Own connection: restore may run on an executor thread, and reads on the main
+        # connection keep seeing the old state (WAL) until the transaction commits
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN")
+            try:
+                conn.execute("DELETE FROM kv")
+                conn.executemany("INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)", records)
+                conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('applied_index', ?)", (applied_index,))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+        self._applied_index = applied_index
+
+    def close(self):
+        self._writer.close()
+        self._conn.close()
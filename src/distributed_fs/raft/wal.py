@@ -0,0 +1,204 @@
+# src/distributed_fs/raft/wal.py
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, List, Optional
+
+from distributed_fs.raft.segments import SegmentedLog
+
+# --- Constants ---
+WAL_BATCH_WINDOW_MS = 1.0 # How long to wait for more entries before flushing
+WAL_BATCH_MAX_BYTES = 1024 * 1024 # Flush immediately once this much is buffered
+
+logger = logging.getLogger(__name__)
+
+class GroupCommitWAL:
+    """
+    Group-commit writer for the segmented Raft log.
+
+    Keeps the active segment open and coalesces every entry appended within
+    `batch_window_ms` (or until `max_batch_bytes` is buffered) into a single
+    write() + fsync(). append() returns a future that resolves once the
+    entries it was given are durable on disk.
+
+    All disk work runs on one dedicated thread so a slow fsync never blocks
+    the event loop (heartbeats, votes, reads keep being served). Because it
+    is a single thread, operations hit the disk in the order they were
+    queued: a truncation queued before an append is applied before it, and
+    other durable writes (the node's term and vote, via submit()) are
+    ordered with the log the same way.
+
+    If a truncation or reset fails, the log on disk no longer matches what
+    the node holds in memory: the WAL is then failed, and every later
+    append() and barrier() fails too, rather than let entries be acknowledged
+    on top of a suffix that should have been removed.
+    """
+    def __init__(self, node_id: int, segments: SegmentedLog,
+                 batch_window_ms: float = WAL_BATCH_WINDOW_MS,
+                 max_batch_bytes: int = WAL_BATCH_MAX_BYTES):
+        self.node_id = node_id
+        self.segments = segments
+        self.batch_window_ms = batch_window_ms
+        self.max_batch_bytes = max_batch_bytes
+
+        self._buffer: List[bytes] = [] # Serialized entries waiting for the next flush
+        self._buffer_bytes: int = 0
+        self._buffer_entries: int = 0
+        self._waiters: List[asyncio.Future] = [] # Futures resolved by the next flush
+        self._flush_handle: Optional[asyncio.Handle] = None
+        self._last_write: Optional[asyncio.Future] = None # Disk write of the most recent flush
+        self._closed: bool = False
+        self._failed: Optional[BaseException] = None # Set (on the disk thread) when a truncation or reset failed
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"raft-wal-{node_id}")
+
+    def submit(self, fn: Callable, *args) -> asyncio.Future:
+        """
+        Runs fn(*args) on the disk thread once everything queued before it has been
+        written. Returns a future with its result (or exception).
+        """
+        return asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def append(self, records: List[bytes]) -> asyncio.Future:
+        """
+        Buffers serialized entries for the next group commit.
+        Returns a future that completes when the entries have been fsynced.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if self._closed:
+            # The node is stopping (RPCs may still arrive until the server has shut down)
+            future.set_exception(RuntimeError(f"log of node {self.node_id} is closed"))
+            return future
+        if self._failed is not None:
+            future.set_exception(self._failed)
+            return future
+        self._buffer.extend(records)
+        self._buffer_bytes += sum(map(len, records))
+        self._buffer_entries += len(records)
+        self._waiters.append(future)
+
+        if self._buffer_bytes >= self.max_batch_bytes:
+            # Byte budget reached, don't wait for the window to expire
+            self._cancel_scheduled_flush()
+            self.flush()
+        elif self._flush_handle is None:
+            if self.batch_window_ms > 0:
+                self._flush_handle = loop.call_later(self.batch_window_ms / 1000.0, self.flush)
+            else:
+                # Still coalesces everything appended during this loop iteration
+                self._flush_handle = loop.call_soon(self.flush)
+        return future
+
+    def flush(self):
+        """Queues all buffered entries for one write() and one fsync(); the waiters are woken once they're durable."""
+        self._cancel_scheduled_flush()
+        if not self._waiters:
+            return
+
+        waiters = self._waiters
+        records = self._buffer
+        num_bytes = self._buffer_bytes
+        self._buffer = []
+        self._buffer_bytes = 0
+        self._buffer_entries = 0
+        self._waiters = []
+
+        written = self.submit(self._write, records)
+        written.add_done_callback(partial(self._on_written, waiters, len(records), num_bytes))
+        self._last_write = written
+
+    def barrier(self) -> asyncio.Future:
+        """
+        Returns a future that completes once every entry appended so far is durable,
+        whether it is still buffered or already being written. Fails if that write failed.
+        """
+        if self._waiters:
+            return self.append([]) # Resolved by the pending group commit
+        future = asyncio.get_running_loop().create_future()
+        last_write = self._last_write
+        if self._failed is not None:
+            future.set_exception(self._failed)
+        elif last_write is None or (last_write.done() and not last_write.cancelled() and last_write.exception() is None):
+            future.set_result(True)
+        else:
+            last_write.add_done_callback(partial(self._resolve_barrier, future))
+        return future
+
+    @staticmethod
+    def _resolve_barrier(future: asyncio.Future, written: asyncio.Future):
+        if future.done():
+            return
+        error = written.exception() if not written.cancelled() else asyncio.CancelledError()
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(True)
+
+    def _write(self, records: List[bytes]):
+        # Disk thread
+        if self._failed is not None:
+            raise self._failed # Queued before the failed truncation was known; must not land after it
+        self.segments.append(records)
+        self.segments.sync()
+
+    def _on_written(self, waiters: List[asyncio.Future], num_records: int, num_bytes: int, written: asyncio.Future):
+        error = written.exception() if not written.cancelled() else asyncio.CancelledError()
+        if error is not None:
+            logger.error(f"Node {self.node_id}: Failed to persist log entries to {self.segments.log_dir}: {error}", exc_info=error)
+            # Critical error - the waiters must not believe their entries are durable
+            for future in waiters:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        logger.debug(f"Node {self.node_id}: Group commit flushed {num_records} entries ({num_bytes} bytes, {len(waiters)} waiters)")
+        for future in waiters:
+            if not future.done():
+                future.set_result(True)
+
+    def truncate_after(self, index: int) -> asyncio.Future:
+        """
+        Drops every persisted entry after `index` (1-based).
+        Anything still buffered is flushed first so ordering is preserved.
+        The future fails (and so does the WAL) if the entries could not be dropped.
+        """
+        self.flush()
+        return self.submit(self._logged, "truncate log after index", index, self.segments.truncate_after, True)
+
+    def reset(self, next_index: int) -> asyncio.Future:
+        """
+        Discards the whole on-disk log (after installing a snapshot); the next entry is `next_index`.
+        The future fails (and so does the WAL) if the log could not be discarded.
+        """
+        self.flush()
+        return self.submit(self._logged, "reset log to index", next_index, self.segments.reset, True)
+
+    def delete_through(self, index: int) -> asyncio.Future:
+        """
+        Deletes whole segments covered by a snapshot ending at `index`. The future fails if
+        they could not be deleted; the WAL stays usable (the next snapshot deletes them).
+        """
+        return self.submit(self._logged, "delete log segments through index", index, self.segments.delete_through, False)
+
+    def _logged(self, action: str, index: int, operation: Callable[[int], object], fails_wal: bool):
+        # Disk thread
+        try:
+            operation(index)
+        except (IOError, OSError) as e:
+            logger.error(f"Node {self.node_id}: Failed to {action} {index} in {self.segments.log_dir}: {e}", exc_info=True)
+            if fails_wal:
+                self._failed = e
+            raise
+
+    async def close(self):
+        """Flushes anything pending, waits for the disk thread to finish and closes the segment files."""
+        self.flush()
+        self._closed = True
+        await self.submit(self.segments.close)
+        self._executor.shutdown(wait=True) # Nothing left queued, returns right away
+
+    def _cancel_scheduled_flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
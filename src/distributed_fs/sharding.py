@@ -0,0 +1,12 @@
+# src/distributed_fs/sharding.py
+import zlib
+
+# --- Constants ---
+UNSHARDED_GROUP_ID = 0 # The only group of a process that doesn't shard the keyspace (the layout before sharding)
+
+def group_for_key(key: str, num_groups: int) -> int:
+    """
+    Group id (1..num_groups) owning `key`: the key's CRC32 split into num_groups equal
+    ranges, group 1 owning the lowest. Unlike hash(), the same in every process.
+    """
+    return (zlib.crc32(key.encode('utf-8')) * num_groups >> 32) + 1
@@ -0,0 +1,85 @@
+# tests/test_catchup.py
+import asyncio
+from typing import List
+
+import pytest
+
+from distributed_fs.generated import raft_pb2
+from distributed_fs.raft.log_store import encode_entry
+from distributed_fs.raft.node import NodeState, RaftNode
+from distributed_fs.raft.replicator import MAX_ENTRIES_PER_BATCH
+
+def build_node(node_id: int, data_dir: str, terms: List[int]) -> RaftNode:
+    """Creates a RaftNode whose in-memory log holds one entry per term in `terms`."""
+    node = RaftNode(node_id, {1: "localhost:1", 2: "localhost:2"}, data_dir)
+    for term in terms:
+        node.log.append(term, encode_entry(term, b'NOOP'))
+    return node
+
+async def count_rejections(leader_terms: List[int], follower_terms: List[int], data_dir, use_hints: bool = True) -> int:
+    """
+    Drives AppendEntries from a leader to a follower (in-process, no network) until
+    the follower accepts, and returns how many rejected round trips that took.
+    """
+    leader = build_node(1, str(data_dir / "leader"), leader_terms)
+    follower = build_node(2, str(data_dir / "follower"), follower_terms)
+    leader.state = NodeState.LEADER
+    leader.current_term = follower.current_term = max(leader_terms)
+    leader.next_index[2] = leader.log.last_index + 1
+    rejections = 0
+    try:
+        while True:
+            next_idx = leader.next_index[2]
+            prev_log_index = next_idx - 1
+            args = raft_pb2.AppendEntriesArgs(
+                term=leader.current_term,
+                leader_id=1,
+                prev_log_index=prev_log_index,
+                prev_log_term=leader.log.term_at(prev_log_index),
+                entries=leader.log.records_from(next_idx, MAX_ENTRIES_PER_BATCH),
+                leader_commit=0,
+                entry_terms=leader.log.terms_from(next_idx, MAX_ENTRIES_PER_BATCH)
+            )
+            reply = await follower.handle_append_entries(args)
+            follower._cancel_election_timer() # No real cluster behind these nodes
+            if reply.success:
+                # Whatever the leader sent next must line up with the follower's log from here on
+                assert follower.log.term_at(prev_log_index) == leader.log.term_at(prev_log_index)
+                return rejections
+            rejections += 1
+            if not use_hints:
+                reply = raft_pb2.AppendEntriesReply(term=reply.term, success=False)
+            leader.next_index[2] = leader._next_index_after_reject(2, args, reply)
+    finally:
+        await leader.stop()
+        await follower.stop()
+
+def lagging(n: int):
+    """Follower missed the last n entries of the leader's log."""
+    return [1] * 10 + [2] * n, [1] * 10
+
+def divergent(n: int):
+    """Follower holds n uncommitted entries from a deposed leader's term."""
+    return [1] * 10 + [3] * n, [1] * 10 + [2] * n
+
+def many_terms(n: int):
+    """Follower has a stale suffix of about n entries spread across 48 terms the leader never saw."""
+    return [1] * 10 + [50] * n, [1] * 10 + [t for t in range(2, 50) for _ in range(n // 48 + 1)]
+
+def shared_term(n: int):
+    """Follower led term 11 and appended n entries in it that never committed; the leader has term 11's committed part."""
+    return [1] * 10 + [t for t in range(2, 12) for _ in range(100)] + [12] * n, [1] * 10 + [t for t in range(2, 11) for _ in range(100)] + [11] * (100 + n)
+
+# Rejected round trips the leader may need: constant, or one per conflicting term (never one per entry)
+@pytest.mark.parametrize("scenario, max_rejections", [(lagging, 1), (divergent, 2), (many_terms, 48), (shared_term, 2)])
+def test_catchup_round_trips_do_not_grow_with_divergence(tmp_path, scenario, max_rejections):
+    counts = []
+    for n in (100, 2000, 10000):
+        leader_terms, follower_terms = scenario(n)
+        counts.append(asyncio.run(count_rejections(leader_terms, follower_terms, tmp_path / str(n))))
+    assert max(counts) <= max_rejections, f"{scenario.__name__}: {counts} rejections for 100, 2000 and 10000 entries"
+    assert counts[2] <= counts[1], f"{scenario.__name__}: {counts} rejections grow with the divergence"
+
+def test_catchup_without_hints_steps_back_one_entry_per_round_trip(tmp_path):
+    leader_terms, follower_terms = lagging(50)
+    assert asyncio.run(count_rejections(leader_terms, follower_terms, tmp_path, use_hints=False)) == 50
@@ -0,0 +1,100 @@
+# tests/test_hard_state.py
+import asyncio
+import json
+import os
+
+import pytest
+
+from distributed_fs.raft.hard_state import CHECKSUM, RECORD, SLOT_BYTES, HardStateFile
+from distributed_fs.raft.node import RaftNode
+
+def test_save_and_load_alternate_slots(tmp_path):
+    path = str(tmp_path / "hard_state.bin")
+    state = HardStateFile(path)
+    assert state.load() is None # Fresh file: both slots zeroed
+    state.save(1, None)
+    state.save(2, 3)
+    state.close()
+
+    assert os.path.getsize(path) == 2 * SLOT_BYTES
+    state = HardStateFile(path)
+    assert state.load() == (2, 3)
+    state.save(3, None) # Overwrites the older slot
+    state.close()
+    state = HardStateFile(path)
+    assert state.load() == (3, None)
+    state.close()
+
+def test_torn_slot_falls_back_to_the_previous_state(tmp_path):
+    path = str(tmp_path / "hard_state.bin")
+    state = HardStateFile(path)
+    state.save(4, 1) # Sequence 1: slot 1
+    state.save(5, 2) # Sequence 2: slot 0
+    state.close()
+
+    # Crash halfway through writing slot 0: its second half still holds zeroes
+    half = (RECORD.size + CHECKSUM.size) // 2
+    with open(path, 'r+b') as f:
+        f.seek(half)
+        f.write(b'\0' * (RECORD.size + CHECKSUM.size - half))
+    state = HardStateFile(path)
+    assert state.load() == (4, 1)
+
+    # The next save goes to the torn slot's successor and wins from then on
+    state.save(6, None)
+    state.close()
+    state = HardStateFile(path)
+    assert state.load() == (6, None)
+    state.close()
+
+def test_both_slots_torn_means_no_state(tmp_path):
+    path = str(tmp_path / "hard_state.bin")
+    state = HardStateFile(path)
+    state.save(7, 2)
+    state.close()
+    with open(path, 'r+b') as f:
+        f.write(b'\xff' * (2 * SLOT_BYTES))
+    state = HardStateFile(path)
+    assert state.load() is None
+    state.close()
+
+def test_node_migrates_json_state_file(tmp_path):
+    data_dir = str(tmp_path)
+    with open(os.path.join(data_dir, "raft_state.json"), 'w') as f:
+        json.dump({"current_term": 9, "voted_for": 2}, f)
+
+    async def open_node():
+        node = RaftNode(1, {1: "localhost:1", 2: "localhost:2"}, data_dir)
+        state = (node.current_term, node.voted_for)
+        await node.stop()
+        return state
+
+    assert asyncio.run(open_node()) == (9, 2)
+    assert not os.path.exists(os.path.join(data_dir, "raft_state.json"))
+    state = HardStateFile(os.path.join(data_dir, "hard_state.bin"))
+    assert state.load() == (9, 2)
+    state.close()
+    assert asyncio.run(open_node()) == (9, 2) # Reopened from the binary file alone
+
+def test_node_keeps_json_state_file_if_migration_fails(tmp_path, monkeypatch):
+    data_dir = str(tmp_path)
+    with open(os.path.join(data_dir, "raft_state.json"), 'w') as f:
+        json.dump({"current_term": 9, "voted_for": 2}, f)
+
+    def failing_save(self, current_term, voted_for):
+        raise OSError("disk full")
+    monkeypatch.setattr(HardStateFile, "save", failing_save)
+    with pytest.raises(ValueError):
+        RaftNode(1, {1: "localhost:1", 2: "localhost:2"}, data_dir)
+    with open(os.path.join(data_dir, "raft_state.json")) as f:
+        assert json.load(f) == {"current_term": 9, "voted_for": 2} # Still there for the next attempt
+
+def test_node_refuses_to_start_without_a_readable_state(tmp_path):
+    data_dir = str(tmp_path)
+    state = HardStateFile(os.path.join(data_dir, "hard_state.bin"))
+    state.save(7, 2)
+    state.close()
+    with open(os.path.join(data_dir, "hard_state.bin"), 'r+b') as f:
+        f.write(b'\xff' * (2 * SLOT_BYTES))
+    with pytest.raises(ValueError): # Rather than forget its vote in term 7
+        RaftNode(1, {1: "localhost:1", 2: "localhost:2"}, data_dir)
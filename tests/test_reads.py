@@ -0,0 +1,64 @@
+# tests/test_reads.py
+import asyncio
+
+import distributed_fs.raft.node as node_module
+from distributed_fs.commands import encode_command
+from distributed_fs.generated import raft_pb2
+from distributed_fs.raft.log_store import encode_entry
+from distributed_fs.raft.node import ELECTION_TIMEOUT_MIN_MS, RaftNode
+
+PEERS = {1: "localhost:1", 2: "localhost:2", 3: "localhost:3"}
+
+def test_restarted_node_with_leases_refuses_votes_for_an_election_timeout(tmp_path):
+    async def run():
+        node = RaftNode(2, PEERS, str(tmp_path))
+        node.lease_reads = True
+        runner = asyncio.create_task(node.run())
+        try:
+            await asyncio.sleep(0)
+            node._cancel_election_timer() # Only the vote handling is under test
+            vote = raft_pb2.RequestVoteArgs(term=1, candidate_id=3, last_log_index=0, last_log_term=0)
+            reply = await node.handle_request_vote(vote)
+            # The node may have acked a leader whose lease outlives its restart
+            assert not reply.vote_granted and node.current_term == 0
+            await asyncio.sleep(ELECTION_TIMEOUT_MIN_MS / 1000.0)
+            reply = await node.handle_request_vote(vote)
+            assert reply.vote_granted and node.voted_for == 3
+        finally:
+            runner.cancel()
+            node._cancel_election_timer()
+            await node.stop()
+
+    asyncio.run(run())
+
+def test_partitioned_follower_stops_serving_bounded_reads(tmp_path, monkeypatch):
+    monkeypatch.setattr(node_module, "READ_INDEX_TIMEOUT_S", 0.1) # How long a too-stale read waits for the leader
+
+    async def bounded_get(node: RaftNode, **bounds) -> raft_pb2.ClientCommandReply:
+        request = raft_pb2.ClientCommandRequest(command=encode_command("GET", "k"),
+                                                consistency=raft_pb2.BOUNDED_STALENESS, **bounds)
+        return await node.handle_client_command(request)
+
+    async def run():
+        follower = RaftNode(2, PEERS, str(tmp_path))
+        try:
+            follower.current_term = 1
+            put = encode_entry(1, encode_command("PUT", "k", b"v"))
+            heartbeat = raft_pb2.AppendEntriesArgs(term=1, leader_id=1, prev_log_index=0, prev_log_term=0,
+                                                   entries=[put], entry_terms=[1], leader_commit=1)
+            assert (await follower.handle_append_entries(heartbeat)).success
+            follower._cancel_election_timer() # Stays a follower that simply hears nothing more
+            assert (await bounded_get(follower)).value == b"v"
+            assert (await bounded_get(follower, max_lag_entries=5)).value == b"v"
+
+            # The leader is gone: its last commit index says nothing about what it has committed since
+            await asyncio.sleep(ELECTION_TIMEOUT_MIN_MS / 1000.0)
+            for bounds in ({}, {"max_lag_entries": 5}):
+                reply = await bounded_get(follower, **bounds)
+                assert not reply.success and reply.leader_hint == PEERS[1], bounds
+            assert (await bounded_get(follower, max_staleness_ms=10 * ELECTION_TIMEOUT_MIN_MS)).value == b"v"
+        finally:
+            follower._cancel_election_timer()
+            await follower.stop()
+
+    asyncio.run(run())
@@ -0,0 +1,41 @@
+# tests/test_replicator.py
+import asyncio
+
+from distributed_fs.generated import raft_pb2
+from distributed_fs.raft.log_store import encode_entry
+from distributed_fs.raft.node import HEARTBEAT_INTERVAL_MS, NodeState, RaftNode
+from distributed_fs.raft.replicator import MAX_ENTRIES_PER_BATCH, PeerReplicator
+
+def test_unary_fallback_sends_one_request_at_a_time(tmp_path):
+    async def run():
+        leader = RaftNode(1, {1: "localhost:1", 2: "localhost:2"}, str(tmp_path))
+        leader.state = NodeState.LEADER
+        leader.current_term = 1
+        for _ in range(3 * MAX_ENTRIES_PER_BATCH):
+            leader.log.append(1, encode_entry(1, b'NOOP'))
+        leader.next_index[2] = 1
+        in_flight, most_in_flight = 0, 0
+
+        async def unary_append_entries(peer_id, peer_addr, args):
+            nonlocal in_flight, most_in_flight
+            in_flight += 1
+            most_in_flight = max(most_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return peer_id, raft_pb2.AppendEntriesReply(term=1, success=True), args
+        leader._send_single_append_entries = unary_append_entries
+
+        replicator = PeerReplicator(leader, 2, "localhost:2", HEARTBEAT_INTERVAL_MS)
+        replicator._stream_supported = False # The peer doesn't serve AppendEntriesStream
+        replicator.start()
+        try:
+            while leader.match_index.get(2, 0) < leader.log.last_index:
+                await asyncio.sleep(0.01)
+        finally:
+            replicator.stop()
+            await replicator.wait_stopped()
+            await leader.stop()
+        # Separate calls may overtake each other, so they aren't pipelined
+        assert most_in_flight == 1
+
+    asyncio.run(asyncio.wait_for(run(), timeout=10))
@@ -0,0 +1,134 @@
+# tests/test_segments.py
+import os
+from typing import List
+
+from distributed_fs.raft.log_store import encode_entry, peek_entry_term
+from distributed_fs.raft.segments import (INDEX_SUFFIX, LENGTH_PREFIX, OFFSET_ENTRY, RECORD_TRAILER,
+                                          SEGMENT_HEADER, SEGMENT_MAGIC, SEGMENT_SUFFIX, SegmentedLog)
+
+SEGMENT_BYTES = 512 # Small segments so a few dozen records span several files
+
+def records(count: int, first_index: int = 1) -> List[bytes]:
+    return [encode_entry(1 + index // 10, b"PUT key%d value%d" % (index, index))
+            for index in range(first_index, first_index + count)]
+
+def write_log(log_dir: str, entries: List[bytes]):
+    log = SegmentedLog(1, log_dir, segment_max_bytes=SEGMENT_BYTES)
+    log.load(peek_entry_term)
+    for start in range(0, len(entries), 5): # Segments roll over between appends, as between group commits
+        log.append(entries[start:start + 5])
+        log.sync()
+    log.close()
+
+def reopen(log_dir: str):
+    """Returns (log, terms) as a restarting node would see them."""
+    log = SegmentedLog(1, log_dir, segment_max_bytes=SEGMENT_BYTES)
+    terms = log.load(peek_entry_term)
+    return log, list(terms)
+
+def segment_files(log_dir: str) -> List[str]:
+    return sorted(name for name in os.listdir(log_dir) if name.endswith(SEGMENT_SUFFIX))
+
+def record_offset(path: str, position: int) -> int:
+    """Byte offset of the position-th record of a segment file (0-based), from its sidecar index."""
+    with open(path[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX, 'rb') as f:
+        f.seek(position * OFFSET_ENTRY.size)
+        return OFFSET_ENTRY.unpack(f.read(OFFSET_ENTRY.size))[0]
+
+def test_intact_segments_reload_every_record(tmp_path):
+    entries = records(60)
+    write_log(str(tmp_path), entries)
+    assert len(segment_files(str(tmp_path))) > 2
+
+    log, terms = reopen(str(tmp_path))
+    assert terms == [peek_entry_term(entry, 0, len(entry)) for entry in entries]
+    assert [log.read_record(index) for index in range(1, 61)] == entries
+    for name in segment_files(str(tmp_path)):
+        with open(os.path.join(str(tmp_path), name), 'rb') as f:
+            assert SEGMENT_HEADER.unpack(f.read(SEGMENT_HEADER.size))[0] == SEGMENT_MAGIC
+    log.close()
+
+def test_corrupt_middle_record_drops_it_and_everything_after(tmp_path):
+    log_dir = str(tmp_path)
+    entries = records(60)
+    write_log(log_dir, entries)
+    first, *later = segment_files(log_dir)
+    assert later
+    first_path = os.path.join(log_dir, first)
+    # Flip one payload byte of the 4th record of the first segment
+    offset = record_offset(first_path, 3) + LENGTH_PREFIX.size + 2
+    with open(first_path, 'r+b') as f:
+        f.seek(offset)
+        byte = f.read(1)
+        f.seek(offset)
+        f.write(bytes([byte[0] ^ 0xFF]))
+
+    log, terms = reopen(log_dir)
+    assert len(terms) == 3
+    assert log.last_index == 3
+    assert segment_files(log_dir) == [first] # Later segments can't be trusted
+    assert os.path.getsize(first_path) == offset - LENGTH_PREFIX.size - 2 # Cut where the bad record started
+    assert os.path.getsize(first_path[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX) == 3 * OFFSET_ENTRY.size
+
+    # The log carries on right after the last valid record
+    log.append(records(5, first_index=4))
+    log.sync()
+    log.close()
+    log, terms = reopen(log_dir)
+    assert len(terms) == 8
+    assert [log.read_record(index) for index in range(1, 9)] == entries[:3] + records(5, first_index=4)
+    log.close()
+
+def test_torn_trailer_drops_the_last_record(tmp_path):
+    log_dir = str(tmp_path)
+    entries = records(60)
+    write_log(log_dir, entries)
+    last_path = os.path.join(log_dir, segment_files(log_dir)[-1])
+    size = os.path.getsize(last_path)
+    with open(last_path, 'r+b') as f:
+        f.truncate(size - RECORD_TRAILER.size + 1) # Crash while writing the last record's CRC
+
+    log, terms = reopen(log_dir)
+    assert len(terms) == 59
+    assert log.read_record(59) == entries[58]
+    assert os.path.getsize(last_path) == size - len(entries[59]) - LENGTH_PREFIX.size - RECORD_TRAILER.size
+    log.close()
+
+def test_torn_header_of_new_segment_is_empty(tmp_path):
+    log_dir = str(tmp_path)
+    write_log(log_dir, records(10))
+    log, _ = reopen(log_dir)
+    next_path = os.path.join(log_dir, f"{11:020d}{SEGMENT_SUFFIX}")
+    with open(next_path, 'wb') as f:
+        f.write(SEGMENT_MAGIC[:2])
+    log.close()
+
+    log, terms = reopen(log_dir)
+    assert len(terms) == 10
+    assert os.path.getsize(next_path) == 0
+    log.close()
+
+def test_version_1_segments_are_read_and_never_appended_to(tmp_path):
+    log_dir = str(tmp_path)
+    entries = records(20)
+    # Version 1 layout: no header, no sidecar index, bare length prefix per record
+    with open(os.path.join(log_dir, f"{1:020d}{SEGMENT_SUFFIX}"), 'wb') as f:
+        for entry in entries:
+            f.write(LENGTH_PREFIX.pack(len(entry)) + entry)
+
+    log, terms = reopen(log_dir)
+    assert len(terms) == 20
+    assert [log.read_record(index) for index in range(1, 21)] == entries
+    assert os.path.exists(os.path.join(log_dir, f"{1:020d}{INDEX_SUFFIX}")) # Sidecar rebuilt
+
+    more = records(5, first_index=21)
+    log.append(more)
+    log.sync()
+    log.close()
+    assert segment_files(log_dir) == [f"{1:020d}{SEGMENT_SUFFIX}", f"{21:020d}{SEGMENT_SUFFIX}"]
+    with open(os.path.join(log_dir, f"{21:020d}{SEGMENT_SUFFIX}"), 'rb') as f:
+        assert f.read(len(SEGMENT_MAGIC)) == SEGMENT_MAGIC
+
+    log, terms = reopen(log_dir)
+    assert [log.read_record(index) for index in range(1, 26)] == entries + more
+    log.close()
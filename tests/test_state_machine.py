@@ -0,0 +1,37 @@
+# tests/test_state_machine.py
+import pytest
+
+from distributed_fs.raft.state_machine import MemoryStateMachine, SqliteStateMachine, StateMachine
+
+def test_incomplete_backend_fails_at_construction():
+    class NoSnapshots(StateMachine):
+        def apply_batch(self, last_index, operations):
+            pass
+
+        def get(self, key):
+            return None
+
+        def __len__(self):
+            return 0
+
+    with pytest.raises(TypeError):
+        NoSnapshots()
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_restore_keeps_old_state_if_records_fail(tmp_path, backend):
+    state = MemoryStateMachine() if backend == "memory" else SqliteStateMachine(str(tmp_path / "state.sqlite"))
+    state.apply_batch(2, [("PUT", "a", b"1"), ("PUT", "b", b"2"), ("DELETE", "b", b"")])
+
+    def corrupt_records():
+        yield "c", b"3"
+        raise ValueError("snapshot checksum mismatch")
+
+    with pytest.raises(ValueError):
+        state.restore(corrupt_records(), 10)
+    assert (state.get("a"), state.get("c"), len(state)) == (b"1", None, 1)
+
+    state.restore(iter([("c", b"3")]), 10)
+    assert (state.get("a"), state.get("c"), len(state)) == (None, b"3", 1)
+    count, records = state.snapshot()
+    assert (count, list(records)) == (1, [("c", b"3")])
+    state.close()
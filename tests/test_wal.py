@@ -0,0 +1,32 @@
+# tests/test_wal.py
+import asyncio
+
+from distributed_fs.generated import raft_pb2
+from distributed_fs.raft.log_store import encode_entry
+from distributed_fs.raft.node import RaftNode
+
+def append_entries(prev_log_index: int, prev_log_term: int, term: int, count: int) -> raft_pb2.AppendEntriesArgs:
+    return raft_pb2.AppendEntriesArgs(term=term, leader_id=1, prev_log_index=prev_log_index, prev_log_term=prev_log_term,
+                                      entries=[encode_entry(term, b'NOOP')] * count, entry_terms=[term] * count)
+
+def test_failed_truncation_rejects_the_replacement_entries(tmp_path):
+    async def run():
+        follower = RaftNode(2, {1: "localhost:1", 2: "localhost:2"}, str(tmp_path))
+        try:
+            follower.current_term = 1
+            assert (await follower.handle_append_entries(append_entries(0, 0, 1, 5))).success
+
+            def failing_truncate(index):
+                raise OSError("read-only file system")
+            follower._log_segments.truncate_after = failing_truncate
+            # Entries 3..5 of term 1 conflict with the new leader's term 2 entries
+            reply = await follower.handle_append_entries(append_entries(2, 1, 2, 3))
+            assert not reply.success
+            # Nothing is acknowledged on top of the suffix still on disk, not even a heartbeat
+            assert not (await follower.handle_append_entries(append_entries(5, 2, 2, 0))).success
+            assert not (await follower.handle_append_entries(append_entries(5, 2, 2, 1))).success
+        finally:
+            follower._cancel_election_timer()
+            await follower.stop()
+
+    asyncio.run(run())